@@ -0,0 +1,159 @@
+"""
+ชุดผลรวมของแท็บการวิเคราะห์ คำนวณครั้งเดียวต่อตัวกรอง แล้วใช้ร่วมกันทุกกราฟและตัวเลขสรุป
+
+แทนการเรียก cube.summary / cube.daily แยกกัน แล้วค่อย groupby ซ้ำในแต่ละกราฟ
+(ยอดรายวันแยกตามวันในสัปดาห์, ยอดรายจังหวัด, ค่าสถิติของยอดรายอำเภอ)
+- อ่านบล็อก (วัน × อำเภอ) ของช่วงวันที่จาก prefix sum ครั้งเดียว
+  ยอดรายวันของทั้งประเทศและของตัวกรองได้จากการคูณเมทริกซ์ครั้งเดียว (คอลัมน์ถ่วง 1 / mask)
+- ยอดรายอำเภอ = prefix[i1] - prefix[i0]
+- ยอดตามวันในสัปดาห์ / รายจังหวัด รวมด้วย np.bincount บนรหัสจำนวนเต็ม (ไม่ใช้ groupby)
+- ค่ามัธยฐาน / ส่วนเบี่ยงเบนมาตรฐานคำนวณจาก array ของยอดรายอำเภอโดยตรง
+
+ตรวจว่าผลตรงกับวิธีเดิมและวัดเวลา:
+    python src/aggregations.py
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cube import SUMMARY_FIELDS, province_totals
+
+
+def analysis_bundle(cube, start_date, end_date, mask=None):
+    """
+    ผลรวมทุกแบบของตัวกรองหนึ่งชุด (mask = คอลัมน์ที่เลือก, None = ทั้งหมด)
+    คืนค่า dict:
+    - summary: ยอดรายอำเภอ (เหมือน cube.summary)
+    - daily_trend / daily_all: ยอดรายวันของตัวกรอง / ทั้งประเทศ (เหมือน cube.daily)
+    - weekday: ยอดตามวันในสัปดาห์ของ daily_trend (day_of_week_num, predicted_cases)
+    - provinces: ยอดรายจังหวัดของ summary (CHANGWAT_T, predicted_cases)
+    - stats: ตัวเลขสรุปของแท็บการวิเคราะห์
+    """
+    i0, i1 = cube.day_range(start_date, end_date)
+    selected = np.ones(len(cube.columns), dtype=bool) if mask is None else np.asarray(mask)
+
+    # ยอดรายวัน: คอลัมน์ 0 = ทุกอำเภอ, คอลัมน์ 1 = อำเภอที่เลือก
+    weights = np.column_stack([np.ones(len(selected)), selected])
+    day_values = np.diff(cube.prefix[i0:i1 + 1], axis=0) @ weights
+    day_counts = np.diff(cube.count_prefix[i0:i1 + 1], axis=0) @ weights
+    dates = cube.dates[i0:i1]
+    present_all, present = day_counts[:, 0] > 0, day_counts[:, 1] > 0
+    daily_all = pd.DataFrame({'adate': dates[present_all], 'predicted_cases': day_values[present_all, 0]})
+    daily_trend = pd.DataFrame({'adate': dates[present], 'predicted_cases': day_values[present, 1]})
+
+    # ยอดรายอำเภอ
+    totals = cube.prefix[i1] - cube.prefix[i0]
+    counts = cube.count_prefix[i1] - cube.count_prefix[i0]
+    keep = cube.has_coord & (counts > 0) & selected
+    cases = totals[keep]
+    summary = cube.columns.loc[keep, SUMMARY_FIELDS].reset_index(drop=True)
+    summary['predicted_cases'] = cases
+
+    # ยอดตามวันในสัปดาห์ (เฉพาะวันที่มีข้อมูลของตัวกรอง)
+    day_of_week = dates.dayofweek.to_numpy()[present]
+    weekday_sum = np.bincount(day_of_week, weights=day_values[present, 1], minlength=7)
+    weekdays = np.flatnonzero(np.bincount(day_of_week, minlength=7))
+    weekday = pd.DataFrame({'day_of_week_num': weekdays, 'predicted_cases': weekday_sum[weekdays]})
+
+    # ยอดรายจังหวัด (ไม่นับอำเภอที่ไม่มีชื่อจังหวัด เหมือน groupby)
+    codes = cube.province_codes[keep]
+    named = codes >= 0
+    n_names = len(cube.province_names)
+    province_sum = np.bincount(codes[named], weights=cases[named], minlength=n_names)
+    province_ids = np.flatnonzero(np.bincount(codes[named], minlength=n_names))
+    provinces = pd.DataFrame({'CHANGWAT_T': np.asarray(cube.province_names)[province_ids],
+                              'predicted_cases': province_sum[province_ids]})
+
+    n_days, n_all_days = int(present.sum()), int(present_all.sum())
+    stats = {
+        'total': cases.sum(),
+        'n_amphoes': len(cases),
+        'top_amphoe': summary['AMPHOE_T'].iloc[int(np.argmax(cases))] if len(cases) > 0 else 'N/A',
+        'daily_mean': day_values[present, 1].sum() / n_days if n_days else np.nan,
+        'median': np.median(cases) if len(cases) > 0 else np.nan,
+        'std': cases.std(ddof=1) if len(cases) > 1 else np.nan,
+        'total_days': n_all_days,
+        'all_daily_mean': day_values[present_all, 0].sum() / n_all_days if n_all_days else np.nan
+    }
+    return {'summary': summary, 'daily_trend': daily_trend, 'daily_all': daily_all,
+            'weekday': weekday, 'provinces': provinces, 'stats': stats}
+
+
+def _analysis_pandas(cube, start_date, end_date, mask=None):
+    """วิธีเดิม (cube.summary / cube.daily แยกกัน + groupby ต่อกราฟ) เก็บไว้เทียบผลลัพธ์และความเร็ว"""
+    summary = cube.summary(start_date, end_date, mask)
+    daily_trend = cube.daily(start_date, end_date, mask)
+    daily_all = cube.daily(start_date, end_date)
+    weekday = (daily_trend.assign(day_of_week_num=daily_trend['adate'].dt.dayofweek)
+               .groupby('day_of_week_num')['predicted_cases'].sum().reset_index())
+    cases = summary['predicted_cases']
+    stats = {
+        'total': cases.sum(),
+        'n_amphoes': len(summary),
+        'top_amphoe': summary.loc[cases.idxmax(), 'AMPHOE_T'] if len(summary) > 0 else 'N/A',
+        'daily_mean': daily_trend['predicted_cases'].mean(),
+        'median': cases.median(),
+        'std': cases.std(),
+        'total_days': len(daily_all),
+        'all_daily_mean': daily_all['predicted_cases'].mean()
+    }
+    return {'summary': summary, 'daily_trend': daily_trend, 'daily_all': daily_all,
+            'weekday': weekday, 'provinces': province_totals(summary), 'stats': stats}
+
+
+def _filters(cube):
+    """ตัวกรองที่ใช้ตรวจ: ทั้งประเทศ, จังหวัดแรก, อำเภอแรกของจังหวัดนั้น, ช่วงวันที่ว่าง"""
+    start, end = cube.min_date, cube.max_date
+    province = cube.provinces(start, end)[0]
+    amphoe = cube.amphoes(start, end, province)[0]
+    return [
+        (start, end, None),
+        (start, end, cube.column_mask(province=province)),
+        (start, start, cube.column_mask(province=province, amphoe=amphoe)),
+        (end + pd.Timedelta(days=1), end + pd.Timedelta(days=5), None)
+    ]
+
+
+def check_aggregations(cube):
+    """analysis_bundle ต้องให้ผลเท่ากับวิธีเดิมทุกตาราง/ตัวเลข"""
+    for start, end, mask in _filters(cube):
+        bundle = analysis_bundle(cube, start, end, mask)
+        expected = _analysis_pandas(cube, start, end, mask)
+        for name in ('summary', 'daily_trend', 'daily_all', 'weekday', 'provinces'):
+            pd.testing.assert_frame_equal(bundle[name], expected[name], check_dtype=False)
+        for name, value in expected['stats'].items():
+            if isinstance(value, str):
+                assert bundle['stats'][name] == value, name
+            else:
+                np.testing.assert_allclose(bundle['stats'][name], value, err_msg=name)
+
+
+def benchmark_aggregations(cube, repeat=20):
+    """เวลาเฉลี่ย (มิลลิวินาที) ต่อตัวกรอง ของวิธีเดิมเทียบกับ analysis_bundle"""
+    filters = _filters(cube)[:3]
+    results = {}
+    for name, runner in (('pandas', _analysis_pandas), ('bundle', analysis_bundle)):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for start, end, mask in filters:
+                runner(cube, start, end, mask)
+        results[name] = (time.perf_counter() - t0) / (repeat * len(filters)) * 1000
+    return results
+
+
+if __name__ == '__main__':
+    from data_store import load_cube
+
+    parser = argparse.ArgumentParser(description='Single-pass aggregations for the analysis tab')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    cube = load_cube()
+    check_aggregations(cube)
+    print("✓ analysis_bundle matches the separate summary/daily/groupby results")
+    results = benchmark_aggregations(cube, args.repeat)
+    for name, ms in results.items():
+        print(f"  • {name:<8} {ms:8.2f} ms per filter")
+    print(f"  • speedup  {results['pandas'] / results['bundle']:8.1f}x")
@@ -0,0 +1,344 @@
+"""
+HTTP API (JSON) สำหรับระบบอื่นที่ต้องการยอดพยากรณ์ โดยไม่ต้องดึงจากหน้า Streamlit
+
+ใช้ cube และฟังก์ชันสรุปชุดเดียวกับแดชบอร์ด (cube.py)
+- ผลลัพธ์ถูกแคชตามพารามิเตอร์ + เวอร์ชันข้อมูล และบีบอัดด้วย gzip
+- รองรับ ETag / If-None-Match (ตอบ 304 เมื่อข้อมูลไม่เปลี่ยน)
+- งานคำนวณ / อ่านไฟล์ของแต่ละคำขอรันใน thread pool (IOLoop.run_in_executor) ไม่บล็อก IOLoop
+- คำขอแค่เทียบ fingerprint ของไฟล์ต้นทาง ถ้าไฟล์เปลี่ยนจะ build คลังข้อมูลใหม่ใน thread เบื้องหลัง
+  (ระหว่างนั้นตอบจากเวอร์ชันเดิม) และ build ครั้งแรกตอนเริ่มเซิร์ฟเวอร์
+
+Endpoints (พารามิเตอร์ start/end รูปแบบ YYYY-MM-DD, ไม่ระบุ = ทั้งช่วง):
+    GET /api/meta
+    GET /api/daily?start=&end=&province=&amphoe=
+    GET /api/summary?level=amphoe|province&start=&end=&province=&amphoe=
+    GET /api/top?n=10&level=amphoe|province&start=&end=&province=
+    GET /api/nearby?lat=&lon=&km=&by=amphoe|tambon&start=&end=&province=
+        อำเภอในรัศมี km พร้อมยอดรวม (spatial.py)
+    GET /api/viewport?south=&west=&north=&east=&start=&end=&province=
+        อำเภอที่อยู่ในกรอบแผนที่ พร้อมยอดรวม
+    GET /api/export/summary|daily|groups?format=csv|csv.gz|parquet&start=&end=&province=&amphoe=
+        ไฟล์ส่งออก (exports.py) ส่งแบบ streaming ทีละ chunk แล้วแคช bytes ตามพารามิเตอร์
+
+รัน:
+    python src/api.py --port 8600
+"""
+import os
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+from datetime import date
+
+import tornado.ioloop
+import tornado.web
+
+from cube import province_totals, top_n
+from config import COORD_PATH, FORECAST_PATH
+from data_store import (STORE_DIR, ensure_store, load_cube, load_store, make_data_version,
+                        read_meta, source_fingerprint)
+from exports import FORMATS, export_name, iter_export, iter_frames
+from render_cache import RenderCache
+from spatial import MAX_RADIUS_KM, NEARBY_BY, ForecastSpatial, load_tambons
+
+LEVELS = ('amphoe', 'province')
+SPATIAL_ENDPOINTS = ('nearby', 'viewport')
+MAX_TOP_N = 1000
+
+
+class BadRequest(ValueError):
+    """พารามิเตอร์ไม่ถูกต้อง (ตอบกลับ 400)"""
+
+
+class StoreNotReady(RuntimeError):
+    """ยังไม่มีคลังข้อมูลให้เปิด (กำลัง build ครั้งแรก ตอบกลับ 503)"""
+
+
+class ForecastService:
+    """เปิด cube ของเวอร์ชันข้อมูลปัจจุบัน และแคชผลลัพธ์ที่บีบอัดแล้ว"""
+
+    def __init__(self, store_dir=STORE_DIR, cache_bytes=32 * 1024 * 1024,
+                 forecast_path=FORECAST_PATH, coord_path=COORD_PATH):
+        self.store_dir = store_dir
+        self.forecast_path = forecast_path
+        self.coord_path = coord_path
+        self.cache = RenderCache(max_bytes=cache_bytes)
+        self.cube = None
+        self.source = None
+        self.spatial = None
+        self.data_version = None
+        self._lock = threading.Lock()
+        self._rebuild = None
+
+    def ensure(self):
+        """build คลังข้อมูลถ้าล้าสมัย (เรียกตอนเริ่มเซิร์ฟเวอร์ หรือจาก thread เบื้องหลัง)"""
+        return ensure_store(self.forecast_path, self.coord_path, self.store_dir)
+
+    def _start_rebuild(self):
+        """build คลังข้อมูลใหม่ใน thread เบื้องหลัง (ครั้งละ thread เดียว) เรียกภายใต้ self._lock"""
+        if self._rebuild is None or not self._rebuild.is_alive():
+            self._rebuild = threading.Thread(target=self.ensure, name='store-rebuild', daemon=True)
+            self._rebuild.start()
+
+    def refresh(self):
+        """
+        เทียบ fingerprint ของไฟล์ต้นทางกับคลังข้อมูล (ไม่ build ในคำขอ)
+        - คลังข้อมูลมีเวอร์ชันใหม่กว่าที่เปิดอยู่: โหลด cube ใหม่ (memory-map)
+        - ไฟล์ต้นทางเปลี่ยนแต่คลังข้อมูลยังเก่า: สั่ง build เบื้องหลัง แล้วตอบจาก cube เดิม
+        """
+        with self._lock:
+            meta = read_meta(self.store_dir)
+            stored = meta.get('data_version') if meta else None
+            if stored != make_data_version(source_fingerprint(self.forecast_path, self.coord_path)):
+                self._start_rebuild()
+            if stored is not None and stored != self.data_version:
+                self.cube = load_cube(self.store_dir)
+                self.source = None
+                self.spatial = None
+                self.data_version = stored
+                self.cache.set_version(stored)
+            if self.cube is None:
+                raise StoreNotReady('data store is being built, retry shortly')
+            return self.cube, self.data_version
+
+    def response(self, endpoint, params):
+        """คืนค่า (etag, gzip_body) ของ endpoint จากแคช หรือคำนวณใหม่"""
+        cube, data_version = self.refresh()
+        key = (endpoint, tuple(sorted(params.items())))
+        spatial = self.spatial
+        # ดัชนีต้องเป็นของ cube เดียวกับคำขอนี้ (thread อื่นอาจเพิ่งโหลดเวอร์ชันใหม่)
+        if endpoint in SPATIAL_ENDPOINTS and (spatial is None or spatial.cube is not cube):
+            spatial = self.spatial = ForecastSpatial(cube, load_tambons())
+
+        def build():
+            payload = query(cube, endpoint, params, spatial)
+            body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            etag = '"%s"' % hashlib.sha1(data_version.encode() + body).hexdigest()[:20]
+            return etag, gzip.compress(body, compresslevel=6)
+
+        return self.cache.get_or_create(key, build)
+
+    def export(self, dataset, params):
+        """
+        คืนค่า (ชื่อไฟล์, content type, iterator ของ bytes) ของไฟล์ส่งออก
+        ไฟล์ที่เคยสร้างแล้วมาจากแคช ไม่เช่นนั้นสร้างทีละ chunk และเก็บลงแคชเมื่อส่งครบ
+        """
+        cube, data_version = self.refresh()
+        fmt = params.get('format', 'csv')
+        if fmt not in FORMATS:
+            raise BadRequest(f'format must be one of {tuple(FORMATS)}')
+        start_date = _parse_date(params.get('start'), cube.min_date)
+        end_date = _parse_date(params.get('end'), cube.max_date)
+        if end_date < start_date:
+            raise BadRequest('end must not be before start')
+        source = None
+        if dataset == 'groups':
+            if self.source is None or self.source[0] != data_version:
+                self.source = (data_version, load_store(self.store_dir)[0])
+            source = self.source[1]
+
+        key = ('export', dataset, tuple(sorted(params.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            chunks = iter([cached])
+        else:
+            frames = iter_frames(dataset, cube, start_date, end_date, params.get('province'),
+                                 params.get('amphoe'), source=source)
+            chunks = self._store_when_done(key, iter_export(frames, fmt), data_version)
+        return export_name(dataset, fmt), FORMATS[fmt][1], chunks
+
+    def _store_when_done(self, key, chunks, data_version):
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.cache.put(key, b''.join(parts), data_version)
+
+
+def _parse_date(value, default):
+    if value is None:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f'invalid date: {value}')
+
+
+def _parse_float(params, name, low, high):
+    try:
+        value = float(params[name])
+    except KeyError:
+        raise BadRequest(f'{name} is required')
+    except ValueError:
+        raise BadRequest(f'{name} must be a number')
+    if not low <= value <= high:
+        raise BadRequest(f'{name} must be between {low} and {high}')
+    return value
+
+
+def _records(df, columns):
+    """แปลง DataFrame เป็น list ของ dict (วันที่เป็น YYYY-MM-DD)"""
+    out = df[list(columns)].copy()
+    if 'adate' in out:
+        out['adate'] = out['adate'].dt.strftime('%Y-%m-%d')
+    return out.to_dict(orient='records')
+
+
+def query(cube, endpoint, params, spatial=None):
+    """คำนวณผลลัพธ์ของ endpoint จาก cube (ใช้ logic เดียวกับแดชบอร์ด) spatial: ForecastSpatial ของ cube"""
+    if endpoint == 'meta':
+        return {
+            'start': cube.min_date.isoformat(),
+            'end': cube.max_date.isoformat(),
+            'provinces': cube.provinces(cube.min_date, cube.max_date)
+        }
+
+    start_date = _parse_date(params.get('start'), cube.min_date)
+    end_date = _parse_date(params.get('end'), cube.max_date)
+    if end_date < start_date:
+        raise BadRequest('end must not be before start')
+    mask = cube.column_mask(province=params.get('province'), amphoe=params.get('amphoe'))
+
+    if endpoint == 'daily':
+        return _records(cube.daily(start_date, end_date, mask), ['adate', 'predicted_cases'])
+
+    if endpoint in SPATIAL_ENDPOINTS:
+        spatial = spatial or ForecastSpatial(cube, load_tambons())
+        columns = ['AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG', 'predicted_cases']
+        if endpoint == 'nearby':
+            lat = _parse_float(params, 'lat', -90, 90)
+            lon = _parse_float(params, 'lon', -180, 180)
+            km = _parse_float(params, 'km', 0, MAX_RADIUS_KM)
+            by = params.get('by', 'amphoe')
+            if by not in NEARBY_BY:
+                raise BadRequest(f'by must be one of {NEARBY_BY}')
+            rows = spatial.nearby(lat, lon, km, start_date, end_date, mask, by)
+            columns.append('distance_km')
+        else:
+            south = _parse_float(params, 'south', -90, 90)
+            north = _parse_float(params, 'north', -90, 90)
+            west = _parse_float(params, 'west', -180, 180)
+            east = _parse_float(params, 'east', -180, 180)
+            if south > north:
+                raise BadRequest('south must not be greater than north')
+            if west > east:
+                raise BadRequest('west must not be greater than east')
+            rows = spatial.in_bounds(((south, west), (north, east)), start_date, end_date, mask)
+        return {'total': float(rows['predicted_cases'].sum()), 'amphoes': _records(rows, columns)}
+
+    level = params.get('level', 'amphoe')
+    if level not in LEVELS:
+        raise BadRequest(f'level must be one of {LEVELS}')
+
+    summary = cube.summary(start_date, end_date, mask)
+    if level == 'province':
+        summary, columns = province_totals(summary), ['CHANGWAT_T', 'predicted_cases']
+    else:
+        columns = ['AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG', 'predicted_cases']
+
+    if endpoint == 'top':
+        try:
+            n = int(params.get('n', 10))
+        except ValueError:
+            raise BadRequest('n must be an integer')
+        if not 1 <= n <= MAX_TOP_N:
+            raise BadRequest(f'n must be between 1 and {MAX_TOP_N}')
+        summary = top_n(summary, n)
+
+    return _records(summary, columns)
+
+
+def _send_error(handler, error):
+    """ตอบ 400 (พารามิเตอร์ผิด) หรือ 503 (คลังข้อมูลยังไม่พร้อม) เป็น JSON"""
+    if isinstance(error, StoreNotReady):
+        handler.set_status(503)
+        handler.set_header('Retry-After', '5')
+    else:
+        handler.set_status(400)
+    handler.finish({'error': str(error)})
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_header('Vary', 'Accept-Encoding')
+
+    async def get(self, endpoint):
+        params = {name: self.get_query_argument(name) for name in self.request.query_arguments}
+        try:
+            etag, body = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, self.service.response, endpoint, params
+            )
+        except (BadRequest, StoreNotReady) as e:
+            _send_error(self, e)
+            return
+
+        self.set_header('ETag', etag)
+        if etag in self.request.headers.get('If-None-Match', ''):
+            self.set_status(304)
+            self.finish()
+            return
+
+        if 'gzip' in self.request.headers.get('Accept-Encoding', ''):
+            self.set_header('Content-Encoding', 'gzip')
+            self.finish(body)
+        else:
+            self.finish(gzip.decompress(body))
+
+    def compute_etag(self):
+        # ใช้ ETag ที่แคชไว้แทนการ hash body ทุกครั้ง
+        return None
+
+
+class ExportHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    async def get(self, dataset):
+        params = {name: self.get_query_argument(name) for name in self.request.query_arguments}
+        loop = tornado.ioloop.IOLoop.current()
+        try:
+            file_name, content_type, chunks = await loop.run_in_executor(
+                None, self.service.export, dataset, params
+            )
+        except (BadRequest, StoreNotReady) as e:
+            _send_error(self, e)
+            return
+
+        self.set_header('Content-Type', content_type)
+        self.set_header('Content-Disposition', f'attachment; filename="{file_name}"')
+        # สร้างแต่ละ chunk ใน thread pool แล้วส่งบน IOLoop
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            self.write(chunk)
+            await self.flush()
+        self.finish()
+
+
+def make_app(service=None):
+    service = service or ForecastService()
+    return tornado.web.Application([
+        (r'/api/(meta|daily|summary|top|nearby|viewport)', ApiHandler, {'service': service}),
+        (r'/api/export/(summary|daily|groups)', ExportHandler, {'service': service}),
+    ])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Forecast aggregate JSON API')
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('API_PORT', 8600)))
+    args = parser.parse_args()
+
+    service = ForecastService()
+    service.ensure()
+    app = make_app(service)
+    app.listen(args.port, address=args.host)
+    print(f"✓ Forecast API listening on http://{args.host}:{args.port}/api/")
+    tornado.ioloop.IOLoop.current().start()
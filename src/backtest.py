@@ -0,0 +1,203 @@
+"""
+Backtest แบบ rolling-origin: เทรนโมเดลใหม่และวัดผลกับทุกฤดูปีใหม่ในอดีตแยกเป็น fold
+
+แทนการแบ่ง train/test ครั้งเดียวในโน้ตบุ๊ก (train ≤ 2024-01-31, test 2024-12 ถึง 2025-01)
+- ฤดู (season) เรียกตามปีของเดือนมกราคม เช่น season 2025 = 2024-12-01 ถึง 2025-01-31
+- fold ของ season S: เทรนด้วยทุกแถวก่อน season S แล้วทำนาย season S
+- ฟีเจอร์คำนวณครั้งเดียวทั้งชุดด้วย FeatureState ทีละ season (lag / rolling ใช้เฉพาะข้อมูลในอดีต
+  จึงใช้ร่วมกันได้ทุก fold) และเก็บ group_mean / group_std ของข้อมูลก่อนแต่ละ season ไว้
+  แต่ละ fold จึงแค่เลือกแถวและเปลี่ยน group stats ไม่ต้องคำนวณฟีเจอร์ของอดีตซ้ำ
+  (group stats ของ fold มาจากข้อมูลก่อน season เท่านั้น เหมือนตอนพยากรณ์จริงใน forecast.py)
+- fold รันใน process pool (workers) โดยจำกัดจำนวน thread ของ XGBoost ต่อ fold (nthread)
+  ตารางฟีเจอร์ส่งให้แต่ละ process ครั้งเดียวตอนเริ่ม ไม่ใช่ทุก fold
+
+รัน (เขียนผลรายฤดูและรายกลุ่มลง models/evaluation/):
+    python src/backtest.py --workers 4
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from evaluation import METRICS_DIR, evaluate, segment_metrics
+from features import DEFAULT_LAG_MODE, FEATURE_COLUMNS, LAG_MODES, FeatureState, load_history
+from schema import group_label
+
+SEASONS_PATH = os.path.join(METRICS_DIR, 'backtest_seasons.csv')
+GROUPS_PATH = os.path.join(METRICS_DIR, 'backtest_per_group.csv')
+
+# พารามิเตอร์เดียวกับโมเดลในโน้ตบุ๊ก (n_jobs กำหนดต่อ fold)
+DEFAULT_PARAMS = {
+    'n_estimators': 200,
+    'learning_rate': 0.05,
+    'max_depth': 6,
+    'min_child_weight': 1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'tree_method': 'hist',
+    'random_state': 42
+}
+
+_STAT_COLUMNS = [FEATURE_COLUMNS.index('group_mean'), FEATURE_COLUMNS.index('group_std')]
+
+# ข้อมูลของ fold ที่แต่ละ process ได้รับครั้งเดียวตอนเริ่ม (ดู _init_worker)
+_FOLD_DATA = {}
+
+
+def season_of(dates):
+    """season ของแต่ละวันที่ (ธ.ค. นับเป็นฤดูของปีถัดไป)"""
+    dates = pd.DatetimeIndex(dates)
+    return dates.year.to_numpy() + (dates.month.to_numpy() == 12)
+
+
+def season_bounds(season):
+    """วันแรกและวันสุดท้ายของ season"""
+    return pd.Timestamp(f'{season - 1}-12-01'), pd.Timestamp(f'{season}-01-31')
+
+
+def feature_cache(df, lag_mode=DEFAULT_LAG_MODE):
+    """
+    ฟีเจอร์ของทุกแถวคำนวณครั้งเดียว เพิ่มทีละ season ด้วย FeatureState
+    คืนค่า (features เรียงตาม season → group_id → adate, dict season → group stats ของข้อมูลก่อน season)
+    """
+    seasons = season_of(df['adate'])
+    state = FeatureState(lag_mode=lag_mode)
+    parts, stats = [], {}
+    for season in np.unique(seasons):
+        before = state.group_stats()
+        stats[season] = (before['group_id'].to_numpy(), before['group_mean'].to_numpy(),
+                         before['group_std'].to_numpy())
+        parts.append(state.update(df[seasons == season]).assign(season=season))
+    return pd.concat(parts, ignore_index=True), stats
+
+
+def _init_worker(data):
+    _FOLD_DATA.update(data)
+
+
+def _lookup_stats(stats, group_id):
+    """group_mean / group_std ของแต่ละแถวจาก group stats ของ fold (กลุ่มที่ยังไม่เคยเห็น = 0)"""
+    groups, mean, std = stats
+    if len(groups) == 0:
+        return np.zeros(len(group_id)), np.zeros(len(group_id))
+    idx = np.searchsorted(groups, group_id).clip(max=len(groups) - 1)
+    found = groups[idx] == group_id
+    return np.where(found, mean[idx], 0.0), np.where(found, std[idx], 0.0)
+
+
+def _fold_matrix(mask, stats):
+    """ตารางฟีเจอร์ของแถวที่เลือก (สำเนา) พร้อม group stats ของ fold"""
+    X = _FOLD_DATA['X'][mask]
+    X[:, _STAT_COLUMNS[0]], X[:, _STAT_COLUMNS[1]] = _lookup_stats(stats, _FOLD_DATA['group_id'][mask])
+    return X
+
+
+def _run_fold(season, params, nthread):
+    """เทรนด้วยแถวก่อน season แล้วทำนาย season คืนค่า (season, จำนวนแถวเทรน, ผลทำนาย, เวลาเทรน)"""
+    import xgboost as xgb
+
+    seasons = _FOLD_DATA['season']
+    train, test = seasons < season, seasons == season
+    stats = _FOLD_DATA['stats'][season]
+    X_train, X_test = _fold_matrix(train, stats), _fold_matrix(test, stats)
+
+    t0 = time.perf_counter()
+    model = xgb.XGBRegressor(**params, n_jobs=nthread)
+    model.fit(X_train, _FOLD_DATA['y'][train])
+    fit_seconds = time.perf_counter() - t0
+    return season, int(train.sum()), np.maximum(model.predict(X_test), 0), fit_seconds
+
+
+def backtest(df, seasons=None, workers=1, nthread=None, params=None, lag_mode=DEFAULT_LAG_MODE):
+    """
+    backtest ทุก season ที่กำหนด (None = ทุก season ที่มีข้อมูลก่อนหน้าให้เทรน)
+    - workers: จำนวน process ที่รัน fold พร้อมกัน
+    - nthread: thread ของ XGBoost ต่อ fold (None = แบ่ง CPU เท่า ๆ กันตาม workers)
+    คืนค่า dict: 'predictions' (ผลทำนายทุก fold), 'seasons' (สรุปรายฤดู), 'groups' (metric รายกลุ่มต่อฤดู)
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    features, stats = feature_cache(df, lag_mode)
+    available = np.unique(features['season'])
+    if seasons is None:
+        seasons = available[1:]
+    seasons = [season for season in seasons if season in stats and season > available[0]]
+    if nthread is None:
+        nthread = max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+    data = {
+        'X': features[FEATURE_COLUMNS].to_numpy(dtype=np.float32),
+        'y': features['acc_cases'].to_numpy(dtype=np.float32),
+        'season': features['season'].to_numpy(),
+        'group_id': features['group_id'].to_numpy(),
+        'stats': {season: stats[season] for season in seasons}
+    }
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data,)) as pool:
+            folds = list(pool.map(_run_fold, seasons, [params] * len(seasons),
+                                  [nthread] * len(seasons)))
+    else:
+        _init_worker(data)
+        folds = [_run_fold(season, params, nthread) for season in seasons]
+        _FOLD_DATA.clear()
+
+    predictions, summaries, groups = [], [], []
+    for season, train_rows, predicted, fit_seconds in folds:
+        test = features.loc[features['season'] == season, ['season', 'adate', 'group_id', 'acc_cases']]
+        test = test.assign(predicted=predicted)
+        predictions.append(test)
+
+        metrics = evaluate(test)
+        groups.append(metrics['group'].assign(season=season))
+        overall = segment_metrics(np.zeros(len(test)), test['acc_cases'], test['predicted']).iloc[0]
+        group_mae = metrics['group']['mae']
+        start, end = season_bounds(season)
+        summaries.append({
+            'season': season, 'test_start': start.date(), 'test_end': end.date(),
+            'train_rows': train_rows, 'test_rows': len(test), 'fit_seconds': fit_seconds,
+            'mae': overall['mae'], 'rmse': overall['rmse'], 'r2': overall['r2'],
+            'actual_sum': overall['actual_sum'], 'predicted_sum': overall['predicted_sum'],
+            'accuracy': overall['accuracy'],
+            'group_mae_p50': group_mae.quantile(0.5), 'group_mae_p90': group_mae.quantile(0.9),
+            'group_mae_max': group_mae.max()
+        })
+
+    groups = pd.concat(groups, ignore_index=True)
+    return {
+        'predictions': pd.concat(predictions, ignore_index=True),
+        'seasons': pd.DataFrame(summaries),
+        'groups': groups[['season'] + [c for c in groups.columns if c != 'season']]
+    }
+
+
+def write_backtest(results, seasons_path=SEASONS_PATH, groups_path=GROUPS_PATH):
+    """เขียนสรุปรายฤดูและ metric รายกลุ่มต่อฤดู (group_id เป็นป้ายชื่อ 'rcode_aampur_aplace')"""
+    groups = results['groups'].assign(group_id=lambda d: group_label(d['group_id']))
+    for path, table in ((seasons_path, results['seasons']), (groups_path, groups)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table.to_csv(path, index=False)
+    return [seasons_path, groups_path]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest over past New Year seasons')
+    parser.add_argument('--seasons', type=int, nargs='*', default=None,
+                        help='January years of the seasons to test (default: all with training data)')
+    parser.add_argument('--workers', type=int, default=1, help='folds run in parallel')
+    parser.add_argument('--nthread', type=int, default=None, help='XGBoost threads per fold')
+    parser.add_argument('--lag-mode', choices=LAG_MODES, default=DEFAULT_LAG_MODE)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = backtest(load_history(), args.seasons, args.workers, args.nthread,
+                       lag_mode=args.lag_mode)
+    paths = write_backtest(results)
+    print(f"✓ Backtested {len(results['seasons'])} seasons in {time.perf_counter() - t0:.1f}s")
+    columns = ['season', 'train_rows', 'test_rows', 'mae', 'rmse', 'r2', 'accuracy',
+               'group_mae_p50', 'group_mae_p90']
+    print(results['seasons'][columns].round(3).to_string(index=False))
+    for path in paths:
+        print(f"  • Saved: {path}")
@@ -0,0 +1,182 @@
+"""
+เกณฑ์สีและขนาดวงกลมของแผนที่ คำนวณครั้งเดียวต่อ (เวอร์ชันข้อมูล, ระดับการรวม) แล้วใช้ซ้ำทุกตัวกรอง
+
+แทน pd.qcut / pd.cut ใน map_render.marker_colors ที่คำนวณเกณฑ์ใหม่จากข้อมูลที่แสดงทุกครั้ง
+(และ fallback เมื่อแบ่ง quantile ไม่ได้) ซึ่งทำให้สีและคำอธิบายสีเปลี่ยนทุกครั้งที่ปรับช่วงวันที่
+- เกณฑ์อยู่ในหน่วย "อุบัติเหตุเฉลี่ยต่อวัน": quantile 5 ระดับ และค่าต่ำสุด/สูงสุดสำหรับรัศมี
+  ของยอดทั้งช่วงข้อมูลหารด้วยจำนวนวัน ตัวกรองใดก็ตามจึงใช้เกณฑ์ชุดเดียวกัน
+  (ยอดของตัวกรองหารด้วยจำนวนวันที่เลือกก่อนเทียบเกณฑ์)
+- ระดับการรวม: 'amphoe' (จุดรายอำเภอ) หรือ 'cluster-<zoom>' (กลุ่มจุดของ clustering.py)
+- กำหนดสีและรัศมีด้วย np.searchsorted / clip แบบ vectorized
+
+ตรวจกับ pd.qcut เดิมและดูเกณฑ์:
+    python src/binning.py
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# สี 5 ระดับ (เหลือง → ส้ม → แดง)
+COLOR_CLASSES = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+QUANTILES = (0.2, 0.4, 0.6, 0.8)
+MIN_RADIUS = 8
+MAX_RADIUS = 25
+MID_RADIUS = 15.0
+
+
+class MarkerBins:
+    """
+    เกณฑ์ของวงกลมบนแผนที่ (หน่วย: อุบัติเหตุเฉลี่ยต่อวัน)
+    - breaks: ขอบบนของสีระดับ 1-4 (ค่าเท่ากับขอบอยู่ระดับล่าง เหมือน pd.qcut)
+    - low / high: ค่าที่ได้รัศมี MIN_RADIUS / MAX_RADIUS (นอกช่วงจะถูก clip)
+    """
+
+    def __init__(self, breaks, low, high):
+        self.breaks = np.asarray(breaks, dtype=float)
+        self.low = float(low)
+        self.high = float(high)
+
+    @classmethod
+    def from_values(cls, values, n_days=1):
+        """เกณฑ์จากยอดชุดหนึ่ง (quantile เมื่อมีค่าไม่ซ้ำอย่างน้อย 5 ค่า ไม่เช่นนั้นแบ่งช่วงเท่ากัน)"""
+        rates = np.asarray(values, dtype=float) / max(n_days, 1)
+        rates = rates[~np.isnan(rates)]
+        if len(rates) == 0:
+            return cls(np.zeros(len(QUANTILES)), 0.0, 0.0)
+        low, high = rates.min(), rates.max()
+        if len(np.unique(rates)) >= len(COLOR_CLASSES):
+            breaks = np.quantile(rates, QUANTILES)
+        elif high > low:
+            breaks = np.linspace(low, high, len(COLOR_CLASSES) + 1)[1:-1]
+        else:
+            # ค่าเท่ากันหมด: อยู่ระดับกลาง
+            breaks = low + np.array([-2.0, -1.0, 1.0, 2.0])
+        return cls(breaks, low, high)
+
+    def classes(self, cases, n_days=1):
+        """ระดับสี 0-4 ของแต่ละยอด"""
+        rates = np.asarray(cases, dtype=float) / max(n_days, 1)
+        return np.searchsorted(self.breaks, rates, side='left')
+
+    def colors(self, cases, n_days=1):
+        return np.asarray(COLOR_CLASSES, dtype=object)[self.classes(cases, n_days)]
+
+    def radius(self, cases, n_days=1):
+        """รัศมีแบบ min-max ตามเกณฑ์ low-high (ค่าเท่ากันหมด = ขนาดกลาง)"""
+        rates = np.asarray(cases, dtype=float) / max(n_days, 1)
+        if self.high <= self.low:
+            return np.full(len(rates), MID_RADIUS)
+        ratio = np.clip((rates - self.low) / (self.high - self.low), 0.0, 1.0)
+        return MIN_RADIUS + ratio * (MAX_RADIUS - MIN_RADIUS)
+
+    def legend(self):
+        """รายการ (สี, ช่วงค่า) สำหรับคำอธิบายสี"""
+        edges = [f'{edge:,.2f}' if abs(edge) < 10 else f'{edge:,.1f}' for edge in self.breaks]
+        labels = ([f'≤ {edges[0]}']
+                  + [f'{edges[i - 1]} – {edges[i]}' for i in range(1, len(edges))]
+                  + [f'> {edges[-1]}'])
+        return list(zip(COLOR_CLASSES, labels))
+
+
+def view_days(cube, start_date, end_date):
+    """จำนวนวันของช่วงที่เลือกที่อยู่ในแกนวันที่ของ cube (ใช้หารยอดเป็นค่าต่อวัน)"""
+    i0, i1 = cube.day_range(start_date, end_date)
+    return max(i1 - i0, 1)
+
+
+def reference_values(cube, level='amphoe'):
+    """ยอดทั้งช่วงข้อมูลของระดับการรวม (amphoe / cluster-<zoom>) ที่ใช้คำนวณเกณฑ์"""
+    summary = cube.summary(cube.min_date, cube.max_date)
+    if level == 'amphoe':
+        return summary['predicted_cases'].to_numpy()
+    if level.startswith('cluster-'):
+        from clustering import cluster_points
+
+        return cluster_points(summary, int(level.split('-', 1)[1]))['predicted_cases'].to_numpy()
+    raise ValueError(f"level must be 'amphoe' or 'cluster-<zoom>', got {level!r}")
+
+
+_bins = {}
+_lock = threading.Lock()
+
+
+def get_bins(cube, data_version, level='amphoe'):
+    """เกณฑ์ของ (data_version, level) คำนวณครั้งแรกที่ขอแล้วเก็บไว้ใช้ร่วมกันทั้งโปรเซส"""
+    key = (data_version, level)
+    with _lock:
+        bins = _bins.get(key)
+    if bins is None:
+        bins = MarkerBins.from_values(reference_values(cube, level), len(cube.dates))
+        with _lock:
+            # จำกัดจำนวนชุด (โหมด what-if สร้าง data_version ใหม่ทุกคำขอ)
+            if len(_bins) >= 64:
+                _bins.clear()
+            _bins[key] = bins
+    return bins
+
+
+def _marker_colors_pandas(cases):
+    """
+    วิธีเดิม (pd.qcut / pd.cut ของข้อมูลที่แสดง) เก็บไว้ตรวจว่า searchsorted ให้ระดับเดียวกัน
+    คืนค่า None เมื่อวิธีเดิมแบ่งไม่ได้ (ขอบ quantile ซ้ำ) แล้วไปใช้ fallback
+    """
+    cases = pd.Series(np.asarray(cases, dtype=float))
+    try:
+        if cases.nunique() >= 5:
+            colors = pd.qcut(cases, q=5, labels=COLOR_CLASSES, duplicates='drop')
+        else:
+            colors = pd.cut(cases, bins=5, labels=COLOR_CLASSES, duplicates='drop',
+                            include_lowest=True)
+    except ValueError:
+        return None
+    return colors.astype(object).to_numpy()
+
+
+def check_binning(cube):
+    """เกณฑ์จากยอดของตัวกรองเอง ต้องให้สีเดียวกับ pd.qcut / pd.cut และ get_bins ต้องไม่ขึ้นกับตัวกรอง"""
+    start, end = cube.min_date, cube.max_date
+    summaries = [cube.summary(start, end)]
+    for province in cube.provinces(start, end)[:20]:
+        summaries.append(cube.summary(start, end, cube.column_mask(province=province)))
+    checked = 0
+    for summary in summaries:
+        cases = summary['predicted_cases'].to_numpy()
+        expected = _marker_colors_pandas(cases)
+        if expected is None:
+            continue
+        np.testing.assert_array_equal(MarkerBins.from_values(cases).colors(cases), expected)
+        checked += 1
+
+    # เกณฑ์ที่แคชไว้ต้องเท่ากับเกณฑ์ของยอดทั้งช่วงข้อมูลที่คำนวณใหม่ (ไม่ใช่ของตัวกรองใด)
+    bins = get_bins(cube, 'check')
+    assert get_bins(cube, 'check') is bins
+    reference = MarkerBins.from_values(reference_values(cube, 'amphoe'), len(cube.dates))
+    for other in (get_bins(cube, 'check-2'), reference):
+        np.testing.assert_array_equal(other.breaks, bins.breaks)
+        assert other.legend() == bins.legend()
+
+    # ตัวกรองจังหวัด / สัปดาห์แรก: ระดับสีต้องได้จากเกณฑ์ชุดเดียวกับทั้งประเทศ (ยอด ÷ จำนวนวัน)
+    week = cube.dates[6].date()
+    province = cube.provinces(start, end)[0]
+    views = [(start, week, None), (start, end, cube.column_mask(province=province))]
+    for view_start, view_end, mask in views:
+        cases = cube.summary(view_start, view_end, mask)['predicted_cases'].to_numpy()
+        n_days = view_days(cube, view_start, view_end)
+        expected = np.searchsorted(reference.breaks, cases / n_days, side='left')
+        np.testing.assert_array_equal(bins.classes(cases, n_days), expected)
+    weekly = cube.summary(start, week)['predicted_cases']
+    return checked, bins.classes(weekly, view_days(cube, start, week))
+
+
+if __name__ == '__main__':
+    from data_store import load_cube
+
+    cube = load_cube()
+    checked, weekly_classes = check_binning(cube)
+    print(f"✓ searchsorted colours match pd.qcut / pd.cut on {checked} views")
+    for level in ('amphoe', 'cluster-6', 'cluster-8'):
+        bins = get_bins(cube, 'main', level)
+        print(f"  • {level:<10} radius {bins.low:.2f}–{bins.high:.2f} cases/day, "
+              f"colours: {', '.join(label for _, label in bins.legend())}")
+    print(f"  • first week, amphoe classes: {np.bincount(weekly_classes, minlength=5).tolist()}")
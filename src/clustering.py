@@ -0,0 +1,110 @@
+"""
+รวมจุดอำเภอเป็นกลุ่มตามระดับซูม (grid clustering) ฝั่ง server
+
+ใช้กับแผนที่ทั้งประเทศ: แทนที่จะส่งวงกลม 900+ จุดและ HeatMap ไปที่ browser ทีเดียว
+จะส่งเฉพาะกลุ่มจุดของระดับซูมปัจจุบันที่อยู่ในกรอบแผนที่ที่มองเห็น
+"""
+import numpy as np
+import pandas as pd
+
+MIN_ZOOM = 5
+MAX_ZOOM = 11
+# ความกว้างของช่อง grid บนหน้าจอ (พิกเซล) ยิ่งมากยิ่งรวมจุดมาก
+CELL_PX = 60
+TILE_PX = 256
+
+
+def cell_size(zoom):
+    """ขนาดช่อง grid (องศา) ที่กว้าง CELL_PX พิกเซลบนหน้าจอ ณ ระดับซูมนั้น"""
+    return CELL_PX * 360.0 / (TILE_PX * 2 ** zoom)
+
+
+def cluster_points(summary, zoom):
+    """
+    รวมอำเภอที่อยู่ในช่อง grid เดียวกันเป็น 1 กลุ่ม (vectorized ด้วย np.unique + bincount)
+    คืนค่า DataFrame: LAT, LONG, predicted_cases, n_amphoes, AMPHOE_T, CHANGWAT_T
+    - กลุ่มที่มีอำเภอเดียวจะใช้ชื่ออำเภอ/จังหวัดจริง
+    """
+    valid = (summary['LAT'].notna() & summary['LONG'].notna()).to_numpy()
+    lat = summary['LAT'].to_numpy(dtype=float)[valid]
+    lon = summary['LONG'].to_numpy(dtype=float)[valid]
+    cases = summary['predicted_cases'].to_numpy(dtype=float)[valid]
+    amphoe = summary['AMPHOE_T'].to_numpy(dtype=object)[valid]
+    province_codes, province_names = pd.factorize(summary['CHANGWAT_T'].to_numpy()[valid])
+
+    if len(lat) == 0:
+        return pd.DataFrame(columns=['LAT', 'LONG', 'predicted_cases', 'n_amphoes',
+                                     'AMPHOE_T', 'CHANGWAT_T'])
+
+    size = cell_size(zoom)
+    cells = np.stack([np.floor(lat / size), np.floor(lon / size)], axis=1).astype(np.int64)
+    _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    n_clusters = len(first)
+
+    counts = np.bincount(inverse, minlength=n_clusters)
+    totals = np.bincount(inverse, weights=cases, minlength=n_clusters)
+    centroid_lat = np.bincount(inverse, weights=lat, minlength=n_clusters) / counts
+    centroid_lon = np.bincount(inverse, weights=lon, minlength=n_clusters) / counts
+
+    # กลุ่มอยู่ในจังหวัดเดียวเมื่อรหัสจังหวัดต่ำสุด = สูงสุด
+    min_code = np.full(n_clusters, np.iinfo(np.int64).max)
+    max_code = np.full(n_clusters, -1)
+    np.minimum.at(min_code, inverse, province_codes)
+    np.maximum.at(max_code, inverse, province_codes)
+    single_province = min_code == max_code
+
+    labels = np.where(counts == 1, amphoe[first], [f'{n} อำเภอ' for n in counts])
+    provinces = np.where(single_province,
+                         np.asarray(province_names, dtype=object)[min_code.clip(0)],
+                         'หลายจังหวัด')
+
+    return pd.DataFrame({
+        'LAT': centroid_lat,
+        'LONG': centroid_lon,
+        'predicted_cases': totals,
+        'n_amphoes': counts,
+        'AMPHOE_T': labels,
+        'CHANGWAT_T': provinces
+    })
+
+
+class ClusterPyramid:
+    """กลุ่มจุดที่คำนวณไว้ล่วงหน้าทุกระดับซูม (MIN_ZOOM..MAX_ZOOM) ของตารางสรุปชุดเดียว"""
+
+    def __init__(self, summary, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels = {zoom: cluster_points(summary, zoom)
+                       for zoom in range(min_zoom, max_zoom + 1)}
+
+    def level(self, zoom):
+        """กลุ่มจุดของระดับซูมที่ใกล้ที่สุดที่คำนวณไว้"""
+        zoom = int(min(max(round(zoom), self.min_zoom), self.max_zoom))
+        return self.levels[zoom]
+
+    def visible(self, zoom, bounds=None):
+        """
+        กลุ่มจุดของระดับซูมนั้นที่อยู่ในกรอบแผนที่ (เผื่อขอบ 1 ช่อง grid)
+        - bounds: ((south, west), (north, east)) หรือ None = ทั้งหมด
+        """
+        clusters = self.level(zoom)
+        if bounds is None:
+            return clusters
+
+        (south, west), (north, east) = bounds
+        pad = cell_size(min(max(round(zoom), self.min_zoom), self.max_zoom))
+        lat = clusters['LAT'].to_numpy()
+        lon = clusters['LONG'].to_numpy()
+        inside = ((lat >= south - pad) & (lat <= north + pad)
+                  & (lon >= west - pad) & (lon <= east + pad))
+        return clusters[inside].reset_index(drop=True)
+
+
+def parse_leaflet_bounds(bounds):
+    """แปลง bounds จาก st_folium ({'_southWest': {...}, '_northEast': {...}}) เป็น tuple"""
+    try:
+        south_west, north_east = bounds['_southWest'], bounds['_northEast']
+        return ((south_west['lat'], south_west['lng']), (north_east['lat'], north_east['lng']))
+    except (TypeError, KeyError):
+        return None
@@ -0,0 +1,29 @@
+"""
+ค่าตั้งค่าของแอป (path ข้อมูล, ขนาดแคช, warm-up) อ่านจาก environment variable
+
+ค่าเริ่มต้นอ้างอิงจากตำแหน่งของไฟล์นี้ จึงรันได้ทั้งจาก root ของ repo (streamlit run src/web.py)
+และจากในโฟลเดอร์ src (streamlit run web_local.py) โดยไม่ต้องแก้ path ในโค้ด
+"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ไฟล์ต้นทางและคลังข้อมูล
+FORECAST_PATH = os.environ.get('FORECAST_PATH', os.path.join(BASE_DIR, 'forecast_2025_2026.csv'))
+COORD_PATH = os.environ.get('COORD_PATH', os.path.join(BASE_DIR, 'coordinate', 'tambon.csv'))
+STORE_DIR = os.environ.get('STORE_DIR', os.path.join(BASE_DIR, 'store'))
+
+# ข้อมูลอุบัติเหตุย้อนหลังและโมเดล (ใช้ตอนสร้างไฟล์พยากรณ์)
+HISTORY_PATH = os.environ.get('HISTORY_PATH', os.path.join(os.path.dirname(BASE_DIR), 'dataset', 'accident_count4col.csv'))
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(BASE_DIR, 'models'))
+MODEL_PATH = os.path.join(MODEL_DIR, 'xgboost_accident_model.json')
+# ผลประเมินโมเดล (models/evaluation ที่ root ของ repo ตำแหน่งเดียวกับไฟล์ที่โน้ตบุ๊กบันทึก)
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(os.path.dirname(BASE_DIR), 'models', 'evaluation'))
+
+# แคช HTML แผนที่ที่ใช้ร่วมกันทุก session
+MAP_CACHE_MB = int(os.environ.get('MAP_CACHE_MB', 128))
+
+# warm-up แคชตอนเริ่มแอป (WARMUP=0 เพื่อปิด)
+WARMUP_ENABLED = os.environ.get('WARMUP', '1') != '0'
+WARMUP_BUDGET_SECONDS = float(os.environ.get('WARMUP_BUDGET_SECONDS', 60))
+WARMUP_WORKERS = int(os.environ.get('WARMUP_WORKERS', min(4, os.cpu_count() or 1)))
@@ -0,0 +1,161 @@
+"""
+Cube สรุปยอดพยากรณ์ (วัน × อำเภอ) พร้อม prefix sum ตามแกนวันที่
+
+ผลรวมของช่วงวันที่ใดๆ = prefix[end + 1] - prefix[start] จึงไม่ต้องกรองแถว, merge
+หรือ groupby ใหม่ทุกครั้งที่ผู้ใช้เปลี่ยนตัวกรองใน sidebar
+"""
+import numpy as np
+import pandas as pd
+
+# ข้อมูลประจำคอลัมน์ (1 คอลัมน์ต่อ 1 rcode)
+COLUMN_FIELDS = ['rcode', 'AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG']
+SUMMARY_FIELDS = ['AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG']
+
+
+class AccidentCube:
+    """
+    ยอดพยากรณ์สะสมรายวันของแต่ละอำเภอ
+    - dates: วันที่เรียงต่อเนื่องรายวัน (n_days)
+    - columns: ข้อมูลอำเภอของแต่ละคอลัมน์ (n_cols แถว)
+    - prefix: ผลรวมสะสมของ predicted_cases ขนาด (n_days + 1, n_cols)
+    - count_prefix: จำนวนแถวสะสม ใช้แยกวันที่ไม่มีข้อมูลออกจากวันที่มียอดเป็น 0
+    """
+
+    def __init__(self, dates, columns, prefix, count_prefix):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = columns.reset_index(drop=True)
+        self.prefix = prefix
+        self.count_prefix = count_prefix
+
+        self._province = self.columns['CHANGWAT_T'].to_numpy()
+        # รหัสจังหวัดแบบจำนวนเต็ม (เรียงตามชื่อ, -1 = ไม่มีชื่อ) สำหรับรวมยอดด้วย bincount
+        self._province_code, self._province_names = pd.factorize(self._province, sort=True)
+        self._amphoe = self.columns['AMPHOE_T'].to_numpy()
+        self._has_coord = (self.columns['LAT'].notna() & self.columns['LONG'].notna()
+                           & self.columns['AMPHOE_T'].notna()).to_numpy()
+
+    @classmethod
+    def from_forecast(cls, forecast_df):
+        """สร้าง cube จากตารางพยากรณ์ที่ join พิกัดอำเภอแล้ว"""
+        dates = pd.date_range(forecast_df['adate'].min(), forecast_df['adate'].max(), freq='D')
+        day_idx = ((forecast_df['adate'].to_numpy() - dates[0].to_datetime64())
+                   // np.timedelta64(1, 'D')).astype(np.int64)
+
+        rcodes, col_idx = np.unique(forecast_df['rcode'].to_numpy(), return_inverse=True)
+        n_days, n_cols = len(dates), len(rcodes)
+
+        # รวมยอดลงช่อง (วัน, อำเภอ) ด้วย bincount บน index แบบแบน
+        flat_idx = day_idx * n_cols + col_idx
+        values = np.bincount(flat_idx, weights=forecast_df['predicted_cases'].to_numpy(),
+                             minlength=n_days * n_cols).reshape(n_days, n_cols)
+        counts = np.bincount(flat_idx, minlength=n_days * n_cols).reshape(n_days, n_cols)
+
+        prefix = np.zeros((n_days + 1, n_cols), dtype=np.float64)
+        np.cumsum(values, axis=0, out=prefix[1:])
+        count_prefix = np.zeros((n_days + 1, n_cols), dtype=np.int32)
+        np.cumsum(counts, axis=0, out=count_prefix[1:])
+
+        columns = (forecast_df.drop_duplicates('rcode')
+                   .sort_values('rcode')[COLUMN_FIELDS]
+                   .reset_index(drop=True))
+        return cls(dates, columns, prefix, count_prefix)
+
+    @property
+    def has_coord(self):
+        """mask ของคอลัมน์ที่มีพิกัดและชื่ออำเภอ (อำเภอที่ summary แสดงได้)"""
+        return self._has_coord
+
+    @property
+    def province_codes(self):
+        """รหัสจังหวัดของแต่ละคอลัมน์ (index ใน province_names, -1 = ไม่มีชื่อจังหวัด)"""
+        return self._province_code
+
+    @property
+    def province_names(self):
+        """ชื่อจังหวัดเรียงตามตัวอักษร (ตามรหัสใน province_codes)"""
+        return self._province_names
+
+    @property
+    def min_date(self):
+        return self.dates[0].date()
+
+    @property
+    def max_date(self):
+        return self.dates[-1].date()
+
+    def day_range(self, start_date, end_date):
+        """แปลงช่วงวันที่ (รวมปลายทั้งสองด้าน) เป็นช่วง index [i0, i1) ของแกนวันที่"""
+        i0 = self.dates.searchsorted(pd.Timestamp(start_date), side='left')
+        i1 = self.dates.searchsorted(pd.Timestamp(end_date), side='right')
+        return i0, max(i0, i1)
+
+    def column_totals(self, start_date, end_date):
+        """ยอดรวมและจำนวนแถวของแต่ละอำเภอในช่วงวันที่ (slice-and-subtract)"""
+        i0, i1 = self.day_range(start_date, end_date)
+        totals = self.prefix[i1] - self.prefix[i0]
+        counts = self.count_prefix[i1] - self.count_prefix[i0]
+        return totals, counts
+
+    def column_mask(self, province=None, amphoe=None):
+        """เลือกคอลัมน์ตามจังหวัด/อำเภอ (None = ทั้งหมด)"""
+        mask = np.ones(len(self.columns), dtype=bool)
+        if province is not None:
+            mask &= self._province == province
+        if amphoe is not None:
+            mask &= self._amphoe == amphoe
+        return mask
+
+    def provinces(self, start_date, end_date):
+        """รายชื่อจังหวัดที่มีข้อมูลในช่วงวันที่ (เรียงตามตัวอักษร)"""
+        _, counts = self.column_totals(start_date, end_date)
+        names = self._province[(counts > 0) & pd.notna(self._province)]
+        return sorted(set(names.tolist()))
+
+    def amphoes(self, start_date, end_date, province=None):
+        """รายชื่ออำเภอที่มีข้อมูลในช่วงวันที่ (กรองตามจังหวัดได้)"""
+        _, counts = self.column_totals(start_date, end_date)
+        mask = self.column_mask(province=province) & (counts > 0) & pd.notna(self._amphoe)
+        return sorted(set(self._amphoe[mask].tolist()))
+
+    def province_of(self, amphoe):
+        """จังหวัดของอำเภอ (คอลัมน์แรกที่ชื่อตรงกัน)"""
+        matches = np.flatnonzero(self._amphoe == amphoe)
+        return self._province[matches[0]] if len(matches) > 0 else None
+
+    def summary(self, start_date, end_date, mask=None):
+        """
+        ยอดรวมรายอำเภอ (แทน merge + groupby เดิม)
+        - ตัดอำเภอที่ไม่มีพิกัดหรือไม่มีข้อมูลในช่วงวันที่ออก เหมือน groupby ที่ dropna
+        """
+        totals, counts = self.column_totals(start_date, end_date)
+        keep = self._has_coord & (counts > 0)
+        if mask is not None:
+            keep &= mask
+
+        summary = self.columns.loc[keep, SUMMARY_FIELDS].reset_index(drop=True)
+        summary['predicted_cases'] = totals[keep]
+        return summary
+
+    def daily(self, start_date, end_date, mask=None):
+        """ยอดรวมรายวันของคอลัมน์ที่เลือก (เฉพาะวันที่มีข้อมูล)"""
+        i0, i1 = self.day_range(start_date, end_date)
+        cols = slice(None) if mask is None else mask
+
+        totals = np.diff(self.prefix[i0:i1 + 1, cols].sum(axis=1))
+        counts = np.diff(self.count_prefix[i0:i1 + 1, cols].sum(axis=1))
+        present = counts > 0
+
+        return pd.DataFrame({
+            'adate': self.dates[i0:i1][present],
+            'predicted_cases': totals[present]
+        })
+
+
+def province_totals(summary):
+    """ยอดรวมรายจังหวัดจากตารางสรุปรายอำเภอ (ใช้ร่วมกันระหว่างแดชบอร์ดและ API)"""
+    return summary.groupby('CHANGWAT_T')['predicted_cases'].sum().reset_index()
+
+
+def top_n(summary, n=10):
+    """n แถวที่มียอดพยากรณ์สูงสุด"""
+    return summary.nlargest(n, 'predicted_cases')
@@ -0,0 +1,327 @@
+"""
+ส่วนข้อมูลของแดชบอร์ด: โหลดคลังข้อมูล, สรุปยอดตามตัวกรอง และสร้างกราฟ/แผนที่/ไฟล์ดาวน์โหลด
+
+web.py เป็นเพียงส่วนแสดงผล (layout) ที่เรียกฟังก์ชันในไฟล์นี้
+- ฟังก์ชันที่ใช้เวลาถูกแคชด้วย st.cache_* แยกกัน (key = เวอร์ชันข้อมูล + ตัวกรอง)
+- ฟังก์ชันสร้างกราฟเป็นฟังก์ชันธรรมดา รับ DataFrame คืน figure จึงวัดเวลา/ทดสอบแยกได้
+
+วัดเวลาของแต่ละขั้นตอน:
+    python src/dashboard.py
+"""
+import time
+import hashlib
+import threading
+
+import streamlit as st
+import plotly.express as px
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from aggregations import analysis_bundle
+from binning import get_bins, view_days
+from clustering import MAX_ZOOM, MIN_ZOOM, ClusterPyramid
+from config import MAP_CACHE_MB, WARMUP_ENABLED
+from cube import AccidentCube, top_n
+from data_store import ensure_store, load_cube, load_store
+from exports import export_bytes, iter_frames
+from features import load_history
+from inference import get_predictor, model_version
+from map_render import build_map
+from render_cache import RenderCache, map_cache_key
+from spatial import ForecastSpatial, load_tambons
+from warmup import load_warm, start_background_warmup
+from whatif import WhatIfForecaster
+
+DAY_NAMES_TH = {
+    0: 'จันทร์', 1: 'อังคาร', 2: 'พุธ', 3: 'พฤหัสบดี',
+    4: 'ศุกร์', 5: 'เสาร์', 6: 'อาทิตย์'
+}
+TOP_COLOR_SCALE = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+CHART_HEIGHT = 350
+CHART_MARGIN = dict(l=20, r=20, t=20, b=20)
+
+
+# ---------- โหลดข้อมูล ----------
+
+@st.cache_resource
+def load_store_cached(data_version):
+    """เปิดคลังข้อมูลครั้งเดียวต่อเวอร์ชันข้อมูล (ใช้ cache_resource เพื่อไม่ให้ copy memory-map)"""
+    return load_cube()
+
+
+def load_data():
+    """
+    โหลด cube ข้อมูลพยากรณ์รายวัน × อำเภอ (จากคลังข้อมูลแบบ memory-map)
+    - build คลังข้อมูลใหม่เฉพาะเมื่อไฟล์พยากรณ์เปลี่ยน
+    คืนค่า (cube, data_version)
+    """
+    data_version = ensure_store()
+    return load_store_cached(data_version), data_version
+
+
+@st.cache_resource
+def get_map_cache():
+    """แคช HTML ของแผนที่ที่ใช้ร่วมกันทุก session (ขนาดกำหนดด้วย MAP_CACHE_MB)"""
+    return RenderCache(max_bytes=MAP_CACHE_MB * 1024 * 1024)
+
+
+@st.cache_resource
+def warm_up(data_version):
+    """
+    warm แคชครั้งเดียวต่อเวอร์ชันข้อมูล
+    - โหลด HTML แผนที่ที่ render ไว้ตอน build image (python src/warmup.py)
+    - render แผนที่ที่เหลือ และเติม load_view / load_figures ของมุมมองเริ่มต้น
+      ใน thread เบื้องหลัง (ปิดได้ด้วย WARMUP=0)
+    """
+    map_cache = get_map_cache()
+    map_cache.set_version(data_version)
+    load_warm(map_cache, data_version)
+    if WARMUP_ENABLED:
+        cube = load_store_cached(data_version)
+        ctx = get_script_run_ctx()
+
+        def warm_figures(start_date, end_date, province, amphoe):
+            # ผูก context ของ script ให้ thread เบื้องหลัง (ไม่เช่นนั้น Streamlit เตือนทุกครั้งที่เรียกแคช)
+            add_script_run_ctx(threading.current_thread(), ctx)
+            # load_figures เรียก load_view จึง warm ทั้งผลรวมและกราฟ
+            load_figures(cube, data_version, start_date, end_date, province, amphoe)
+
+        start_background_warmup(map_cache, data_version, loaders=(warm_figures,))
+
+
+# ---------- พยากรณ์ what-if ----------
+
+@st.cache_resource(max_entries=2)
+def get_whatif_forecaster(model_version, _columns):
+    """ตัวพยากรณ์ what-if (พร้อมแคชผลทำนายต่อ กลุ่ม × วันที่) ใช้ร่วมกันทุก session ต่อเวอร์ชันโมเดล"""
+    return WhatIfForecaster(get_predictor(), load_history(), _columns, model_version)
+
+
+def whatif_provinces(cube):
+    """จังหวัดที่มีกลุ่มให้พยากรณ์สดได้"""
+    return get_whatif_forecaster(model_version(), cube.columns).provinces()
+
+
+def load_whatif(cube, start_date, end_date, provinces=()):
+    """
+    พยากรณ์สดตามช่วงวันที่ + จังหวัดที่เลือก แล้วสร้าง cube ของผลลัพธ์ (ใช้กับตัวกรอง/แท็บเดิมได้)
+    คืนค่า (cube, data_version, สถิติ hit/miss/เวลา, ตารางพยากรณ์รายกลุ่ม)
+    - data_version ขึ้นกับเวอร์ชันโมเดล + คำขอ จึงไม่ชนกับแคชของข้อมูลหลัก
+    """
+    version = model_version()
+    forecaster = get_whatif_forecaster(version, cube.columns)
+    provinces = tuple(sorted(provinces))
+    forecast_df, stats = forecaster.predict(start_date, end_date, provinces)
+    request = f"{version}|{start_date}|{end_date}|{','.join(provinces)}"
+    data_version = 'whatif-' + hashlib.sha1(request.encode('utf-8')).hexdigest()[:16]
+    return _whatif_cube(forecast_df, data_version), data_version, stats, forecast_df
+
+
+@st.cache_resource(max_entries=16)
+def _whatif_cube(_forecast_df, data_version):
+    return AccidentCube.from_forecast(_forecast_df)
+
+
+@st.cache_data(max_entries=16)
+def whatif_map_html(_cube, _accident_summary, data_version, start_date, end_date, province=None, amphoe=None):
+    """HTML ของแผนที่โหมด what-if (แคชแยกจาก RenderCache ของข้อมูลหลัก ไม่ให้ set_version ล้างแคชหลัก)"""
+    bins = get_bins(_cube, data_version)
+    return build_map(_accident_summary, bins, view_days(_cube, start_date, end_date)).get_root().render()
+
+
+# ---------- สรุปยอดตามตัวกรอง ----------
+
+@st.cache_data(max_entries=64)
+def load_view(_cube, data_version, start_date, end_date, province=None, amphoe=None):
+    """
+    ผลรวมทุกแบบของตัวกรองหนึ่งชุด (aggregations.analysis_bundle) ใช้ร่วมกันทุกกราฟ/ตาราง/ตัวเลขสรุป
+    คืนค่า dict: summary, daily_trend, daily_all, weekday, provinces, stats
+    - daily_all: ยอดรายวันของทุกพื้นที่ในช่วงวันที่ (ไม่ขึ้นกับตัวกรองพื้นที่)
+    """
+    mask = _cube.column_mask(province=province, amphoe=amphoe)
+    return analysis_bundle(_cube, start_date, end_date, mask)
+
+
+@st.cache_resource(max_entries=32)
+def load_cluster_pyramid(_cube, data_version, start_date, end_date):
+    """กลุ่มจุดทุกระดับซูมของทั้งประเทศ คำนวณครั้งเดียวต่อช่วงวันที่"""
+    return ClusterPyramid(_cube.summary(start_date, end_date))
+
+
+def map_bins(cube, data_version, zoom=None):
+    """
+    เกณฑ์สี/ขนาดวงกลมของเวอร์ชันข้อมูล (binning.get_bins) ใช้ชุดเดียวกันทุกตัวกรอง
+    - zoom: ระดับซูมของโหมดกลุ่มจุด (None = จุดรายอำเภอ)
+    """
+    if zoom is None:
+        return get_bins(cube, data_version)
+    return get_bins(cube, data_version, f"cluster-{int(min(max(round(zoom), MIN_ZOOM), MAX_ZOOM))}")
+
+
+def map_html(cube, accident_summary, data_version, start_date, end_date, province=None, amphoe=None):
+    """
+    HTML ของแผนที่ (วงกลมทุกอำเภอเป็น GeoJSON layer เดียว + HeatMap)
+    ถูกแคชตามตัวกรอง + เวอร์ชันข้อมูล จึงไม่ต้องสร้างใหม่ทุก rerun
+    """
+    map_cache = get_map_cache()
+    map_cache.set_version(data_version)
+    return map_cache.get_or_create(
+        map_cache_key(start_date, end_date, province, amphoe),
+        lambda: build_map(accident_summary, map_bins(cube, data_version),
+                          view_days(cube, start_date, end_date)).get_root().render()
+    )
+
+
+@st.cache_resource(max_entries=4)
+def load_spatial(_cube, data_version):
+    """ดัชนีพิกัดอำเภอ/ตำบล (spatial.py) สร้างครั้งเดียวต่อเวอร์ชันข้อมูล"""
+    return ForecastSpatial(_cube, load_tambons())
+
+
+# ---------- กราฟ ----------
+
+def trend_figure(daily_trend):
+    """กราฟแนวโน้มอุบัติเหตุตามวันที่"""
+    fig = px.line(
+        daily_trend,
+        x='adate',
+        y='predicted_cases',
+        labels={'adate': 'วันที่', 'predicted_cases': 'จำนวนอุบัติเหตุ'},
+        template='plotly_white'
+    )
+    fig.update_traces(line_color='#d32f2f', line_width=3)
+    fig.update_layout(height=CHART_HEIGHT, margin=CHART_MARGIN, hovermode='x unified')
+    return fig
+
+
+def top_amphoe_figure(accident_summary, n=10):
+    """กราฟแท่ง Top n อำเภอที่มีอุบัติเหตุสูงสุด"""
+    top_amphoes = top_n(accident_summary, n)
+    top_amphoes['label'] = top_amphoes['AMPHOE_T'] + ', ' + top_amphoes['CHANGWAT_T']
+
+    fig = px.bar(
+        top_amphoes,
+        x='predicted_cases',
+        y='label',
+        orientation='h',
+        labels={'predicted_cases': 'จำนวนอุบัติเหตุ', 'label': 'อำเภอ'},
+        template='plotly_white',
+        color='predicted_cases',
+        color_continuous_scale=TOP_COLOR_SCALE
+    )
+    fig.update_layout(
+        height=CHART_HEIGHT,
+        margin=CHART_MARGIN,
+        showlegend=False,
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    fig.update_coloraxes(showscale=False)
+    return fig
+
+
+def weekday_figure(weekday):
+    """กราฟการกระจายอุบัติเหตุตามวันในสัปดาห์ (weekday: ยอดรวมตามวันในสัปดาห์ เรียงจันทร์ → อาทิตย์)"""
+    fig = px.bar(
+        weekday.assign(day_of_week_thai=weekday['day_of_week_num'].map(DAY_NAMES_TH)),
+        x='day_of_week_thai',
+        y='predicted_cases',
+        labels={'day_of_week_thai': 'วัน', 'predicted_cases': 'จำนวนอุบัติเหตุ'},
+        template='plotly_white',
+        color='predicted_cases',
+        color_continuous_scale='Reds'
+    )
+    fig.update_layout(height=CHART_HEIGHT, margin=CHART_MARGIN, showlegend=False)
+    fig.update_coloraxes(showscale=False)
+    return fig
+
+
+def province_figure(provinces, n=10):
+    """กราฟวงกลมสัดส่วนอุบัติเหตุของ Top n จังหวัด (provinces: ยอดรวมรายจังหวัด)"""
+    fig = px.pie(
+        top_n(provinces, n),
+        values='predicted_cases',
+        names='CHANGWAT_T',
+        template='plotly_white',
+        color_discrete_sequence=px.colors.sequential.Reds_r
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=CHART_HEIGHT, margin=CHART_MARGIN, showlegend=False)
+    return fig
+
+
+@st.cache_resource(max_entries=64)
+def load_figures(_cube, data_version, start_date, end_date, province=None, amphoe=None):
+    """กราฟทั้ง 4 ของแท็บการวิเคราะห์ สร้างครั้งเดียวต่อตัวกรอง จากผลรวมชุดเดียวกับ load_view"""
+    view = load_view(_cube, data_version, start_date, end_date, province, amphoe)
+    return {
+        'trend': trend_figure(view['daily_trend']),
+        'top_amphoe': top_amphoe_figure(view['summary']),
+        'weekday': weekday_figure(view['weekday']),
+        'province': province_figure(view['provinces'])
+    }
+
+
+# ---------- ตารางและไฟล์ดาวน์โหลด ----------
+
+def summary_table(accident_summary):
+    """ตารางรายละเอียดสำหรับแสดงผล (เรียงจากมากไปน้อย)"""
+    display_df = accident_summary[['CHANGWAT_T', 'AMPHOE_T', 'predicted_cases']].copy()
+    display_df.columns = ['จังหวัด', 'อำเภอ', 'จำนวนอุบัติเหตุ (ครั้ง)']
+    display_df = display_df.sort_values('จำนวนอุบัติเหตุ (ครั้ง)', ascending=False)
+    display_df['จำนวนอุบัติเหตุ (ครั้ง)'] = display_df['จำนวนอุบัติเหตุ (ครั้ง)'].map('{:.0f}'.format)
+    return display_df
+
+
+@st.cache_resource
+def load_source_cached(data_version):
+    """ตารางพยากรณ์รายกลุ่มของคลังข้อมูล (memory-map) สำหรับไฟล์ส่งออกรายกลุ่ม"""
+    return load_store()[0]
+
+
+@st.cache_data(max_entries=16)
+def load_export(_cube, data_version, dataset, fmt, start_date, end_date, province=None, amphoe=None,
+                _source=None):
+    """
+    ไฟล์ส่งออกของตัวกรองหนึ่งชุด (exports.py) สร้างเมื่อผู้ใช้ขอเท่านั้น แคชเป็น bytes ตามตัวกรอง + รูปแบบ
+    - _source: ตารางรายกลุ่ม (None = ของคลังข้อมูล)
+    """
+    if _source is None and dataset == 'groups':
+        _source = load_source_cached(data_version)
+    return export_bytes(iter_frames(dataset, _cube, start_date, end_date, province, amphoe,
+                                    source=_source), fmt)
+
+
+# ---------- วัดเวลา ----------
+
+def benchmark_view(province=None, amphoe=None, repeat=5):
+    """เวลาเฉลี่ย (มิลลิวินาที) ของแต่ละขั้นตอนสำหรับตัวกรองหนึ่งชุด โดยไม่ผ่านแคช"""
+    cube = load_cube()
+    start_date, end_date = cube.min_date, cube.max_date
+    mask = cube.column_mask(province=province, amphoe=amphoe)
+    view = analysis_bundle(cube, start_date, end_date, mask)
+    accident_summary = view['summary']
+
+    steps = {
+        'analysis_bundle': lambda: analysis_bundle(cube, start_date, end_date, mask),
+        'trend_figure': lambda: trend_figure(view['daily_trend']),
+        'top_amphoe_figure': lambda: top_amphoe_figure(accident_summary),
+        'weekday_figure': lambda: weekday_figure(view['weekday']),
+        'province_figure': lambda: province_figure(view['provinces']),
+        'summary_table': lambda: summary_table(accident_summary),
+        'summary_csv': lambda: export_bytes(iter_frames('summary', cube, start_date, end_date,
+                                                        province, amphoe)),
+        'daily_csv': lambda: export_bytes(iter_frames('daily', cube, start_date, end_date)),
+        'map_html': lambda: build_map(accident_summary, get_bins(cube, 'benchmark'),
+                                      view_days(cube, start_date, end_date)).get_root().render()
+    }
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            step()
+        timings[name] = (time.perf_counter() - start) / repeat * 1000
+    return timings
+
+
+if __name__ == '__main__':
+    for name, ms in benchmark_view().items():
+        print(f"  • {name:<18} {ms:8.1f} ms")
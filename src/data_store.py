@@ -0,0 +1,219 @@
+"""
+คลังข้อมูลแบบคอลัมน์ (columnar store) สำหรับหน้าแดชบอร์ด
+
+ขั้นตอน build จะอ่าน forecast_2025_2026.csv และ coordinate/tambon.csv เพียงครั้งเดียว
+แปลงวันที่, ทำ rcode ให้เป็นรหัส 4 หลัก และ join พิกัดกึ่งกลางอำเภอไว้ล่วงหน้า
+แล้วเขียนแต่ละคอลัมน์เป็นไฟล์ .npy เพื่อให้ load_store เปิดแบบ memory-map ได้ทันที
+
+รันใหม่ทุกครั้งที่มีการอัพเดทไฟล์พยากรณ์:
+    python src/data_store.py
+"""
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from config import FORECAST_PATH, COORD_PATH, STORE_DIR
+from cube import AccidentCube, COLUMN_FIELDS
+from schema import read_forecast
+
+# เพิ่มเลขนี้เมื่อเปลี่ยนโครงสร้างไฟล์ในคลัง เพื่อบังคับให้ build ใหม่
+STORE_FORMAT = 3
+
+FORECAST_COLUMNS = [
+    'adate', 'rcode', 'aampur_clean', 'aplace_clean', 'predicted_cases',
+    'rcode_str', 'AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG', 'CH_ID'
+]
+AMPHOE_COLUMNS = ['AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG', 'CH_ID']
+
+
+def source_fingerprint(forecast_path=FORECAST_PATH, coord_path=COORD_PATH):
+    """ขนาดและเวลาแก้ไขของไฟล์ต้นทาง ใช้ตรวจว่าคลังข้อมูลล้าสมัยหรือไม่"""
+    fingerprint = []
+    for path in (forecast_path, coord_path):
+        stat = os.stat(path)
+        fingerprint.append({
+            'file': os.path.basename(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        })
+    return fingerprint
+
+
+def make_data_version(fingerprint):
+    """สร้างรหัสเวอร์ชันข้อมูลแบบสั้นจาก fingerprint"""
+    payload = json.dumps([STORE_FORMAT, fingerprint], sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
+def build_amphoe_coord(coord_df):
+    """รวมพิกัดตำบลให้เป็นพิกัดกึ่งกลางของแต่ละอำเภอ (ใช้ค่าเฉลี่ย)"""
+    coord_df = coord_df.copy()
+    coord_df['AM_ID_CLEAN'] = coord_df['AM_ID'].astype(str).str.zfill(4)
+
+    return coord_df.groupby(['AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T']).agg({
+        'LAT': 'mean',
+        'LONG': 'mean',
+        'CH_ID': 'first'
+    }).reset_index()
+
+
+def _write_column(store_dir, name, values):
+    """เขียนคอลัมน์ลงไฟล์ .npy (คอลัมน์ข้อความเก็บเป็น codes + categories)"""
+    values = np.asarray(values)
+    if values.dtype == object:
+        codes, categories = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        np.save(os.path.join(store_dir, f'{name}.codes.npy'), codes.astype(np.int32))
+        np.save(os.path.join(store_dir, f'{name}.categories.npy'),
+                np.asarray(categories, dtype=str))
+    else:
+        np.save(os.path.join(store_dir, f'{name}.npy'), values)
+
+
+def _read_column(store_dir, name, categorical=False):
+    """
+    อ่านคอลัมน์แบบ memory-map (คอลัมน์ข้อความจะถูกแปลงกลับเป็น object)
+    - categorical=True: คืนคอลัมน์ข้อความเป็น pd.Categorical (ใช้ codes เดิม ไม่สร้างสตริงทุกแถว)
+    """
+    path = os.path.join(store_dir, f'{name}.npy')
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+
+    codes = np.load(os.path.join(store_dir, f'{name}.codes.npy'), mmap_mode='r')
+    categories = np.load(os.path.join(store_dir, f'{name}.categories.npy')).astype(object)
+    if categorical:
+        return pd.Categorical.from_codes(codes, categories=categories)
+    # เพิ่ม NaN ไว้ท้ายสุด เพื่อให้ code -1 ชี้ไปที่ค่าว่าง
+    lookup = np.append(categories, np.nan)
+    return lookup[codes]
+
+
+def build_store(forecast_path=FORECAST_PATH, coord_path=COORD_PATH, store_dir=STORE_DIR):
+    """
+    สร้างคลังข้อมูลใหม่จากไฟล์ CSV ต้นทาง
+    - เขียนลงโฟลเดอร์ชั่วคราวก่อน แล้วค่อยสลับ เพื่อไม่ให้ผู้อ่านเห็นไฟล์ครึ่งๆ กลางๆ
+    """
+    fingerprint = source_fingerprint(forecast_path, coord_path)
+
+    forecast_df = read_forecast(forecast_path)
+    forecast_df['rcode_str'] = forecast_df['rcode'].astype(str).str.zfill(4)
+
+    amphoe_coord = build_amphoe_coord(pd.read_csv(coord_path))
+
+    # join พิกัดอำเภอล่วงหน้า (1 rcode ต่อ 1 อำเภอ จึงใช้ left join ได้โดยไม่ซ้ำแถว)
+    forecast_df = forecast_df.merge(
+        amphoe_coord,
+        left_on='rcode_str',
+        right_on='AM_ID_CLEAN',
+        how='left'
+    )
+
+    tmp_dir = f'{store_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, 'amphoe'))
+
+    for col in FORECAST_COLUMNS:
+        _write_column(tmp_dir, col, forecast_df[col].to_numpy())
+    for col in AMPHOE_COLUMNS:
+        _write_column(os.path.join(tmp_dir, 'amphoe'), col, amphoe_coord[col].to_numpy())
+
+    # cube (วัน × อำเภอ) พร้อม prefix sum สำหรับตัวกรองใน sidebar
+    cube = AccidentCube.from_forecast(forecast_df)
+    cube_dir = os.path.join(tmp_dir, 'cube')
+    os.makedirs(os.path.join(cube_dir, 'columns'))
+    np.save(os.path.join(cube_dir, 'dates.npy'), cube.dates.to_numpy())
+    np.save(os.path.join(cube_dir, 'prefix.npy'), cube.prefix)
+    np.save(os.path.join(cube_dir, 'count_prefix.npy'), cube.count_prefix)
+    for col in COLUMN_FIELDS:
+        _write_column(os.path.join(cube_dir, 'columns'), col, cube.columns[col].to_numpy())
+
+    meta = {
+        'format': STORE_FORMAT,
+        'data_version': make_data_version(fingerprint),
+        'sources': fingerprint,
+        'rows': len(forecast_df),
+        'amphoes': len(amphoe_coord),
+        'built_at': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    old_dir = f'{store_dir}.old-{os.getpid()}'
+    if os.path.exists(store_dir):
+        os.rename(store_dir, old_dir)
+    os.rename(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return meta
+
+
+def read_meta(store_dir=STORE_DIR):
+    """อ่าน meta.json ของคลังข้อมูล (คืนค่า None ถ้ายังไม่เคย build)"""
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _require_meta(store_dir):
+    """อ่าน meta.json และตรวจว่าคลังข้อมูลเป็นรูปแบบปัจจุบัน"""
+    meta = read_meta(store_dir)
+    if meta is None or meta.get('format') != STORE_FORMAT:
+        raise FileNotFoundError(f"ไม่พบคลังข้อมูลที่ใช้ได้ใน {store_dir} (รัน python src/data_store.py)")
+    return meta
+
+
+def ensure_store(forecast_path=FORECAST_PATH, coord_path=COORD_PATH, store_dir=STORE_DIR):
+    """build คลังข้อมูลใหม่เฉพาะเมื่อไฟล์ต้นทางเปลี่ยน แล้วคืนค่า data_version"""
+    meta = read_meta(store_dir)
+    version = make_data_version(source_fingerprint(forecast_path, coord_path))
+    if meta is None or meta.get('data_version') != version:
+        meta = build_store(forecast_path, coord_path, store_dir)
+    return meta['data_version']
+
+
+def load_store(store_dir=STORE_DIR):
+    """
+    โหลดคลังข้อมูลแบบ memory-map คืนค่า (forecast_df, amphoe_coord, meta)
+    - คอลัมน์ข้อความของ forecast_df เป็น categorical เพื่อให้เปิดหลายเวอร์ชันพร้อมกันได้
+    """
+    meta = _require_meta(store_dir)
+
+    forecast_df = pd.DataFrame(
+        {col: _read_column(store_dir, col, categorical=True) for col in FORECAST_COLUMNS},
+        copy=False
+    )
+    amphoe_dir = os.path.join(store_dir, 'amphoe')
+    amphoe_coord = pd.DataFrame(
+        {col: _read_column(amphoe_dir, col) for col in AMPHOE_COLUMNS},
+        copy=False
+    )
+    return forecast_df, amphoe_coord, meta
+
+
+def load_cube(store_dir=STORE_DIR):
+    """โหลด cube (วัน × อำเภอ) แบบ memory-map"""
+    _require_meta(store_dir)
+
+    cube_dir = os.path.join(store_dir, 'cube')
+    columns = pd.DataFrame(
+        {col: _read_column(os.path.join(cube_dir, 'columns'), col) for col in COLUMN_FIELDS}
+    )
+    return AccidentCube(
+        np.load(os.path.join(cube_dir, 'dates.npy')),
+        columns,
+        np.load(os.path.join(cube_dir, 'prefix.npy'), mmap_mode='r'),
+        np.load(os.path.join(cube_dir, 'count_prefix.npy'), mmap_mode='r')
+    )
+
+
+if __name__ == '__main__':
+    meta = build_store()
+    print(f"✓ Built store: {STORE_DIR}")
+    print(f"  • Rows: {meta['rows']:,}")
+    print(f"  • Amphoes: {meta['amphoes']:,}")
+    print(f"  • Data version: {meta['data_version']}")
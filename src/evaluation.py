@@ -0,0 +1,284 @@
+"""
+ประเมินผลโมเดลรายกลุ่ม (rcode_aampur_aplace) และรายจังหวัด (CH_ID = rcode // 100) ในรอบเดียว
+
+แทนการประเมินรายกลุ่ม 2 แบบในโน้ตบุ๊ก (xgboost.ipynb)
+- ลูปทีละกลุ่มด้วย sklearn (mae, rmse, r2, accuracy) → models/evaluation/evaluation_metrics_per_group.csv
+- test_eval.groupby('group_id').agg(...) (ผลรวม/ค่าเฉลี่ย/mae) → models/evaluation_per_group.csv
+
+วิธีคำนวณ
+- เรียงแถวตาม group_id ครั้งเดียว หาตำแหน่งเริ่มของแต่ละกลุ่ม แล้วรวมค่าด้วย np.add.reduceat
+  (ผลรวม, |error|, error², ผลรวมกำลังสองรอบค่าเฉลี่ย สำหรับ r2) ได้ทุก metric ของทุกกลุ่มพร้อมกัน
+- รายจังหวัดใช้วิธีเดียวกัน เพราะ group key เรียงตาม rcode อยู่แล้ว (ดู schema.py)
+- workers > 1: แบ่งข้อมูลเป็นช่วงตามขอบจังหวัด (กลุ่ม/จังหวัดไม่ถูกตัดข้ามช่วง) แล้วคำนวณแต่ละช่วง
+  ใน process แยกกัน เหมาะกับ backtest ที่มีหลายล้านแถว
+
+รัน (ประเมินช่วงทดสอบเดียวกับโน้ตบุ๊กด้วยโมเดลที่บันทึกไว้ แล้วเขียน CSV ทั้งหมด):
+    python src/evaluation.py --start 2024-12-01 --end 2025-01-31
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import METRICS_DIR, MODEL_DIR
+from features import FEATURE_COLUMNS, build_features, load_history, make_group_id
+from forecast import load_model, model_lag_mode
+from schema import group_label, parse_group_label, unpack_group_key
+
+EVALUATION_PATH = os.path.join(MODEL_DIR, 'evaluation_per_group.csv')
+GROUP_METRICS_PATH = os.path.join(METRICS_DIR, 'evaluation_metrics_per_group.csv')
+PROVINCE_METRICS_PATH = os.path.join(METRICS_DIR, 'evaluation_metrics_per_province.csv')
+
+METRIC_COLUMNS = ['mae', 'rmse', 'r2', 'n_samples', 'actual_sum', 'predicted_sum', 'accuracy']
+SUMMARY_COLUMNS = ['group_id', 'actual_sum', 'actual_mean', 'pred_sum', 'pred_mean', 'mae']
+
+DEFAULT_START = '2024-12-01'
+DEFAULT_END = '2025-01-31'
+
+# rcode เป็นรหัสอำเภอ 4 หลัก (2 หลักแรก = รหัสจังหวัด CH_ID ใน coordinate/tambon.csv)
+_PROVINCE_SCALE = 100
+
+# จำนวนช่วงต่อ worker (ช่วงเล็กลงช่วยเกลี่ยงานเมื่อจังหวัดมีขนาดต่างกันมาก)
+_SHARDS_PER_WORKER = 4
+
+
+def _starts(keys):
+    """ตำแหน่งเริ่มของแต่ละ key ใน array ที่เรียงแล้ว"""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def segment_metrics(keys, actual, predicted):
+    """
+    metric ของแต่ละ key (keys ต้องเรียงแล้ว) คืนค่า DataFrame 1 แถวต่อ key ตาม METRIC_COLUMNS
+    - r2 แบบ sklearn.r2_score: กลุ่มที่ค่าจริงคงที่ได้ 1 ถ้าทำนายถูกทุกแถว ไม่เช่นนั้น 0
+      และกลุ่มที่มีแถวเดียวได้ 0 (เหมือนโน้ตบุ๊ก)
+    - accuracy = (1 - |ผลรวมทำนาย - ผลรวมจริง| / (ผลรวมจริง + 1)) * 100
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    if len(keys) == 0:
+        return pd.DataFrame({'key': np.asarray(keys), **{name: [] for name in METRIC_COLUMNS}})
+
+    starts = _starts(keys)
+    n = np.diff(np.r_[starts, len(keys)])
+    error = predicted - actual
+    actual_sum = np.add.reduceat(actual, starts)
+    predicted_sum = np.add.reduceat(predicted, starts)
+    ss_res = np.add.reduceat(error ** 2, starts)
+    ss_tot = np.add.reduceat((actual - np.repeat(actual_sum / n, n)) ** 2, starts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+    r2[n < 2] = 0.0
+
+    return pd.DataFrame({
+        'key': keys[starts],
+        'mae': np.add.reduceat(np.abs(error), starts) / n,
+        'rmse': np.sqrt(ss_res / n),
+        'r2': r2,
+        'n_samples': n,
+        'actual_sum': actual_sum,
+        'predicted_sum': predicted_sum,
+        'accuracy': (1 - np.abs(predicted_sum - actual_sum) / (actual_sum + 1)) * 100
+    })
+
+
+def province_code(group_id):
+    """รหัสจังหวัด (CH_ID) ของแต่ละ group key"""
+    return unpack_group_key(group_id)[0] // _PROVINCE_SCALE
+
+
+def _evaluate_shard(shard):
+    """metric รายกลุ่มและรายจังหวัดของข้อมูลช่วงเดียว (เรียงตาม group_id แล้ว)"""
+    group_id, actual, predicted = shard
+    province = province_code(group_id)
+    return (segment_metrics(group_id, actual, predicted),
+            segment_metrics(province, actual, predicted))
+
+
+def _shards(group_id, n_shards):
+    """ขอบเขตของแต่ละช่วง ตัดที่ตำแหน่งเริ่มของจังหวัดที่ใกล้ขนาดเท่า ๆ กันที่สุด"""
+    starts = _starts(province_code(group_id))
+    targets = np.linspace(0, len(group_id), n_shards + 1)[1:-1]
+    cuts = starts[np.clip(np.searchsorted(starts, targets), 0, len(starts) - 1)]
+    bounds = np.unique(np.r_[0, cuts, len(group_id)])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def group_keys(df):
+    """
+    group key (int32) ของแต่ละแถว
+    - group_id จำนวนเต็ม (schema.pack_group_key) ใช้ตามเดิม, ป้ายชื่อ 'rcode_aampur_aplace' แปลงกลับเป็น key
+    - ไม่มี group_id: สร้างจาก rcode/aampur_clean/aplace_clean
+    """
+    if 'group_id' not in df:
+        return make_group_id(df).to_numpy()
+    if pd.api.types.is_integer_dtype(df['group_id']):
+        return df['group_id'].to_numpy()
+    return parse_group_label(df['group_id'])
+
+
+def evaluate(df, actual_column='acc_cases', predicted_column='predicted', workers=1):
+    """
+    metric รายกลุ่มและรายจังหวัดของตารางผลทำนาย (ต้องมี group_id หรือ rcode/aampur_clean/aplace_clean)
+    คืนค่า dict: 'group' (group_id + METRIC_COLUMNS), 'province' (CH_ID + METRIC_COLUMNS)
+    """
+    group_id = group_keys(df)
+    order = np.argsort(group_id, kind='stable')
+    group_id = group_id[order]
+    actual = df[actual_column].to_numpy(dtype=np.float64)[order]
+    predicted = df[predicted_column].to_numpy(dtype=np.float64)[order]
+
+    if workers > 1 and len(group_id):
+        shards = [(group_id[a:b], actual[a:b], predicted[a:b])
+                  for a, b in _shards(group_id, workers * _SHARDS_PER_WORKER)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_evaluate_shard, shards))
+        groups = pd.concat([part[0] for part in parts], ignore_index=True)
+        provinces = pd.concat([part[1] for part in parts], ignore_index=True)
+    else:
+        groups, provinces = _evaluate_shard((group_id, actual, predicted))
+
+    return {'group': groups.rename(columns={'key': 'group_id'}),
+            'province': provinces.rename(columns={'key': 'CH_ID'})}
+
+
+def group_summary(group_metrics):
+    """ตารางสรุปรายกลุ่มแบบ models/evaluation_per_group.csv (ปัดทศนิยม 2 ตำแหน่ง)"""
+    n = group_metrics['n_samples']
+    summary = pd.DataFrame({
+        'group_id': group_metrics['group_id'],
+        'actual_sum': group_metrics['actual_sum'],
+        'actual_mean': group_metrics['actual_sum'] / n,
+        'pred_sum': group_metrics['predicted_sum'],
+        'pred_mean': group_metrics['predicted_sum'] / n,
+        'mae': group_metrics['mae']
+    })
+    return summary.round(2)
+
+
+def write_evaluation(results, summary_path=EVALUATION_PATH, group_path=GROUP_METRICS_PATH,
+                     province_path=PROVINCE_METRICS_PATH):
+    """เขียน CSV ทั้งหมดจากผลของ evaluate() (group_id เป็นป้ายชื่อ 'rcode_aampur_aplace')"""
+    groups = results['group'].assign(group_id=lambda d: group_label(d['group_id']))
+    summary = group_summary(groups)
+    summary['actual_sum'] = summary['actual_sum'].astype(np.int64)
+    groups['actual_sum'] = groups['actual_sum'].astype(np.int64)
+    provinces = results['province'].assign(actual_sum=lambda d: d['actual_sum'].astype(np.int64))
+
+    for path, table in ((summary_path, summary), (group_path, groups), (province_path, provinces)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table.to_csv(path, index=False)
+    return [summary_path, group_path, province_path]
+
+
+def _group_metrics_loop(df):
+    """วิธีเดิมจากโน้ตบุ๊ก (ลูปทีละกลุ่มด้วย sklearn) เก็บไว้เทียบผลลัพธ์และความเร็ว"""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    group_metrics = []
+    for group_id in np.sort(df['group_id'].unique()):
+        group_test = df[df['group_id'] == group_id]
+        y_true = group_test['acc_cases']
+        y_pred_group = group_test['predicted']
+        group_metrics.append({
+            'group_id': group_id,
+            'mae': mean_absolute_error(y_true, y_pred_group),
+            'rmse': np.sqrt(mean_squared_error(y_true, y_pred_group)),
+            'r2': r2_score(y_true, y_pred_group) if len(y_true) > 1 else 0,
+            'n_samples': len(group_test),
+            'actual_sum': y_true.sum(),
+            'predicted_sum': y_pred_group.sum(),
+            'accuracy': (1 - abs(y_pred_group.sum() - y_true.sum()) / (y_true.sum() + 1)) * 100
+        })
+    return pd.DataFrame(group_metrics)
+
+
+def _group_summary_pandas(df):
+    """วิธีเดิมจากโน้ตบุ๊ก (groupby().agg) ของ evaluation_per_group.csv"""
+    df = df.assign(error=np.abs(df['acc_cases'] - df['predicted']))
+    summary = df.groupby('group_id').agg({
+        'acc_cases': ['sum', 'mean'],
+        'predicted': ['sum', 'mean'],
+        'error': 'mean'
+    }).round(2)
+    summary.columns = SUMMARY_COLUMNS[1:]
+    return summary.reset_index()
+
+
+def check_evaluation(df, workers=1):
+    """
+    ตรวจว่า evaluate() ให้ผลตรงกับวิธีเดิมของโน้ตบุ๊ก (ต่างได้ไม่เกินความคลาดเคลื่อนของลำดับการบวก)
+    คืนค่าเวลาที่ใช้ (วินาที) ของแต่ละวิธี
+    """
+    df = df.assign(predicted=df['predicted'].astype(np.float64))
+    timings = {}
+    t0 = time.perf_counter()
+    expected = _group_metrics_loop(df)
+    expected_summary = _group_summary_pandas(df)
+    timings['loop'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = evaluate(df, workers=workers)
+    timings['vectorized'] = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(results['group'], expected, check_dtype=False)
+    pd.testing.assert_frame_equal(group_summary(results['group']), expected_summary,
+                                  check_dtype=False, atol=0.01)
+    by_province = df.assign(CH_ID=province_code(df['group_id'])).groupby('CH_ID')
+    pd.testing.assert_series_equal(results['province'].set_index('CH_ID')['actual_sum'],
+                                   by_province['acc_cases'].sum(), check_dtype=False,
+                                   check_names=False)
+    return timings
+
+
+def test_predictions(model, df, start=DEFAULT_START, end=DEFAULT_END, lag_mode=None):
+    """
+    ผลทำนายของช่วงทดสอบ (adate, group_id, acc_cases, predicted) ด้วยฟีเจอร์ชุดเดียวกับตอนเทรน
+    - lag_mode=None: ใช้ตาม model_info.json
+    """
+    features, _ = build_features(df, lag_mode or model_lag_mode())
+    test = features[(features['adate'] >= start) & (features['adate'] <= end)]
+    test = test[['adate', 'group_id', 'acc_cases']].assign(
+        predicted=np.maximum(model.predict(test[FEATURE_COLUMNS]), 0))
+    return test.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-group and per-province model evaluation')
+    parser.add_argument('--start', default=DEFAULT_START)
+    parser.add_argument('--end', default=DEFAULT_END)
+    parser.add_argument('--predictions',
+                        help='CSV with group_id (int key or rcode_aampur_aplace label, or '
+                             'rcode/aampur_clean/aplace_clean), acc_cases, predicted '
+                             'instead of predicting the test period with the saved model')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--check', action='store_true',
+                        help='compare against the notebook per-group loop')
+    args = parser.parse_args()
+
+    if args.predictions:
+        predictions = pd.read_csv(args.predictions)
+        predictions['group_id'] = group_keys(predictions)
+    else:
+        predictions = test_predictions(load_model(), load_history(), args.start, args.end)
+
+    if args.check:
+        timings = check_evaluation(predictions, args.workers)
+        print("✓ Metrics match the notebook evaluation")
+        print(f"  loop:       {timings['loop']:8.2f} s")
+        print(f"  vectorized: {timings['vectorized']:8.2f} s")
+
+    t0 = time.perf_counter()
+    results = evaluate(predictions, workers=args.workers)
+    paths = write_evaluation(results)
+    groups = results['group']
+    print(f"✓ Evaluated {len(predictions):,} rows, {len(groups):,} groups, "
+          f"{len(results['province'])} provinces in {time.perf_counter() - t0:.2f}s")
+    print(f"  • Average MAE per group: {groups['mae'].mean():.4f}")
+    print(f"  • Average R² per group:  {groups['r2'].mean():.4f}")
+    for path in paths:
+        print(f"  • Saved: {path}")
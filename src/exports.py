@@ -0,0 +1,232 @@
+"""
+ไฟล์ส่งออก (CSV / CSV gzip / Parquet) ที่สร้างเมื่อมีคนขอเท่านั้น และสร้างทีละ chunk
+
+- ชุดข้อมูล (DATASETS):
+    summary: ยอดรายอำเภอของตัวกรอง, daily: ยอดรายวันของทุกพื้นที่
+    groups: ยอดพยากรณ์รายวันรายกลุ่ม (adate × rcode/aampur/aplace) ของตัวกรอง อ่านจากคลังข้อมูล
+    แบบ memory-map ทีละช่วงแถว จึงไม่ต้องสร้างตารางทั้งหมดในหน่วยความจำ
+- รูปแบบ (FORMATS): csv (utf-8-sig ให้ Excel อ่านภาษาไทยได้), csv.gz, parquet
+  iter_export คืนไฟล์เป็น bytes ทีละ chunk (gzip / Parquet row group ต่อ chunk)
+  ใช้ส่งแบบ streaming ใน api.py หรือรวมเป็น bytes เดียว (export_bytes) สำหรับ st.download_button
+
+ตรวจว่าไฟล์ทุกรูปแบบอ่านกลับได้ตรงกับตาราง และวัดขนาด/เวลา:
+    python src/exports.py
+"""
+import io
+import time
+import zlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+DATASETS = ('summary', 'daily', 'groups')
+FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
+DEFAULT_CHUNK_ROWS = 100_000
+
+SUMMARY_COLUMNS = {'CHANGWAT_T': 'จังหวัด', 'AMPHOE_T': 'อำเภอ', 'predicted_cases': 'จำนวนอุบัติเหตุ',
+                   'LAT': 'ละติจูด', 'LONG': 'ลองจิจูด'}
+DAILY_COLUMNS = {'adate': 'วันที่', 'predicted_cases': 'จำนวนอุบัติเหตุ'}
+GROUP_COLUMNS = ['adate', 'rcode', 'aampur_clean', 'aplace_clean', 'CHANGWAT_T', 'AMPHOE_T',
+                 'predicted_cases']
+
+
+def export_name(dataset, fmt, stamp=None):
+    """ชื่อไฟล์ดาวน์โหลด เช่น accident_summary_20251201.csv.gz"""
+    stamp = stamp or pd.Timestamp.now().strftime('%Y%m%d')
+    return f"accident_{dataset}_{stamp}{FORMATS[fmt][0]}"
+
+
+def _format_dates(df):
+    if 'adate' in df:
+        df['adate'] = df['adate'].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def iter_group_rows(source, start_date, end_date, province=None, amphoe=None,
+                    chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    แถวพยากรณ์รายกลุ่ม (GROUP_COLUMNS) ของตัวกรอง ทีละไม่เกิน chunk_rows แถวของ source
+    - source: ตารางพยากรณ์ที่ join ชื่ออำเภอแล้ว (data_store.load_store หรือผลของ whatif)
+    """
+    start, end = np.datetime64(pd.Timestamp(start_date)), np.datetime64(pd.Timestamp(end_date))
+    for i in range(0, len(source), chunk_rows):
+        chunk = source.iloc[i:i + chunk_rows]
+        dates = chunk['adate'].to_numpy()
+        keep = (dates >= start) & (dates <= end)
+        if province is not None:
+            keep &= (chunk['CHANGWAT_T'] == province).to_numpy()
+        if amphoe is not None:
+            keep &= (chunk['AMPHOE_T'] == amphoe).to_numpy()
+        if keep.any():
+            # คอลัมน์ categorical เป็น object เพื่อให้ทุก chunk (และทุก source) มี schema เดียวกัน
+            yield pd.DataFrame({name: np.asarray(chunk[name].to_numpy()[keep]) for name in GROUP_COLUMNS})
+
+
+def iter_frames(dataset, cube, start_date, end_date, province=None, amphoe=None, source=None,
+                chunk_rows=DEFAULT_CHUNK_ROWS):
+    """ตารางของชุดข้อมูลทีละ chunk (summary / daily มี chunk เดียว) พร้อมชื่อคอลัมน์สำหรับไฟล์"""
+    if dataset == 'summary':
+        mask = cube.column_mask(province=province, amphoe=amphoe)
+        summary = cube.summary(start_date, end_date, mask)
+        yield summary[list(SUMMARY_COLUMNS)].rename(columns=SUMMARY_COLUMNS)
+    elif dataset == 'daily':
+        yield _format_dates(cube.daily(start_date, end_date)).rename(columns=DAILY_COLUMNS)
+    elif dataset == 'groups':
+        if source is None:
+            from data_store import load_store
+            source = load_store()[0]
+        for chunk in iter_group_rows(source, start_date, end_date, province, amphoe, chunk_rows):
+            yield _format_dates(chunk)
+    else:
+        raise ValueError(f"dataset must be one of {DATASETS}")
+
+
+class _ChunkSink(io.RawIOBase):
+    """ปลายทางของ ParquetWriter ที่เก็บ bytes ไว้จนกว่าจะถูก drain (นับตำแหน่งรวมให้ footer ถูกต้อง)"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _iter_csv(frames):
+    header = True
+    for frame in frames:
+        text = frame.to_csv(index=False, header=header)
+        yield (('\ufeff' + text) if header else text).encode('utf-8')
+        header = False
+    if header:
+        yield '\ufeff'.encode('utf-8')
+
+
+def _iter_gzip(frames, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for data in _iter_csv(frames):
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _iter_parquet(frames):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink, writer = _ChunkSink(), None
+    for frame in frames:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression='zstd')
+        writer.write_table(table.cast(writer.schema))
+        data = sink.drain()
+        if data:
+            yield data
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(frames, fmt='csv'):
+    """ไฟล์ของตารางทีละ chunk เป็น bytes (frames: iterable ของ DataFrame ที่มีคอลัมน์เดียวกัน)"""
+    if fmt == 'csv':
+        return _iter_csv(frames)
+    if fmt == 'csv.gz':
+        return _iter_gzip(frames)
+    if fmt == 'parquet':
+        return _iter_parquet(frames)
+    raise ValueError(f"format must be one of {tuple(FORMATS)}")
+
+
+def export_bytes(frames, fmt='csv'):
+    """ไฟล์ทั้งไฟล์เป็น bytes เดียว (สำหรับ st.download_button)"""
+    return b''.join(iter_export(frames, fmt))
+
+
+def read_export(data, fmt):
+    """อ่านไฟล์ที่ส่งออกกลับเป็น DataFrame (ใช้ตรวจผล)"""
+    if fmt == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    return pd.read_csv(io.BytesIO(data), encoding='utf-8-sig',
+                       compression='gzip' if fmt == 'csv.gz' else None)
+
+
+def check_exports(cube, source, start_date, end_date, province=None, chunk_rows=10_000):
+    """ทุกรูปแบบต้องอ่านกลับได้ตรงกับตารางที่สร้างทีเดียว (groups สร้างหลาย chunk)"""
+    for dataset in DATASETS:
+        expected = pd.concat(list(iter_frames(dataset, cube, start_date, end_date, province,
+                                              source=source, chunk_rows=chunk_rows)),
+                             ignore_index=True)
+        for fmt in FORMATS:
+            data = export_bytes(iter_frames(dataset, cube, start_date, end_date, province,
+                                            source=source, chunk_rows=chunk_rows), fmt)
+            actual = read_export(data, fmt)
+            # ค่าว่างของคอลัมน์ข้อความอ่านกลับจาก Parquet เป็น None จาก CSV เป็น NaN
+            pd.testing.assert_frame_equal(actual.where(actual.notna(), np.nan),
+                                          expected.where(expected.notna(), np.nan),
+                                          check_dtype=False, check_categorical=False)
+
+
+def benchmark_exports(cube, source, start_date, end_date):
+    """ขนาดไฟล์ (bytes) และเวลา (มิลลิวินาที) ของแต่ละชุดข้อมูล × รูปแบบ"""
+    results = []
+    for dataset in DATASETS:
+        for fmt in FORMATS:
+            t0 = time.perf_counter()
+            data = export_bytes(iter_frames(dataset, cube, start_date, end_date, source=source), fmt)
+            results.append({'dataset': dataset, 'format': fmt, 'bytes': len(data),
+                            'ms': (time.perf_counter() - t0) * 1000})
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    from data_store import load_cube, load_store
+
+    parser = argparse.ArgumentParser(description='Streamed CSV / gzip CSV / Parquet exports')
+    parser.add_argument('--dataset', choices=DATASETS, default=None,
+                        help='write one export to --output instead of running the checks')
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--province', default=None)
+    args = parser.parse_args()
+
+    cube, source = load_cube(), load_store()[0]
+    start, end = args.start or cube.min_date, args.end or cube.max_date
+
+    if args.dataset:
+        output = args.output or export_name(args.dataset, args.format)
+        size = 0
+        with open(output, 'wb') as f:
+            for data in iter_export(iter_frames(args.dataset, cube, start, end, args.province,
+                                                source=source), args.format):
+                f.write(data)
+                size += len(data)
+        print(f"✓ {args.dataset} → {output} ({size:,} bytes)")
+    else:
+        check_exports(cube, source, start, end)
+        check_exports(cube, source, start, end, cube.provinces(start, end)[0])
+        print("✓ csv / csv.gz / parquet exports read back identical to the source tables")
+        print(benchmark_exports(cube, source, start, end).round(1).to_string(index=False))
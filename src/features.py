@@ -0,0 +1,344 @@
+"""
+Feature engineering ของโมเดลพยากรณ์ (ย้ายมาจากโน้ตบุ๊ก xgboost.ipynb)
+
+ฟีเจอร์: ฟีเจอร์จากวันที่, group_mean, group_std, lag_1year, lag_2year,
+rolling_mean_7d, rolling_mean_14d (rolling นับตามแถวของกลุ่ม เหมือน groupby().rolling)
+
+lag มี 2 แบบ (lag_mode)
+- 'calendar' (ค่าเริ่มต้น): ยอดของวันเดียวกันเมื่อ 1/2 ปีก่อน จับคู่ด้วย key (กลุ่ม, วันที่)
+  วันที่ไม่มีแถวในข้อมูล = ไม่มีอุบัติเหตุ = 0 ใช้ฟังก์ชันเดียวกันทั้งตอนเทรนและตอนพยากรณ์
+- 'rows': shift 365/730 แถวของกลุ่มแบบโน้ตบุ๊กเดิม (ข้อมูลมีเฉพาะ ธ.ค./ม.ค. จึงไม่ใช่ 1 ปีจริง)
+  ใช้กับโมเดลที่เทรนไว้ก่อนหน้า
+
+FeatureState เก็บสถานะของแต่ละกลุ่มไว้
+- จำนวนแถว, ผลรวม, ผลรวมกำลังสอง (สำหรับ mean/std)
+- ค่า acc_cases ล่าสุด WINDOW แถว (สำหรับ lag และ rolling)
+เมื่อมีข้อมูลวันใหม่ เรียก update() เฉพาะแถวใหม่ได้เลย ไม่ต้อง groupby/rolling ข้อมูลทั้งหมดใหม่
+
+สร้างสถานะจากข้อมูลย้อนหลังทั้งหมดและบันทึกลงดิสก์:
+    python src/features.py
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import HISTORY_PATH, MODEL_DIR
+from schema import pack_group_key, read_accidents
+
+FEATURE_COLUMNS = [
+    'month', 'day_of_month', 'day_of_week', 'is_weekend',
+    'is_december', 'year', 'rcode', 'aampur_clean', 'aplace_clean',
+    'group_mean', 'group_std', 'lag_1year', 'lag_2year',
+    'rolling_mean_7d', 'rolling_mean_14d'
+]
+KEY_COLUMNS = ['rcode', 'aampur_clean', 'aplace_clean']
+TRAIN_MONTHS = (12, 1)
+
+LAG_MODES = ('calendar', 'rows')
+DEFAULT_LAG_MODE = 'calendar'
+# lag ตามปฏิทิน (จำนวนปีย้อนหลัง)
+CALENDAR_LAGS = {'lag_1year': 1, 'lag_2year': 2}
+# lag และ rolling ตามแถว (จำนวนแถวย้อนหลังของกลุ่ม)
+ROW_LAGS = {'lag_1year': 365, 'lag_2year': 730}
+ROLLING_WINDOWS = {'rolling_mean_7d': 7, 'rolling_mean_14d': 14}
+WINDOW = max(max(ROW_LAGS.values()), max(ROLLING_WINDOWS.values()))
+# ช่วง key ของวันที่ใน _date_keys (วันนับจาก 1970-01-01 ± 2^19 วัน)
+_DAY_SPAN = 1 << 20
+
+# เก็บคู่กับโมเดล (ไม่ใช่ใน store/ ที่ถูกสร้างใหม่ทุกครั้งที่ไฟล์พยากรณ์เปลี่ยน)
+FEATURE_STATE_PATH = os.path.join(MODEL_DIR, 'feature_state.npz')
+
+
+def make_group_id(df):
+    """group_id ของ (rcode, aampur_clean, aplace_clean) เป็น group key แบบ int32 (ดู schema.py)"""
+    return pack_group_key(df['rcode'], df['aampur_clean'], df['aplace_clean'])
+
+
+def load_history(path=HISTORY_PATH, months=TRAIN_MONTHS):
+    """อ่านข้อมูลอุบัติเหตุย้อนหลัง เฉพาะเดือนที่ใช้เทรน (ธ.ค. และ ม.ค.)"""
+    return read_accidents(path, months=months)
+
+
+def _date_keys(group_codes, dates):
+    """key จำนวนเต็มของ (กลุ่ม, วันที่) สำหรับ join ด้วย searchsorted"""
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return np.asarray(group_codes, dtype=np.int64) * _DAY_SPAN + days + _DAY_SPAN // 2
+
+
+def calendar_lags(df, history, lags=CALENDAR_LAGS):
+    """
+    ยอด acc_cases ของวันเดียวกันเมื่อ n ปีก่อน ของทุกแถวใน df (group_id, adate)
+    - history: ข้อมูลที่ใช้ค้น (group_id, adate, acc_cases) แถวที่ไม่มี = 0
+    - join ด้วย key (กลุ่ม, วันที่) ที่เรียงแล้ว + searchsorted ไม่ต้องวนลูปทีละกลุ่ม
+    คืนค่า dict ชื่อคอลัมน์ → array
+    """
+    dates = pd.DatetimeIndex(df['adate'])
+    if len(history) == 0:
+        return {name: np.zeros(len(df)) for name in lags}
+
+    hist_codes, hist_groups = pd.factorize(history['group_id'])
+    hist_keys = _date_keys(hist_codes, history['adate'].to_numpy())
+    order = np.argsort(hist_keys, kind='stable')
+    hist_keys, starts = np.unique(hist_keys[order], return_index=True)
+    hist_values = np.add.reduceat(history['acc_cases'].to_numpy(dtype=np.float64)[order], starts)
+
+    codes = pd.Index(hist_groups).get_indexer(df['group_id'])
+    result = {}
+    for name, years in lags.items():
+        keys = _date_keys(codes, (dates - pd.DateOffset(years=years)).to_numpy())
+        pos = np.searchsorted(hist_keys, keys).clip(max=len(hist_keys) - 1)
+        found = (codes >= 0) & (hist_keys[pos] == keys)
+        result[name] = np.where(found, hist_values[pos], 0.0)
+    return result
+
+
+def add_calendar_features(df):
+    """ฟีเจอร์พื้นฐานจากวันที่ (แก้ไข df และคืนค่า df เดิม)"""
+    df['month'] = df['adate'].dt.month
+    df['year'] = df['adate'].dt.year
+    df['day_of_month'] = df['adate'].dt.day
+    df['day_of_week'] = df['adate'].dt.dayofweek  # 0=จันทร์, 6=อาทิตย์
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)  # เสาร์-อาทิตย์
+    df['is_december'] = (df['month'] == 12).astype(int)  # เดือนธันวาคมหรือไม่
+    return df
+
+
+class FeatureState:
+    """
+    สถานะต่อกลุ่มสำหรับคำนวณฟีเจอร์แบบเพิ่มทีละช่วง
+    - groups: group_id (group key) เรียงจากน้อยไปมาก
+    - count / total / sumsq: จำนวนแถว, ผลรวม, ผลรวมกำลังสองของ acc_cases
+    - window: ค่า acc_cases ล่าสุด WINDOW แถว ชิดขวา (ช่องที่ยังไม่มีข้อมูลเป็น NaN)
+    - last_date: วันที่ล่าสุดของแต่ละกลุ่ม
+    - recent: แถวย้อนหลัง max(CALENDAR_LAGS) ปีจากวันที่ล่าสุด (สำหรับ lag_mode='calendar')
+    """
+
+    def __init__(self, groups=None, count=None, total=None, sumsq=None, window=None,
+                 last_date=None, recent=None, lag_mode=DEFAULT_LAG_MODE):
+        if lag_mode not in LAG_MODES:
+            raise ValueError(f"lag_mode ต้องเป็นหนึ่งใน {LAG_MODES}")
+        self.lag_mode = lag_mode
+        self.groups = np.asarray(groups if groups is not None else [], dtype=np.int64)
+        n = len(self.groups)
+        self.count = count if count is not None else np.zeros(n, dtype=np.int64)
+        self.total = total if total is not None else np.zeros(n, dtype=np.float64)
+        self.sumsq = sumsq if sumsq is not None else np.zeros(n, dtype=np.float64)
+        self.window = window if window is not None else np.full((n, WINDOW), np.nan)
+        self.last_date = (last_date if last_date is not None
+                          else np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'))
+        self.recent = (recent if recent is not None
+                       else pd.DataFrame({'group_id': pd.Series(dtype=np.int64),
+                                          'adate': pd.Series(dtype='datetime64[ns]'),
+                                          'acc_cases': pd.Series(dtype=np.float64)}))
+
+    def __len__(self):
+        return len(self.groups)
+
+    def _add_groups(self, group_ids):
+        """เพิ่มกลุ่มที่ยังไม่เคยเห็น (รักษาการเรียงของ group key)"""
+        new = np.setdiff1d(np.unique(group_ids), self.groups)
+        if len(new) == 0:
+            return
+        groups = np.concatenate([self.groups, new])
+        order = np.argsort(groups, kind='stable')
+        n_new = len(new)
+        self.groups = groups[order]
+        self.count = np.concatenate([self.count, np.zeros(n_new, dtype=np.int64)])[order]
+        self.total = np.concatenate([self.total, np.zeros(n_new)])[order]
+        self.sumsq = np.concatenate([self.sumsq, np.zeros(n_new)])[order]
+        self.window = np.concatenate([self.window, np.full((n_new, WINDOW), np.nan)])[order]
+        self.last_date = np.concatenate([
+            self.last_date, np.full(n_new, np.datetime64('NaT'), dtype='datetime64[ns]')
+        ])[order]
+
+    def group_stats(self):
+        """group_mean / group_std (ddof=1, กลุ่มที่มีแถวเดียว = 0) ของทุกกลุ่ม"""
+        count = self.count.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.total / count
+            var = (self.sumsq - count * mean ** 2) / (count - 1)
+        std = np.sqrt(np.clip(var, 0, None))
+        std[self.count < 2] = 0.0
+        return pd.DataFrame({'group_id': self.groups, 'group_mean': mean, 'group_std': std})
+
+    def apply_group_stats(self, features):
+        """เขียน group_mean / group_std ล่าสุดทับในตารางฟีเจอร์ (เช่น แถวเก่าหลัง update)"""
+        stats = self.group_stats()
+        idx = np.searchsorted(stats['group_id'].to_numpy(), features['group_id'].to_numpy())
+        features['group_mean'] = stats['group_mean'].to_numpy()[idx]
+        features['group_std'] = stats['group_std'].to_numpy()[idx]
+        return features
+
+    def update(self, df):
+        """
+        เพิ่มแถวใหม่ (adate, rcode, aampur_clean, aplace_clean, acc_cases) เข้าสถานะ
+        และคืนค่าตารางฟีเจอร์ของแถวใหม่ เรียงตาม group_id, adate
+        - แถวใหม่ต้องมีวันที่หลังวันที่ล่าสุดของกลุ่มในสถานะ
+        - group_mean / group_std คำนวณจากข้อมูลทั้งหมดรวมแถวใหม่ (เหมือนโน้ตบุ๊ก)
+        """
+        df = df.copy()
+        if 'group_id' not in df:
+            df['group_id'] = make_group_id(df)
+        df = df.sort_values(['group_id', 'adate'], kind='stable').reset_index(drop=True)
+        if len(df) == 0:
+            return df
+
+        self._add_groups(df['group_id'].to_numpy())
+        gidx = np.searchsorted(self.groups, df['group_id'].to_numpy())
+        dates = df['adate'].to_numpy(dtype='datetime64[ns]')
+        values = df['acc_cases'].to_numpy(dtype=np.float64)
+
+        # ต้องต่อท้ายเท่านั้น: แถวแรกของแต่ละกลุ่มต้องใหม่กว่า last_date
+        first = np.r_[True, gidx[1:] != gidx[:-1]]
+        last_seen = self.last_date[gidx[first]]
+        if np.any(~np.isnat(last_seen) & (dates[first] <= last_seen)):
+            raise ValueError("update() รับเฉพาะแถวที่ใหม่กว่าข้อมูลในสถานะของกลุ่มนั้น")
+
+        # ลำดับของแถวภายในกลุ่มของชุดใหม่ (0, 1, 2, ...)
+        starts = np.flatnonzero(first)
+        run_lengths = np.diff(np.r_[starts, len(df)])
+        pos = np.arange(len(df)) - np.repeat(starts, run_lengths)
+        uniq = gidx[first]
+        row = np.repeat(np.arange(len(uniq)), run_lengths)
+
+        # ตารางค่าต่อกลุ่ม: [WINDOW ค่าล่าสุดในสถานะ | ค่าใหม่] แล้วคำนวณ lag/rolling จากตารางนี้
+        width = WINDOW + run_lengths.max()
+        ext = np.full((len(uniq), width), np.nan)
+        ext[:, :WINDOW] = self.window[uniq]
+        col = WINDOW + pos
+        ext[row, col] = values
+
+        if self.lag_mode == 'calendar':
+            lookup = pd.concat([self.recent, df[['group_id', 'adate', 'acc_cases']]],
+                               ignore_index=True)
+            df = df.assign(**calendar_lags(df, lookup))
+            horizon = pd.Timestamp(dates.max()) - pd.DateOffset(years=max(CALENDAR_LAGS.values()))
+            self.recent = lookup[lookup['adate'] >= horizon].reset_index(drop=True)
+        else:
+            for name, lag in ROW_LAGS.items():
+                df[name] = np.nan_to_num(ext[row, col - lag], nan=0.0)
+
+        filled = ~np.isnan(ext)
+        csum = np.concatenate([np.zeros((len(uniq), 1)), np.cumsum(np.where(filled, ext, 0), axis=1)], axis=1)
+        ccount = np.concatenate([np.zeros((len(uniq), 1)), np.cumsum(filled, axis=1)], axis=1)
+        for name, size in ROLLING_WINDOWS.items():
+            total = csum[row, col + 1] - csum[row, col + 1 - size]
+            count = ccount[row, col + 1] - ccount[row, col + 1 - size]
+            df[name] = total / count
+
+        # อัพเดทสถานะ
+        self.count += np.bincount(gidx, minlength=len(self))
+        self.total += np.bincount(gidx, weights=values, minlength=len(self))
+        self.sumsq += np.bincount(gidx, weights=values ** 2, minlength=len(self))
+        end = WINDOW + run_lengths
+        self.window[uniq] = ext[np.arange(len(uniq))[:, None], end[:, None] - WINDOW + np.arange(WINDOW)]
+        self.last_date[uniq] = dates[np.r_[starts[1:], len(df)] - 1]
+
+        add_calendar_features(df)
+        return self.apply_group_stats(df)
+
+    def save(self, path=FEATURE_STATE_PATH):
+        """บันทึกสถานะเป็น .npz (ไม่ใช้ pickle)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, groups=self.groups, count=self.count, total=self.total,
+                 sumsq=self.sumsq, window=self.window, last_date=self.last_date,
+                 recent_groups=self.recent['group_id'].to_numpy(dtype=np.int64),
+                 recent_dates=self.recent['adate'].to_numpy(dtype='datetime64[ns]'),
+                 recent_values=self.recent['acc_cases'].to_numpy(dtype=np.float64),
+                 lag_mode=np.array(self.lag_mode))
+
+    @classmethod
+    def load(cls, path=FEATURE_STATE_PATH):
+        with np.load(path) as data:
+            recent = pd.DataFrame({'group_id': data['recent_groups'],
+                                   'adate': data['recent_dates'],
+                                   'acc_cases': data['recent_values']})
+            return cls(groups=data['groups'], count=data['count'],
+                       total=data['total'], sumsq=data['sumsq'], window=data['window'],
+                       last_date=data['last_date'], recent=recent,
+                       lag_mode=str(data['lag_mode']))
+
+
+def build_features(df, lag_mode=DEFAULT_LAG_MODE):
+    """ฟีเจอร์ของข้อมูลทั้งชุด (เริ่มจากสถานะว่าง) คืนค่า (features, state)"""
+    state = FeatureState(lag_mode=lag_mode)
+    features = state.update(df)
+    return features, state
+
+
+def _build_features_pandas(df, lag_mode='rows'):
+    """
+    วิธีเดิมจากโน้ตบุ๊ก (groupby/shift/rolling ทั้งชุด) เก็บไว้เทียบผลลัพธ์
+    - lag_mode='calendar': lag ด้วย merge ตาม (group_id, วันที่ + n ปี)
+    """
+    df = add_calendar_features(df.copy())
+    group_means = df.groupby('group_id')['acc_cases'].mean()
+    df['group_mean'] = df['group_id'].map(group_means)
+    group_std = df.groupby('group_id')['acc_cases'].std().fillna(0)
+    df['group_std'] = df['group_id'].map(group_std)
+
+    df = df.sort_values(['group_id', 'adate'])
+    if lag_mode == 'calendar':
+        for name, years in CALENDAR_LAGS.items():
+            past = df[['group_id', 'adate', 'acc_cases']].rename(columns={'acc_cases': name})
+            past['adate'] = past['adate'] + pd.DateOffset(years=years)
+            df = df.merge(past, on=['group_id', 'adate'], how='left')
+    else:
+        df['lag_1year'] = df.groupby('group_id')['acc_cases'].shift(365)
+        df['lag_2year'] = df.groupby('group_id')['acc_cases'].shift(730)
+    df['rolling_mean_7d'] = df.groupby('group_id')['acc_cases'].rolling(7, min_periods=1).mean().reset_index(0, drop=True)
+    df['rolling_mean_14d'] = df.groupby('group_id')['acc_cases'].rolling(14, min_periods=1).mean().reset_index(0, drop=True)
+    return df.fillna(0).reset_index(drop=True)
+
+
+def check_incremental(df, split_date, lag_mode=DEFAULT_LAG_MODE):
+    """
+    ตรวจว่า build ถึง split_date แล้ว update ส่วนที่เหลือ ได้ฟีเจอร์เท่ากับวิธีเดิมทั้งชุด
+    คืนค่าเวลาที่ใช้ (วินาที) ของแต่ละวิธี
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    expected = _build_features_pandas(df, lag_mode)
+    timings['pandas_full'] = time.perf_counter() - t0
+
+    old, new = df[df['adate'] < split_date], df[df['adate'] >= split_date]
+    old_features, state = build_features(old, lag_mode)
+    t0 = time.perf_counter()
+    new_features = state.update(new)
+    timings['incremental_update'] = time.perf_counter() - t0
+
+    combined = pd.concat([state.apply_group_stats(old_features), new_features])
+    combined = combined.sort_values(['group_id', 'adate'], kind='stable').reset_index(drop=True)
+    columns = ['adate', 'group_id'] + FEATURE_COLUMNS
+    pd.testing.assert_frame_equal(combined[columns], expected[columns], check_dtype=False)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or update the per-group feature state')
+    parser.add_argument('--append', help='CSV of new days to add to the saved state')
+    parser.add_argument('--check', metavar='SPLIT_DATE',
+                        help='verify incremental features against the notebook version')
+    parser.add_argument('--lag-mode', choices=LAG_MODES, default=DEFAULT_LAG_MODE)
+    args = parser.parse_args()
+
+    if args.check:
+        timings = check_incremental(load_history(), pd.Timestamp(args.check), args.lag_mode)
+        print(f"✓ Incremental features match the full rebuild")
+        print(f"  • full rebuild (pandas):  {timings['pandas_full']*1000:8.1f} ms")
+        print(f"  • incremental update:     {timings['incremental_update']*1000:8.1f} ms")
+    elif args.append:
+        state = FeatureState.load()
+        new = pd.read_csv(args.append, parse_dates=['adate'])
+        features = state.update(new[new['adate'].dt.month.isin(TRAIN_MONTHS)])
+        state.save()
+        print(f"✓ Added {len(features):,} rows → {FEATURE_STATE_PATH}")
+    else:
+        t0 = time.perf_counter()
+        features, state = build_features(load_history(), args.lag_mode)
+        state.save()
+        print(f"✓ Built features for {len(features):,} rows / {len(state):,} groups "
+              f"in {time.perf_counter() - t0:.2f}s → {FEATURE_STATE_PATH}")
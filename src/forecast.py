@@ -0,0 +1,237 @@
+"""
+สร้างไฟล์พยากรณ์ล่วงหน้า (forecast_2025_2026.csv) แบบ vectorized
+
+แทนลูปเดิมในโน้ตบุ๊ก (xgboost.ipynb) ที่สร้าง dict ทีละ (กลุ่ม, วันที่) และค้นแถวล่าสุดของกลุ่ม
+ด้วย df[df['group_id'] == group] ทุกกลุ่ม
+- ค่าประจำกลุ่มคำนวณครั้งเดียวด้วย groupby (1 แถวต่อกลุ่ม)
+- ตารางฟีเจอร์ (กลุ่ม × วันที่) สร้างด้วย np.repeat / np.tile
+- lag_1year / lag_2year: ถ้าโมเดลเทรนด้วย lag ตามปฏิทิน (model_info.json: lag_mode) จะค้นยอดของ
+  วันเดียวกันเมื่อ 1/2 ปีก่อนจากข้อมูลย้อนหลังด้วย calendar_lags ตัวเดียวกับตอนเทรน
+  ไม่เช่นนั้นใช้ 0 เหมือนเดิม
+- predict ทีเดียวทั้งตาราง หรือทีละ chunk เมื่อกำหนด chunk_rows
+
+รัน (เขียนไฟล์พยากรณ์และสร้างคลังข้อมูลของแดชบอร์ดใหม่):
+    python src/forecast.py --start 2025-12-01 --end 2026-01-31
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import FORECAST_PATH, MODEL_DIR, MODEL_PATH
+from features import FEATURE_COLUMNS, KEY_COLUMNS, make_group_id, load_history, calendar_lags
+
+OUTPUT_COLUMNS = ['adate', 'rcode', 'aampur_clean', 'aplace_clean', 'predicted_cases']
+
+DEFAULT_START = '2025-12-01'
+DEFAULT_END = '2026-01-31'
+
+
+def group_table(df):
+    """
+    ค่าประจำกลุ่ม 1 แถวต่อกลุ่ม เรียงตาม group_id (แทน df[df['group_id'] == group].iloc[-1])
+    - group_mean / group_std ของ acc_cases (std ของกลุ่มที่มีแถวเดียว = 0)
+    """
+    if 'group_id' not in df:
+        df = df.assign(group_id=make_group_id(df))
+    grouped = df.groupby('group_id', sort=True)
+    groups = grouped[KEY_COLUMNS].last()
+    groups['group_mean'] = grouped['acc_cases'].mean()
+    groups['group_std'] = grouped['acc_cases'].std().fillna(0)
+    return groups.reset_index()
+
+
+def calendar_features(dates):
+    """ฟีเจอร์จากวันที่ของแต่ละวัน (1 ค่าต่อวัน)"""
+    dates = pd.DatetimeIndex(dates)
+    day_of_week = dates.dayofweek.to_numpy()
+    month = dates.month.to_numpy()
+    return {
+        'month': month,
+        'day_of_month': dates.day.to_numpy(),
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(np.int64),
+        'is_december': (month == 12).astype(np.int64),
+        'year': dates.year.to_numpy()
+    }
+
+
+def build_features(groups, dates, history=None):
+    """
+    ตารางฟีเจอร์ขนาด (กลุ่ม × วันที่) เรียงแบบกลุ่มก่อนแล้ววันที่ (เหมือนลูปเดิม)
+    - ยังไม่มีข้อมูลจริงของช่วงพยากรณ์: rolling mean = group_mean
+    - history=None: lag = 0, ไม่เช่นนั้นค้น lag ตามปฏิทินจาก history
+    คืนค่า (ข้อมูลแถว adate + group_id, ตารางฟีเจอร์ตาม FEATURE_COLUMNS)
+    """
+    dates = pd.DatetimeIndex(dates)
+    n_groups, n_dates = len(groups), len(dates)
+
+    features = {name: np.tile(values, n_groups)
+                for name, values in calendar_features(dates).items()}
+    for name in KEY_COLUMNS + ['group_mean', 'group_std']:
+        features[name] = np.repeat(groups[name].to_numpy(), n_dates)
+    features['rolling_mean_7d'] = features['group_mean']
+    features['rolling_mean_14d'] = features['group_mean']
+
+    rows = pd.DataFrame({
+        'adate': np.tile(dates.to_numpy(), n_groups),
+        'group_id': np.repeat(groups['group_id'].to_numpy(), n_dates)
+    })
+    if history is None:
+        features['lag_1year'] = np.zeros(n_groups * n_dates, dtype=np.int64)
+        features['lag_2year'] = np.zeros(n_groups * n_dates, dtype=np.int64)
+    else:
+        features.update(calendar_lags(rows, history))
+    return rows, pd.DataFrame(features)[FEATURE_COLUMNS]
+
+
+def model_lag_mode(model_dir=MODEL_DIR):
+    """ชนิด lag ที่โมเดลใช้ตอนเทรน (model_info.json ที่ไม่มี lag_mode = โมเดลเดิมแบบ 'rows')"""
+    try:
+        with open(os.path.join(model_dir, 'model_info.json')) as f:
+            return json.load(f).get('lag_mode', 'rows')
+    except (OSError, ValueError):
+        return 'rows'
+
+
+def load_model(path=MODEL_PATH):
+    """โหลดโมเดลเป็น inference.Predictor (booster + inplace_predict) จากโฟลเดอร์ของ path"""
+    from inference import load_predictor
+
+    return load_predictor(os.path.dirname(path))
+
+
+def iter_forecast(model, groups, dates, chunk_rows=None, history=None):
+    """
+    พยากรณ์ทีละ chunk ของกลุ่ม (ประมาณ chunk_rows แถวต่อ chunk) แล้ว yield ตารางผลลัพธ์
+    - chunk_rows=None: สร้างตารางฟีเจอร์และ predict ทีเดียวทั้งหมด
+    - history: ข้อมูลย้อนหลังสำหรับ lag ตามปฏิทิน (None = lag 0)
+    """
+    n_dates = len(dates)
+    groups_per_chunk = len(groups) if chunk_rows is None else max(1, chunk_rows // max(n_dates, 1))
+
+    for start in range(0, len(groups), groups_per_chunk):
+        chunk = groups.iloc[start:start + groups_per_chunk]
+        rows, X = build_features(chunk, dates, history)
+        output = pd.concat([rows, X[KEY_COLUMNS]], axis=1)
+        output['predicted_cases'] = np.maximum(model.predict(X), 0).round()
+        yield output[OUTPUT_COLUMNS]
+
+
+def _lag_history(df, lag_mode):
+    if lag_mode is None:
+        lag_mode = model_lag_mode()
+    if lag_mode != 'calendar':
+        return None
+    return df if 'group_id' in df else df.assign(group_id=make_group_id(df))
+
+
+def forecast(model, df, start=DEFAULT_START, end=DEFAULT_END, chunk_rows=None, lag_mode=None):
+    """
+    ตารางพยากรณ์รายวันของทุกกลุ่มในช่วงวันที่ (adate, rcode, aampur_clean, aplace_clean, predicted_cases)
+    - lag_mode=None: ใช้ตาม model_info.json
+    """
+    dates = pd.date_range(start, end, freq='D')
+    chunks = list(iter_forecast(model, group_table(df), dates, chunk_rows, _lag_history(df, lag_mode)))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_forecast(model, df, path=FORECAST_PATH, start=DEFAULT_START, end=DEFAULT_END,
+                   chunk_rows=None, lag_mode=None):
+    """
+    เขียนไฟล์พยากรณ์ทีละ chunk (ไม่ต้องเก็บผลทั้งหมดไว้ในหน่วยความจำ)
+    คืนค่าจำนวนแถวที่เขียน
+    """
+    dates = pd.date_range(start, end, freq='D')
+    rows = 0
+    history = _lag_history(df, lag_mode)
+    for i, chunk in enumerate(iter_forecast(model, group_table(df), dates, chunk_rows, history)):
+        chunk.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        rows += len(chunk)
+    return rows
+
+
+def _forecast_loop(model, df, start=DEFAULT_START, end=DEFAULT_END):
+    """วิธีเดิมจากโน้ตบุ๊ก (ลูปทีละกลุ่ม × วันที่) เก็บไว้เทียบผลลัพธ์และความเร็ว"""
+    df = df.sort_values(['group_id', 'adate'])
+    grouped = df.groupby('group_id')
+    df = df.assign(group_mean=df['group_id'].map(grouped['acc_cases'].mean()),
+                   group_std=df['group_id'].map(grouped['acc_cases'].std().fillna(0)))
+
+    forecasts = []
+    for group in df['group_id'].unique():
+        group_data = df[df['group_id'] == group].iloc[-1]
+        for date in pd.date_range(start, end, freq='D'):
+            forecasts.append({
+                'adate': date,
+                'group_id': group,
+                'month': date.month,
+                'day_of_month': date.day,
+                'day_of_week': date.dayofweek,
+                'is_weekend': 1 if date.dayofweek >= 5 else 0,
+                'is_december': 1 if date.month == 12 else 0,
+                'year': date.year,
+                'rcode': group_data['rcode'],
+                'aampur_clean': group_data['aampur_clean'],
+                'aplace_clean': group_data['aplace_clean'],
+                'group_mean': group_data['group_mean'],
+                'group_std': group_data['group_std'],
+                'lag_1year': 0,
+                'lag_2year': 0,
+                'rolling_mean_7d': group_data['group_mean'],
+                'rolling_mean_14d': group_data['group_mean']
+            })
+
+    forecast_df = pd.DataFrame(forecasts)
+    forecast_df['predicted_cases'] = model.predict(forecast_df[FEATURE_COLUMNS])
+    forecast_df['predicted_cases'] = forecast_df['predicted_cases'].clip(lower=0).round()
+    return forecast_df[OUTPUT_COLUMNS]
+
+
+def benchmark_forecast(model, df, start=DEFAULT_START, end=DEFAULT_END):
+    """เวลาที่ใช้ของวิธีเดิมเทียบกับแบบ vectorized และตรวจว่าผลลัพธ์ตรงกัน"""
+    results = {}
+    outputs = {}
+    # วิธีเดิมใช้ lag = 0 จึงเทียบกับ lag_mode='rows'
+    runners = (('loop', _forecast_loop),
+               ('vectorized', lambda *args: forecast(*args, lag_mode='rows')))
+    for name, runner in runners:
+        t0 = time.perf_counter()
+        outputs[name] = runner(model, df, start, end)
+        results[name] = time.perf_counter() - t0
+    pd.testing.assert_frame_equal(outputs['loop'].reset_index(drop=True), outputs['vectorized'],
+                                  check_dtype=False)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the daily forecast file')
+    parser.add_argument('--start', default=DEFAULT_START)
+    parser.add_argument('--end', default=DEFAULT_END)
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='predict in chunks of about this many rows')
+    parser.add_argument('--output', default=FORECAST_PATH)
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare against the original per-group loop')
+    args = parser.parse_args()
+
+    model = load_model()
+    history = load_history()
+
+    if args.benchmark:
+        results = benchmark_forecast(model, history, args.start, args.end)
+        print(f"  loop:       {results['loop']:8.2f} s")
+        print(f"  vectorized: {results['vectorized']:8.2f} s")
+        print(f"  speedup:    {results['loop'] / results['vectorized']:8.1f}x (outputs identical)")
+    else:
+        t0 = time.perf_counter()
+        rows = write_forecast(model, history, args.output, args.start, args.end, args.chunk_rows)
+        print(f"✓ Forecast {rows:,} rows in {time.perf_counter() - t0:.2f}s → {args.output}")
+
+        # สร้างคลังข้อมูลของแดชบอร์ดใหม่เมื่อเขียนทับไฟล์พยากรณ์หลัก
+        if args.output == FORECAST_PATH:
+            from data_store import build_store
+            build_store()
@@ -0,0 +1,235 @@
+"""
+โหลดโมเดล XGBoost ครั้งเดียวและทำนายในโปรเซส (ไม่ผ่าน XGBRegressor / pickle)
+
+- โหลด booster จาก models/xgboost_accident_model.json หรือไฟล์ .ubj (Universal Binary JSON)
+  ที่แปลงจาก .json ไว้ (parse เร็วกว่า) ไฟล์ .ubj จะถูกสร้างใหม่อัตโนมัติเมื่อ .json ใหม่กว่า
+- ตรวจว่า feature_columns ใน model_info.json ตรงกับชื่อ/จำนวนฟีเจอร์ของ booster และของ features.py
+- predict() รับ DataFrame (เรียงคอลัมน์ให้ตาม feature_columns) หรือ numpy array
+  แล้วทำนายด้วย booster.inplace_predict (ไม่สร้าง DMatrix) ได้ทั้งทีละชุดและทีละแถว
+- ใช้แทนโมเดลใน forecast.py ได้โดยตรง จึงคำนวณพยากรณ์ใหม่ได้ทันทีไม่ต้องพึ่งไฟล์ CSV อย่างเดียว
+
+ดูเวลาโหลดและความเร็วในการทำนาย:
+    python src/inference.py --benchmark
+"""
+import os
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from config import MODEL_DIR
+from features import FEATURE_COLUMNS
+
+MODEL_NAME = 'xgboost_accident_model'
+
+
+class Predictor:
+    """booster ที่โหลดแล้ว + รายชื่อฟีเจอร์ที่ตรวจแล้ว (predict เรียกพร้อมกันหลาย thread ได้)"""
+
+    def __init__(self, booster, feature_columns, path=None, nthread=None, lag_mode='rows'):
+        self.booster = booster
+        self.feature_columns = list(feature_columns)
+        self.path = path
+        self.lag_mode = lag_mode
+        if nthread is not None:
+            self.booster.set_param({'nthread': nthread})
+        validate_features(booster, self.feature_columns)
+
+    def _matrix(self, X):
+        """ตารางฟีเจอร์เป็น float32 เรียงคอลัมน์ตาม feature_columns"""
+        if isinstance(X, pd.DataFrame):
+            missing = [name for name in self.feature_columns if name not in X]
+            if missing:
+                raise ValueError(f"ไม่มีฟีเจอร์ {missing}")
+            X = X[self.feature_columns].to_numpy(dtype=np.float32)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+            if X.ndim == 1:
+                X = X[None, :]
+            if X.shape[1] != len(self.feature_columns):
+                raise ValueError(f"ต้องมี {len(self.feature_columns)} ฟีเจอร์ ได้ {X.shape[1]}")
+        return np.ascontiguousarray(X)
+
+    def predict(self, X):
+        """ทำนายทั้งชุด (DataFrame หรือ array ขนาด แถว × ฟีเจอร์)"""
+        return self.booster.inplace_predict(self._matrix(X))
+
+    def predict_one(self, features):
+        """ทำนายแถวเดียวจาก dict ชื่อฟีเจอร์ → ค่า"""
+        missing = [name for name in self.feature_columns if name not in features]
+        if missing:
+            raise ValueError(f"ไม่มีฟีเจอร์ {missing}")
+        row = np.array([[features[name] for name in self.feature_columns]], dtype=np.float32)
+        return float(self.booster.inplace_predict(row)[0])
+
+    def forecast(self, df, start, end, chunk_rows=None, lag_mode=None):
+        """ตารางพยากรณ์รายวันจากข้อมูลย้อนหลัง df (ดู forecast.forecast) lag_mode=None: ตามตอนเทรน"""
+        from forecast import forecast
+
+        return forecast(self, df, start, end, chunk_rows, lag_mode or self.lag_mode)
+
+
+def validate_features(booster, feature_columns):
+    """feature_columns ต้องตรงกับ booster (ชื่อ ถ้ามี และจำนวน) และกับ features.FEATURE_COLUMNS"""
+    if booster.feature_names is not None and list(booster.feature_names) != list(feature_columns):
+        raise ValueError(f"feature_columns ไม่ตรงกับโมเดล: {booster.feature_names}")
+    if booster.num_features() != len(feature_columns):
+        raise ValueError(f"โมเดลใช้ {booster.num_features()} ฟีเจอร์ แต่ model_info มี {len(feature_columns)}")
+    if list(feature_columns) != FEATURE_COLUMNS:
+        raise ValueError("feature_columns ใน model_info.json ไม่ตรงกับ features.FEATURE_COLUMNS")
+
+
+def model_info(model_dir=MODEL_DIR):
+    """model_info.json (ไม่มีไฟล์ = FEATURE_COLUMNS ปัจจุบัน, lag_mode='rows' แบบโมเดลเดิม)"""
+    try:
+        with open(os.path.join(model_dir, 'model_info.json')) as f:
+            info = json.load(f)
+    except OSError:
+        info = {'feature_columns': FEATURE_COLUMNS}
+    info.setdefault('lag_mode', 'rows')
+    return info
+
+
+def ensure_ubj(model_dir=MODEL_DIR):
+    """
+    แปลง .json เป็น .ubj เมื่อยังไม่มีหรือ .json ใหม่กว่า คืนค่า path ที่ควรโหลด
+    (โฟลเดอร์เขียนไม่ได้ = ใช้ .json ต่อ)
+    """
+    json_path = os.path.join(model_dir, MODEL_NAME + '.json')
+    ubj_path = os.path.join(model_dir, MODEL_NAME + '.ubj')
+    if os.path.exists(ubj_path) and (not os.path.exists(json_path) or
+                                     os.path.getmtime(ubj_path) >= os.path.getmtime(json_path)):
+        return ubj_path
+    booster = xgb.Booster()
+    booster.load_model(json_path)
+    # เขียนไฟล์ชั่วคราว (นามสกุล .ubj เพื่อให้ XGBoost เลือกรูปแบบ binary) แล้วค่อยแทนที่
+    tmp_path = os.path.join(model_dir, MODEL_NAME + '.tmp.ubj')
+    try:
+        booster.save_model(tmp_path)
+        os.replace(tmp_path, ubj_path)
+    except OSError:
+        return json_path
+    return ubj_path
+
+
+def load_predictor(model_dir=MODEL_DIR, binary=True, nthread=None):
+    """โหลด booster (binary=True: ผ่าน .ubj) และตรวจฟีเจอร์กับ model_info.json"""
+    path = ensure_ubj(model_dir) if binary else os.path.join(model_dir, MODEL_NAME + '.json')
+    booster = xgb.Booster()
+    booster.load_model(path)
+    info = model_info(model_dir)
+    return Predictor(booster, info['feature_columns'], path, nthread, info['lag_mode'])
+
+
+_predictors = {}
+_lock = threading.Lock()
+
+
+def model_version(model_dir=MODEL_DIR):
+    """เวอร์ชันของโมเดล (ขนาด + เวลาแก้ไขไฟล์ .json) ใช้เป็นคีย์ของแคชผลทำนาย"""
+    stat = os.stat(os.path.join(model_dir, MODEL_NAME + '.json'))
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def get_predictor(model_dir=MODEL_DIR):
+    """Predictor ที่ใช้ร่วมกันทั้งโปรเซส โหลดใหม่เมื่อไฟล์โมเดลเปลี่ยน (ดู model_version)"""
+    version = model_version(model_dir)
+    with _lock:
+        cached = _predictors.get(model_dir)
+        if cached is None or cached[0] != version:
+            cached = (version, load_predictor(model_dir))
+            _predictors[model_dir] = cached
+        return cached[1]
+
+
+def benchmark_inference(model_dir=MODEL_DIR, n_rows=100_000, single_rows=1000, seed=0):
+    """
+    เวลาโหลดโมเดล (pickle / XGBRegressor JSON / Booster JSON / Booster UBJ)
+    และความเร็วการทำนาย (แถว/วินาที) ของ XGBRegressor.predict เทียบกับ inplace_predict
+    ตรวจว่าผลทำนายของทุกวิธีตรงกัน
+    """
+    results = {'load': {}, 'rows_per_second': {}}
+    loaders = {
+        'XGBRegressor JSON': lambda: _load_regressor(model_dir),
+        'Booster JSON': lambda: load_predictor(model_dir, binary=False),
+        'Booster UBJ': lambda: load_predictor(model_dir, binary=True)
+    }
+    pkl_path = os.path.join(model_dir, MODEL_NAME + '.pkl')
+    if os.path.exists(pkl_path):
+        loaders['pickle'] = lambda: _load_pickle(pkl_path)
+    ensure_ubj(model_dir)
+    for name, loader in loaders.items():
+        t0 = time.perf_counter()
+        loader()
+        results['load'][name] = time.perf_counter() - t0
+
+    rng = np.random.default_rng(seed)
+    predictor = load_predictor(model_dir)
+    X = pd.DataFrame(rng.random((n_rows, len(FEATURE_COLUMNS))) * 10, columns=FEATURE_COLUMNS)
+    regressor = _load_regressor(model_dir)
+
+    t0 = time.perf_counter()
+    expected = regressor.predict(X)
+    results['rows_per_second']['XGBRegressor.predict'] = n_rows / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    batch = predictor.predict(X)
+    results['rows_per_second']['inplace_predict (batch)'] = n_rows / (time.perf_counter() - t0)
+
+    rows = X.iloc[:single_rows].to_dict('records')
+    t0 = time.perf_counter()
+    single = np.array([predictor.predict_one(row) for row in rows])
+    results['rows_per_second']['predict_one'] = single_rows / (time.perf_counter() - t0)
+
+    np.testing.assert_allclose(batch, expected, rtol=1e-6)
+    np.testing.assert_allclose(single, expected[:single_rows], rtol=1e-6)
+    return results
+
+
+def _load_pickle(path):
+    """โหลดไฟล์ .pkl ของโน้ตบุ๊ก (โมเดลที่บันทึกตอนเทรนบน GPU จะเตือนเรื่อง device ซึ่งไม่ต้องแสดง)"""
+    import pickle
+    import warnings
+
+    with warnings.catch_warnings(), open(path, 'rb') as f:
+        warnings.simplefilter('ignore')
+        return pickle.load(f)
+
+
+def _load_regressor(model_dir):
+    """วิธีโหลดเดิม (XGBRegressor + load_model) เก็บไว้เทียบเวลา"""
+    model = xgb.XGBRegressor()
+    model.load_model(os.path.join(model_dir, MODEL_NAME + '.json'))
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load the model once and predict in-process')
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--benchmark', action='store_true', help='model load time and rows/second')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--start', default=None, help='recompute the forecast from this date')
+    parser.add_argument('--end', default=None)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = benchmark_inference(args.model_dir, args.rows)
+        print("Load time:")
+        for name, seconds in results['load'].items():
+            print(f"  • {name:<24} {seconds * 1000:8.1f} ms")
+        print("Prediction throughput (outputs identical):")
+        for name, rate in results['rows_per_second'].items():
+            print(f"  • {name:<24} {rate:12,.0f} rows/s")
+    else:
+        from features import load_history
+        from forecast import DEFAULT_END, DEFAULT_START
+
+        predictor = load_predictor(args.model_dir)
+        t0 = time.perf_counter()
+        output = predictor.forecast(load_history(), args.start or DEFAULT_START, args.end or DEFAULT_END)
+        print(f"✓ Forecast {len(output):,} rows in {time.perf_counter() - t0:.2f}s "
+              f"using {os.path.basename(predictor.path)}")
+        print(f"  • Total cases: {output['predicted_cases'].sum():,.0f}")
@@ -0,0 +1,203 @@
+"""
+นำเข้าข้อมูลอุบัติเหตุรายครั้ง (raw records) เป็นตารางจำนวนอุบัติเหตุรายวัน
+(adate, rcode, aampur_clean, aplace_clean, acc_cases) แบบอ่านทีละ chunk
+
+- อ่าน CSV ทีละ chunk เฉพาะคอลัมน์ที่ใช้ จึงใช้หน่วยความจำตามขนาด chunk ไม่ใช่ขนาดไฟล์
+- กรองช่วงวันที่ (เดือน / ปีขั้นต่ำ) ก่อนทำความสะอาดรหัส เพื่อลดแถวที่ต้องประมวลผล
+- ทำความสะอาด aampur / aplace เป็นรหัส 2 หลัก ('99' = ไม่ทราบ) ด้วย utils.clean_aampur_column
+  (ทำความสะอาดเฉพาะค่าที่ไม่ซ้ำกันของแต่ละ chunk ไม่ใช่ .apply ทีละแถว)
+  รหัสนอกช่วง 0-99 (เช่น '150', '-3') ถือเป็นไม่ทราบ ('99') และนับไว้ใน attrs['out_of_range']
+- นับจำนวนแถวต่อ (วันที่, กลุ่ม) ด้วย key จำนวนเต็ม แล้วรวมยอดสะสมข้าม chunk
+  (หน่วยความจำของยอดสะสม = จำนวน (วันที่, กลุ่ม) ที่ไม่ซ้ำกัน)
+
+รัน:
+    python src/ingest.py raw_2018.csv raw_2019.csv --output dataset/accident_count4col.csv
+
+ตรวจกับ groupby().size() ของ pandas (ข้อมูลดิบจำลอง อ่านหลาย chunk):
+    python src/ingest.py --check
+"""
+import os
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from config import HISTORY_PATH
+from schema import pack_group_key, unpack_group_key
+from utils import clean_aampur, clean_aampur_column, date_mask
+
+DEFAULT_CHUNKSIZE = 500_000
+DEFAULT_MONTHS = (12, 1)
+OUTPUT_COLUMNS = ['adate', 'rcode', 'aampur_clean', 'aplace_clean', 'acc_cases']
+
+# key ของ (วันที่, กลุ่ม) = วัน (นับจาก 1970-01-01) * _DAY_SCALE + group key
+_DAY_SCALE = 10 ** 10
+# รหัส aampur / aplace ที่ใช้แทนค่าไม่ทราบ (รวมค่านอกช่วง 0-99 ที่ pack_group_key รับไม่ได้)
+UNKNOWN_CODE = 99
+
+
+def _clip_codes(values):
+    """รหัสเป็น int32 ค่านอกช่วง 0-99 เป็น UNKNOWN_CODE คืนค่า (รหัส, จำนวนค่านอกช่วง)"""
+    codes = values.astype(np.int64)
+    out_of_range = (codes < 0) | (codes > 99)
+    return np.where(out_of_range, UNKNOWN_CODE, codes).astype(np.int32), int(out_of_range.sum())
+
+
+def chunk_counts(chunk, date_column='adate', rcode_column='rcode', aampur_column='aampur',
+                 aplace_column='aplace', date_format=None, months=DEFAULT_MONTHS, min_year=None):
+    """
+    จำนวนแถวต่อ (วันที่, กลุ่ม) ของ chunk เดียว
+    คืนค่า (keys, counts, จำนวนรหัส aampur / aplace ที่นอกช่วง) keys เรียงแล้ว
+    """
+    dates = pd.to_datetime(chunk[date_column], format=date_format, errors='coerce')
+    rcode = pd.to_numeric(chunk[rcode_column], errors='coerce')
+    keep = date_mask(dates, months, min_year) & rcode.notna().to_numpy()
+    if not keep.any():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0
+
+    aampur, aampur_bad = _clip_codes(clean_aampur_column(chunk[aampur_column].to_numpy()[keep]))
+    aplace, aplace_bad = _clip_codes(clean_aampur_column(chunk[aplace_column].to_numpy()[keep]))
+    group_key = pack_group_key(rcode.to_numpy()[keep], aampur, aplace).astype(np.int64)
+    days = dates.to_numpy()[keep].astype('datetime64[D]').astype(np.int64)
+
+    keys, counts = np.unique(days * _DAY_SCALE + group_key, return_counts=True)
+    return keys, counts, aampur_bad + aplace_bad
+
+
+def _merge_counts(keys, counts, new_keys, new_counts):
+    """รวมยอดสะสมกับยอดของ chunk ใหม่ (key ที่ซ้ำกันจะถูกบวกกัน)"""
+    all_keys = np.concatenate([keys, new_keys])
+    merged, inverse = np.unique(all_keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate([counts, new_counts]),
+                         minlength=len(merged))
+    return merged, totals.astype(np.int64)
+
+
+def counts_frame(keys, counts):
+    """แปลง key + จำนวน เป็นตารางรูปแบบ accident_count4col.csv"""
+    days, group_key = np.divmod(keys, _DAY_SCALE)
+    rcode, aampur, aplace = unpack_group_key(group_key)
+    df = pd.DataFrame({
+        'adate': days.astype('datetime64[D]'),
+        'rcode': rcode,
+        'aampur_clean': pd.Series(aampur).astype(str).str.zfill(2),
+        'aplace_clean': pd.Series(aplace).astype(str).str.zfill(2),
+        'acc_cases': counts
+    })
+    df['adate'] = df['adate'].dt.strftime('%Y-%m-%d')
+    return df[OUTPUT_COLUMNS]
+
+
+def ingest(paths, chunksize=DEFAULT_CHUNKSIZE, date_column='adate', rcode_column='rcode',
+           aampur_column='aampur', aplace_column='aplace', date_format=None,
+           months=DEFAULT_MONTHS, min_year=None, encoding='utf-8'):
+    """
+    อ่านไฟล์ raw ทุกไฟล์ทีละ chunk แล้วคืนตารางจำนวนอุบัติเหตุรายวัน
+    เรียงตามวันที่ แล้ว rcode, aampur_clean, aplace_clean
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    usecols = [date_column, rcode_column, aampur_column, aplace_column]
+    # อ่านรหัสเป็นข้อความ เพราะข้อมูลดิบมีค่าอย่าง 'LA', 'MY' ปนอยู่
+    dtype = {aampur_column: str, aplace_column: str}
+
+    keys = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    rows = out_of_range = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize,
+                                 encoding=encoding):
+            rows += len(chunk)
+            new_keys, new_counts, bad = chunk_counts(
+                chunk, date_column, rcode_column, aampur_column, aplace_column,
+                date_format, months, min_year
+            )
+            keys, counts = _merge_counts(keys, counts, new_keys, new_counts)
+            out_of_range += bad
+
+    result = counts_frame(keys, counts)
+    result.attrs['raw_rows'] = rows
+    result.attrs['out_of_range'] = out_of_range
+    return result
+
+
+def _ingest_pandas(raw, months=DEFAULT_MONTHS):
+    """วิธีอ้างอิง (.apply(clean_aampur) ทีละแถว + groupby().size()) ใช้ตรวจผลของ ingest"""
+    raw = raw.assign(adate=pd.to_datetime(raw['adate'], errors='coerce'),
+                     rcode=pd.to_numeric(raw['rcode'], errors='coerce'))
+    raw = raw[raw['adate'].notna() & raw['rcode'].notna()]
+    if months is not None:
+        raw = raw[raw['adate'].dt.month.isin(months)]
+
+    def clean(x):
+        code = int(clean_aampur(x))
+        return f"{code if 0 <= code <= 99 else UNKNOWN_CODE:02d}"
+
+    raw = raw.assign(aampur_clean=raw['aampur'].apply(clean), aplace_clean=raw['aplace'].apply(clean),
+                     rcode=raw['rcode'].astype(np.int64))
+    counts = (raw.groupby(['adate', 'rcode', 'aampur_clean', 'aplace_clean']).size()
+              .rename('acc_cases').reset_index())
+    counts['adate'] = counts['adate'].dt.strftime('%Y-%m-%d')
+    return counts[OUTPUT_COLUMNS]
+
+
+def _raw_sample(n_rows=20_000, seed=0):
+    """ข้อมูลดิบจำลอง: รหัสปนข้อความ / ค่าว่าง / ค่านอกช่วง, วันที่ผิดรูปแบบ, หลายเดือน"""
+    rng = np.random.default_rng(seed)
+    codes = np.array(['1', '01', '2', '10', '99', 'LA', 'MY', '', ' 4 ', '150', '-3', '7.0'], dtype=object)
+    dates = pd.date_range('2023-11-25', '2024-02-05', freq='D').strftime('%Y-%m-%d').to_numpy()
+    raw = pd.DataFrame({
+        'adate': rng.choice(np.r_[dates, ['not-a-date']], n_rows),
+        'rcode': rng.choice(['1001', '1002', '5001', '9001', 'x'], n_rows),
+        'aampur': rng.choice(codes, n_rows),
+        'aplace': rng.choice(codes, n_rows)
+    })
+    raw.loc[rng.random(n_rows) < 0.02, 'aampur'] = np.nan
+    return raw
+
+
+def check_ingest(chunksize=1_000):
+    """ingest ทีละ chunk เล็ก ๆ (ผ่าน _merge_counts หลายรอบ) ต้องเท่ากับ groupby ทีเดียวของ pandas"""
+    raw = _raw_sample()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'raw.csv')
+        raw.to_csv(path, index=False)
+        actual = ingest(path, chunksize=chunksize)
+    expected = _ingest_pandas(raw)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+    assert actual.attrs['out_of_range'] > 0
+    return actual
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate raw accident records into daily counts')
+    parser.add_argument('paths', nargs='*', help='raw accident record CSV files')
+    parser.add_argument('--check', action='store_true', help='compare against a pandas groupby on sample data')
+    parser.add_argument('--output', default=HISTORY_PATH)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--date-column', default='adate')
+    parser.add_argument('--rcode-column', default='rcode')
+    parser.add_argument('--aampur-column', default='aampur')
+    parser.add_argument('--aplace-column', default='aplace')
+    parser.add_argument('--date-format', default=None, help="e.g. '%%Y-%%m-%%d'")
+    parser.add_argument('--months', type=int, nargs='*', default=list(DEFAULT_MONTHS),
+                        help='months to keep (empty = all)')
+    parser.add_argument('--min-year', type=int, default=None)
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+
+    if args.check or not args.paths:
+        counts = check_ingest()
+        print(f"✓ Chunked ingest matches the pandas groupby ({len(counts):,} daily counts, "
+              f"{counts.attrs['out_of_range']:,} out-of-range codes → '{UNKNOWN_CODE}')")
+        raise SystemExit
+
+    counts = ingest(args.paths, args.chunksize, args.date_column, args.rcode_column,
+                    args.aampur_column, args.aplace_column, args.date_format,
+                    tuple(args.months) or None, args.min_year, args.encoding)
+    counts.to_csv(args.output, index=False)
+    print(f"✓ {counts.attrs['raw_rows']:,} records → {len(counts):,} daily counts → {args.output}")
+    print(f"  • Total cases: {counts['acc_cases'].sum():,}")
+    if counts.attrs['out_of_range']:
+        print(f"  • Out-of-range aampur/aplace codes mapped to {UNKNOWN_CODE}: {counts.attrs['out_of_range']:,}")
@@ -0,0 +1,358 @@
+"""
+สร้างแผนที่ folium แบบ vectorized
+
+จุดของทุกอำเภอถูกส่งเป็น GeoJSON FeatureCollection ชุดเดียว โดยคำนวณรัศมีและสีเป็น array
+ล่วงหน้า ส่วน popup/tooltip สร้างฝั่ง browser จาก template เดียว แทนการสร้าง
+folium.CircleMarker + popup HTML ทีละแถว
+- รัศมี/สีใช้เกณฑ์ของ binning.py (ส่ง bins ที่แคชไว้ต่อเวอร์ชันข้อมูล เพื่อให้สีและคำอธิบายสีคงที่
+  ทุกตัวกรอง ไม่ส่ง = คำนวณเกณฑ์จากข้อมูลที่แสดง)
+
+เปรียบเทียบเวลาและขนาด HTML กับวิธีเดิม:
+    python src/map_render.py
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import folium
+from folium import plugins
+from folium.map import Layer
+from folium.template import Template
+
+from binning import MarkerBins
+
+DEFAULT_CENTER = (13.736717, 100.523186)
+DEFAULT_ZOOM = 6
+
+HEATMAP_GRADIENT = {
+    0.0: 'blue',
+    0.3: 'lime',
+    0.5: 'yellow',
+    0.7: 'orange',
+    1.0: 'red'
+}
+
+# CSS สำหรับเอฟเฟกต์กะพริบ (ไม่ขยับตำแหน่ง)
+PULSE_CSS = """
+<style>
+@keyframes pulse {
+    0% {
+        opacity: 1;
+        filter: brightness(1);
+    }
+    50% {
+        opacity: 0.3;
+        filter: brightness(1.5);
+    }
+    100% {
+        opacity: 1;
+        filter: brightness(1);
+    }
+}
+
+.pulse-marker {
+    animation: pulse 2s ease-in-out infinite;
+}
+
+/* สุ่มความเร็วการกะพริบแบบภัยพิบัติ */
+.leaflet-interactive:nth-child(5n) {
+    animation-duration: 1.2s;
+    animation-delay: 0.1s;
+}
+
+.leaflet-interactive:nth-child(5n+1) {
+    animation-duration: 2.5s;
+    animation-delay: 0.4s;
+}
+
+.leaflet-interactive:nth-child(5n+2) {
+    animation-duration: 1.7s;
+    animation-delay: 0.7s;
+}
+
+.leaflet-interactive:nth-child(5n+3) {
+    animation-duration: 2.1s;
+    animation-delay: 0.3s;
+}
+
+.leaflet-interactive:nth-child(5n+4) {
+    animation-duration: 1.9s;
+    animation-delay: 0.6s;
+}
+</style>
+"""
+
+
+class MarkerLayer(Layer):
+    """
+    Layer วงกลมของทุกอำเภอจาก GeoJSON ชุดเดียว
+    - รัศมี/สีอ่านจาก properties ของแต่ละ feature (data-driven styling)
+    - popup และ tooltip สร้างจาก template ฝั่ง browser เมื่อผู้ใช้ hover/คลิก
+      (ทุกค่าที่แทรกลง HTML ผ่าน escape ของ & < > " ')
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_escape = function (value) {
+                return String(value).replace(/[&<>"']/g, function (ch) {
+                    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[ch];
+                });
+            };
+            var {{ this.get_name() }} = L.geoJSON({{ this.data }}, {
+                pointToLayer: function (feature, latlng) {
+                    var p = feature.properties;
+                    return L.circleMarker(latlng, {
+                        radius: p.radius,
+                        color: 'red',
+                        fillColor: p.color,
+                        fillOpacity: 0.7,
+                        weight: 2,
+                        className: 'pulse-marker'
+                    });
+                },
+                onEachFeature: function (feature, layer) {
+                    var p = feature.properties;
+                    var esc = {{ this.get_name() }}_escape;
+                    var amphoe = esc(p.amphoe);
+                    var cases = esc(p.cases.toFixed(0));
+                    layer.bindTooltip('🏘️ ' + amphoe + ': ' + cases + ' ครั้ง');
+                    layer.bindPopup(function () {
+                        var c = feature.geometry.coordinates;
+                        return "<div style='font-family: \\"Sarabun\\", Arial; min-width: 250px; padding: 10px;'>"
+                            + "<h3 style='color: #d32f2f; margin: 0 0 10px 0; border-bottom: 2px solid #d32f2f; padding-bottom: 5px;'>📍 " + amphoe + "</h3>"
+                            + "<p style='margin: 8px 0; font-size: 14px;'><b>🏙️ จังหวัด:</b> " + esc(p.province) + "</p>"
+                            + "<p style='margin: 8px 0; font-size: 14px;'><b>🚨 จำนวนอุบัติเหตุพยากรณ์:</b> "
+                            + "<span style='color: #d32f2f; font-size: 18px; font-weight: bold;'>" + cases + "</span> ครั้ง</p>"
+                            + "<p style='margin: 8px 0; font-size: 12px; color: #666;'><b>📌 พิกัด:</b> "
+                            + esc(c[1].toFixed(4)) + ", " + esc(c[0].toFixed(4)) + "</p>"
+                            + "<hr style='margin: 10px 0; border: none; border-top: 1px solid #ddd;'>"
+                            + "<p style='margin: 5px 0; font-size: 11px; color: #999; text-align: center;'>คลิกที่จุดอื่นเพื่อดูข้อมูลเพิ่มเติม</p>"
+                            + "</div>";
+                    }, {maxWidth: 300});
+                }
+            });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, data, name=None, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'MarkerLayer'
+        # ไม่ escape อักษรไทยเป็น \uXXXX เพื่อลดขนาด payload (escape เฉพาะ </ สำหรับแท็ก script)
+        self.data = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def map_view(accident_summary):
+    """คำนวณจุดกึ่งกลางและ zoom ให้พอดีกับข้อมูลที่แสดง"""
+    lat = accident_summary['LAT'].to_numpy(dtype=float)
+    lon = accident_summary['LONG'].to_numpy(dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    if not valid.any():
+        return DEFAULT_CENTER, DEFAULT_ZOOM
+
+    min_lat, max_lat = lat[valid].min(), lat[valid].max()
+    min_lon, max_lon = lon[valid].min(), lon[valid].max()
+    center = ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+
+    max_diff = max(max_lat - min_lat, max_lon - min_lon)
+    if max_diff > 10:
+        zoom = 6
+    elif max_diff > 5:
+        zoom = 7
+    elif max_diff > 2:
+        zoom = 8
+    elif max_diff > 1:
+        zoom = 9
+    else:
+        zoom = 10
+    return center, zoom
+
+
+def legend_html(bins):
+    """คำอธิบายสี (มุมขวาล่างของแผนที่) ในหน่วยอุบัติเหตุเฉลี่ยต่อวัน"""
+    rows = ''.join(
+        f"<div><span style='display:inline-block;width:12px;height:12px;margin-right:6px;"
+        f"background:{color};border:1px solid #999;'></span>{label}</div>"
+        for color, label in bins.legend()
+    )
+    return (
+        "<div style='position: fixed; bottom: 30px; right: 10px; z-index: 1000; "
+        "background: rgba(255,255,255,0.85); padding: 8px 10px; border-radius: 4px; "
+        "font-family: \"Sarabun\", Arial; font-size: 12px; line-height: 18px;'>"
+        f"<b>อุบัติเหตุเฉลี่ย/วัน</b>{rows}</div>"
+    )
+
+
+def marker_features(accident_summary, bins=None, n_days=1):
+    """
+    แปลงตารางสรุปรายอำเภอเป็น GeoJSON FeatureCollection (เฉพาะแถวที่มีพิกัด)
+    - bins: เกณฑ์สี/รัศมี (binning.MarkerBins), n_days: จำนวนวันของตัวกรอง (ยอด ÷ วัน ก่อนเทียบเกณฑ์)
+    """
+    cases = accident_summary['predicted_cases'].to_numpy(dtype=float)
+    if bins is None:
+        # ไม่มีเกณฑ์ที่แคชไว้: คำนวณจากข้อมูลทั้งหมดที่แสดง (ก่อนตัดแถวที่ไม่มีพิกัด)
+        bins = MarkerBins.from_values(cases, n_days)
+    valid = (accident_summary['LAT'].notna() & accident_summary['LONG'].notna()).to_numpy()
+    radius = bins.radius(cases, n_days)[valid]
+    colors = bins.colors(cases, n_days)[valid]
+
+    summary = accident_summary[valid]
+    cases = summary['predicted_cases'].to_numpy(dtype=float)
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, 5), round(lat, 5)]},
+            'properties': {'amphoe': amphoe, 'province': province, 'cases': case,
+                           'radius': round(r, 2), 'color': color}
+        }
+        for lat, lon, amphoe, province, case, r, color in zip(
+            summary['LAT'].tolist(), summary['LONG'].tolist(),
+            summary['AMPHOE_T'].tolist(), summary['CHANGWAT_T'].tolist(),
+            cases.tolist(), radius.tolist(), colors.tolist()
+        )
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_base_map(center, zoom, bins=None):
+    """แผนที่พื้นหลังพร้อม CSS กะพริบและปุ่มเต็มจอ (ยังไม่มีจุดข้อมูล) และคำอธิบายสีเมื่อระบุ bins"""
+    m = folium.Map(location=list(center), zoom_start=zoom, tiles='CartoDB dark_matter')
+    m.get_root().html.add_child(folium.Element(PULSE_CSS))
+    if bins is not None:
+        m.get_root().html.add_child(folium.Element(legend_html(bins)))
+    plugins.Fullscreen().add_to(m)
+    return m
+
+
+def build_map(accident_summary, bins=None, n_days=1):
+    """
+    สร้างแผนที่ folium พร้อม layer วงกลม, HeatMap, CSS กะพริบ และปุ่มเต็มจอ
+    - bins / n_days: ดู marker_features (ระบุ bins = แสดงคำอธิบายสีด้วย)
+    """
+    center, zoom = map_view(accident_summary)
+    m = build_base_map(center, zoom, bins)
+
+    if len(accident_summary) > 0:
+        collection = marker_features(accident_summary, bins, n_days)
+        if collection['features']:
+            MarkerLayer(collection).add_to(m)
+
+            heat_data = [
+                [f['geometry']['coordinates'][1], f['geometry']['coordinates'][0],
+                 f['properties']['cases']]
+                for f in collection['features']
+            ]
+            plugins.HeatMap(
+                heat_data,
+                min_opacity=0.2,
+                max_opacity=0.8,
+                radius=25,
+                blur=35,
+                gradient=HEATMAP_GRADIENT
+            ).add_to(m)
+
+    return m
+
+
+def cluster_feature_group(clusters, bins=None, n_days=1):
+    """
+    FeatureGroup ของกลุ่มจุดที่มองเห็น (ใช้กับ st_folium feature_group_to_add)
+    - เมื่อซูม/เลื่อนแผนที่ จะส่งเฉพาะ layer นี้ใหม่ ไม่ต้องสร้างแผนที่ทั้งหมด
+    - bins: เกณฑ์ของระดับ 'cluster-<zoom>' (binning.get_bins)
+    """
+    group = folium.FeatureGroup(name='clusters')
+    collection = marker_features(clusters, bins, n_days)
+    if collection['features']:
+        MarkerLayer(collection).add_to(group)
+    return group
+
+
+def _build_map_loop(accident_summary):
+    """วิธีเดิม (iterrows + CircleMarker ทีละแถว) เก็บไว้เพื่อใช้เปรียบเทียบใน benchmark เท่านั้น"""
+    center, zoom = map_view(accident_summary)
+    m = folium.Map(location=list(center), zoom_start=zoom, tiles='CartoDB dark_matter')
+    bins = MarkerBins.from_values(accident_summary['predicted_cases'])
+    radius = bins.radius(accident_summary['predicted_cases'])
+    colors = bins.colors(accident_summary['predicted_cases'])
+    heat_data = []
+
+    for idx, row in accident_summary.reset_index(drop=True).iterrows():
+        if pd.notna(row['LAT']) and pd.notna(row['LONG']):
+            info_html = f"""
+            <div style='font-family: "Sarabun", Arial; min-width: 250px; padding: 10px;'>
+                <h3 style='color: #d32f2f; margin: 0 0 10px 0; border-bottom: 2px solid #d32f2f; padding-bottom: 5px;'>
+                    📍 {row['AMPHOE_T']}
+                </h3>
+                <p style='margin: 8px 0; font-size: 14px;'><b>🏙️ จังหวัด:</b> {row['CHANGWAT_T']}</p>
+                <p style='margin: 8px 0; font-size: 14px;'><b>🚨 จำนวนอุบัติเหตุพยากรณ์:</b>
+                    <span style='color: #d32f2f; font-size: 18px; font-weight: bold;'>{row['predicted_cases']:.0f}</span> ครั้ง
+                </p>
+                <p style='margin: 8px 0; font-size: 12px; color: #666;'>
+                    <b>📌 พิกัด:</b> {row['LAT']:.4f}, {row['LONG']:.4f}
+                </p>
+                <hr style='margin: 10px 0; border: none; border-top: 1px solid #ddd;'>
+                <p style='margin: 5px 0; font-size: 11px; color: #999; text-align: center;'>
+                    คลิกที่จุดอื่นเพื่อดูข้อมูลเพิ่มเติม
+                </p>
+            </div>
+            """
+            folium.CircleMarker(
+                location=[row['LAT'], row['LONG']],
+                radius=radius[idx],
+                popup=folium.Popup(info_html, max_width=300),
+                tooltip=f"🏘️ {row['AMPHOE_T']}: {row['predicted_cases']:.0f} ครั้ง",
+                color='red',
+                fillColor=colors[idx],
+                fillOpacity=0.7,
+                weight=2,
+                className='pulse-marker'
+            ).add_to(m)
+            heat_data.append([row['LAT'], row['LONG'], row['predicted_cases']])
+
+    if heat_data:
+        plugins.HeatMap(heat_data, min_opacity=0.2, max_opacity=0.8, radius=25, blur=35,
+                        gradient=HEATMAP_GRADIENT).add_to(m)
+    m.get_root().html.add_child(folium.Element(PULSE_CSS))
+    plugins.Fullscreen().add_to(m)
+    return m
+
+
+def benchmark_render(accident_summary, repeats=3):
+    """วัดเวลาสร้าง + render HTML และขนาด HTML ของวิธีเดิมเทียบกับแบบ vectorized"""
+    results = {}
+    for name, builder in (('loop', _build_map_loop), ('vectorized', build_map)):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            html = builder(accident_summary).get_root().render()
+            timings.append(time.perf_counter() - start)
+        results[name] = {'seconds': min(timings), 'html_bytes': len(html.encode('utf-8'))}
+    return results
+
+
+if __name__ == '__main__':
+    from data_store import ensure_store, load_cube
+
+    ensure_store()
+    cube = load_cube()
+    national = cube.summary(cube.min_date, cube.max_date)
+    province = national['CHANGWAT_T'].value_counts().index[0]
+
+    print(f"{'='*60}")
+    print("🗺️  MAP RENDER BENCHMARK")
+    print(f"{'='*60}")
+    scales = (
+        (f'province ({province})', national[national['CHANGWAT_T'] == province]),
+        ('national', national)
+    )
+    for label, summary in scales:
+        results = benchmark_render(summary)
+        loop, vec = results['loop'], results['vectorized']
+        print(f"\n  {label}: {len(summary):,} amphoes")
+        print(f"    loop:       {loop['seconds']*1000:8.1f} ms  {loop['html_bytes']/1024:8.1f} KB")
+        print(f"    vectorized: {vec['seconds']*1000:8.1f} ms  {vec['html_bytes']/1024:8.1f} KB")
+        print(f"    speedup:    {loop['seconds']/vec['seconds']:8.1f}x  "
+              f"size ratio {vec['html_bytes']/loop['html_bytes']:.2f}")
@@ -0,0 +1,100 @@
+"""
+แคช LRU ของผลลัพธ์ที่ render แล้ว (เช่น HTML ของแผนที่ folium) ใช้ร่วมกันทุก session
+
+- จำกัดขนาดตามหน่วยความจำจริงของค่าที่เก็บ (ไม่ใช่จำนวนรายการ)
+- ผูกกับ data_version ของคลังข้อมูล เมื่อไฟล์พยากรณ์เปลี่ยน แคชจะถูกล้างอัตโนมัติ
+- นับ hit/miss/eviction เพื่อใช้กำหนดขนาดแคชที่เหมาะสม
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+
+def map_cache_key(start_date, end_date, province=None, amphoe=None):
+    """คีย์แคชของแผนที่ตามสถานะตัวกรอง (None = ทั้งหมด)"""
+    return ('map', str(start_date), str(end_date), province, amphoe)
+
+
+class RenderCache:
+    """แคช LRU แบบ thread-safe ที่ evict ตามขนาดรวมของค่าที่เก็บ (bytes)"""
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.data_version = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _sizeof(value):
+        return sys.getsizeof(value)
+
+    def set_version(self, data_version):
+        """ล้างแคชทั้งหมดเมื่อเวอร์ชันข้อมูลเปลี่ยน"""
+        with self._lock:
+            if data_version != self.data_version:
+                self._entries.clear()
+                self._bytes = 0
+                self.data_version = data_version
+
+    def get(self, key):
+        """คืนค่าที่แคชไว้ (None ถ้าไม่มี) และเลื่อนรายการเป็นล่าสุด"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, data_version=None):
+        """
+        เก็บค่า แล้ว evict รายการที่ใช้น้อยที่สุดจนขนาดรวมไม่เกิน max_bytes
+        - ถ้าระบุ data_version แล้วไม่ตรงกับเวอร์ชันปัจจุบัน จะไม่เก็บ (ผลลัพธ์จากข้อมูลเก่า)
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            if data_version is not None and data_version != self.data_version:
+                return value
+            # ค่าที่ใหญ่กว่าแคชทั้งก้อนไม่ต้องเก็บ
+            if size > self.max_bytes:
+                return value
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def get_or_create(self, key, factory):
+        """คืนค่าจากแคช หรือเรียก factory() แล้วเก็บผลลัพธ์ไว้"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, factory())
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        """สถิติของแคช (ใช้ประกอบการกำหนด max_bytes)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
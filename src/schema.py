@@ -0,0 +1,116 @@
+"""
+ชนิดข้อมูล (dtype) แบบประหยัดหน่วยความจำของตารางอุบัติเหตุและตารางพยากรณ์
+
+- rcode เป็น int16, aampur_clean / aplace_clean เป็น int8, จำนวนอุบัติเหตุเป็น int16 / float32
+- adate อ่านด้วยรูปแบบวันที่คงที่ (ไม่ต้องเดารูปแบบทีละแถว)
+- group key ของ (rcode, aampur_clean, aplace_clean) เป็นจำนวนเต็มเดียว (int32)
+  แทนสตริง rcode_aampur_aplace: rcode * 10000 + aampur * 100 + aplace
+  เช่น (1004, 4, 10) → 10040410 จึงยังอ่านด้วยตาได้ และเรียงตาม rcode → อำเภอ → สถานที่
+
+ดูหน่วยความจำที่ลดลง:
+    python src/schema.py
+"""
+import numpy as np
+import pandas as pd
+
+from config import FORECAST_PATH, HISTORY_PATH
+
+DATE_FORMAT = '%Y-%m-%d'
+
+ACCIDENT_DTYPES = {
+    'rcode': np.int16,
+    'aampur_clean': np.int8,
+    'aplace_clean': np.int8,
+    'acc_cases': np.int16
+}
+FORECAST_DTYPES = {
+    'rcode': np.int16,
+    'aampur_clean': np.int8,
+    'aplace_clean': np.int8,
+    'predicted_cases': np.float32
+}
+
+# ตำแหน่งของแต่ละส่วนใน group key (ฐานสิบ)
+_RCODE_SCALE = 10000
+_AAMPUR_SCALE = 100
+
+
+def pack_group_key(rcode, aampur, aplace):
+    """รวม (rcode, aampur_clean, aplace_clean) เป็น group key แบบ int32"""
+    rcode = np.asarray(rcode, dtype=np.int32)
+    aampur = np.asarray(aampur, dtype=np.int32)
+    aplace = np.asarray(aplace, dtype=np.int32)
+    if np.any((aampur < 0) | (aampur >= 100) | (aplace < 0) | (aplace >= 100)):
+        raise ValueError("aampur_clean และ aplace_clean ต้องอยู่ในช่วง 0-99")
+    return rcode * _RCODE_SCALE + aampur * _AAMPUR_SCALE + aplace
+
+
+def unpack_group_key(key):
+    """แยก group key กลับเป็น (rcode, aampur_clean, aplace_clean)"""
+    key = np.asarray(key, dtype=np.int32)
+    return key // _RCODE_SCALE, key // _AAMPUR_SCALE % 100, key % _AAMPUR_SCALE
+
+
+def group_label(key):
+    """ป้ายชื่อกลุ่มแบบเดิม 'rcode_aampur_aplace' (ใช้ตอนแสดงผล/บันทึกรายงานเท่านั้น)"""
+    rcode, aampur, aplace = (pd.Series(part).astype(str) for part in unpack_group_key(key))
+    return (rcode + '_' + aampur + '_' + aplace).to_numpy()
+
+
+def parse_group_label(labels):
+    """แปลงป้ายชื่อ 'rcode_aampur_aplace' (เช่น '1001_1_10' ของโน้ตบุ๊ก) กลับเป็น group key"""
+    parts = pd.Series(labels, dtype=object).astype(str).str.split('_', expand=True)
+    if parts.shape[1] != 3 or parts.isna().any().any():
+        raise ValueError("group_id ต้องอยู่ในรูป 'rcode_aampur_aplace' หรือเป็น group key จำนวนเต็ม")
+    try:
+        rcode, aampur, aplace = (parts[i].astype(np.int32).to_numpy() for i in range(3))
+    except ValueError:
+        raise ValueError("group_id ต้องอยู่ในรูป 'rcode_aampur_aplace' หรือเป็น group key จำนวนเต็ม")
+    return pack_group_key(rcode, aampur, aplace)
+
+
+def read_accidents(path=HISTORY_PATH, months=None):
+    """
+    อ่านข้อมูลอุบัติเหตุรายวันด้วย dtype แบบประหยัด พร้อม group_id (group key แบบ int32)
+    - months: กรองเฉพาะเดือนที่กำหนด เช่น (12, 1)
+    """
+    df = pd.read_csv(path, dtype=ACCIDENT_DTYPES)
+    df['adate'] = pd.to_datetime(df['adate'], format=DATE_FORMAT)
+    if months is not None:
+        df = df[df['adate'].dt.month.isin(months)].reset_index(drop=True)
+    df['group_id'] = pack_group_key(df['rcode'], df['aampur_clean'], df['aplace_clean'])
+    return df
+
+
+def read_forecast(path=FORECAST_PATH):
+    """อ่านไฟล์พยากรณ์ด้วย dtype แบบประหยัด"""
+    df = pd.read_csv(path, dtype=FORECAST_DTYPES)
+    df['adate'] = pd.to_datetime(df['adate'], format=DATE_FORMAT)
+    return df
+
+
+def memory_mb(df):
+    """หน่วยความจำของ DataFrame (MB) รวมข้อความใน object column"""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def memory_report(path, reader):
+    """เทียบหน่วยความจำของการอ่านแบบเดิม (dtype ค่าเริ่มต้น + group_id สตริง) กับ schema นี้"""
+    default = pd.read_csv(path)
+    if 'acc_cases' in default:
+        default['group_id'] = (default['rcode'].astype(str) + '_' +
+                               default['aampur_clean'].astype(str) + '_' +
+                               default['aplace_clean'].astype(str))
+    compact = reader(path)
+    before, after = memory_mb(default), memory_mb(compact)
+    return {'rows': len(compact), 'before_mb': before, 'after_mb': after,
+            'saved_pct': (1 - after / before) * 100 if before else 0.0}
+
+
+if __name__ == '__main__':
+    for label, path, reader in (('accidents', HISTORY_PATH, read_accidents),
+                                ('forecast', FORECAST_PATH, read_forecast)):
+        report = memory_report(path, reader)
+        print(f"  • {label:<10} {report['rows']:>8,} rows  "
+              f"{report['before_mb']:7.2f} MB → {report['after_mb']:6.2f} MB  "
+              f"(-{report['saved_pct']:.0f}%)")
@@ -0,0 +1,296 @@
+"""
+ดัชนีเชิงพื้นที่ (KD-tree) ของพิกัดกึ่งกลางอำเภอและพิกัดตำบล สำหรับคำถามแบบ
+"ยอดพยากรณ์รวมในรัศมี N กม. จากจุดนี้" และ "อำเภอที่อยู่ในกรอบแผนที่ที่มองเห็น"
+
+แทนการคำนวณระยะ haversine กับทุกแถวของตารางสรุปแล้วกรองด้วย pandas ทุกคำขอ
+- รัศมี: KD-tree ของพิกัดบนทรงกลม (x, y, z) ระยะคอร์ดในทรงกลมเรียงลำดับเหมือนระยะตามผิวโลก
+  จึงค้นด้วยคอร์ดของรัศมีแล้วคำนวณ haversine เฉพาะจุดที่พบ
+- กรอบแผนที่: KD-tree ของ (lat, long) ค้นด้วยระยะ Chebyshev (p=inf) รอบจุดกลางกรอบ แล้วตัดขอบให้ตรงกรอบ
+- สร้างดัชนีครั้งเดียวต่อ cube ยอดของช่วงวันที่ได้จาก prefix sum ของ cube (ไม่ต้องสร้างตารางสรุปก่อน)
+- by='tambon': นับอำเภอที่มีตำบลใดตำบลหนึ่งอยู่ในรัศมี (อำเภอขนาดใหญ่ที่จุดกึ่งกลางอยู่นอกรัศมี)
+
+ตรวจกับการ scan ด้วย pandas และวัดเวลา:
+    python src/spatial.py
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from config import COORD_PATH
+from cube import SUMMARY_FIELDS
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 1000
+TAMBON_FIELDS = ['TA_ID', 'TAMBON_T', 'AM_ID_CLEAN', 'AMPHOE_T', 'CHANGWAT_T', 'LAT', 'LONG']
+NEARBY_BY = ('amphoe', 'tambon')
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """ระยะตามผิวโลก (กม.) แบบ vectorized"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _chord(km):
+    """ระยะคอร์ดบนทรงกลมรัศมี 1 ของระยะตามผิวโลก km (เผื่อเล็กน้อยแล้วตัดด้วย haversine อีกครั้ง)"""
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2) * (1 + 1e-9) + 1e-12
+
+
+class SpatialIndex:
+    """
+    KD-tree ของชุดพิกัด (จุดที่ไม่มีพิกัดจะไม่อยู่ในดัชนี)
+    ทุกเมธอดคืนค่า index ของแถวในชุดพิกัดเดิมที่ส่งเข้ามา
+    """
+
+    def __init__(self, lat, lon):
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        self.ids = np.flatnonzero(valid)
+        self.lat, self.lon = lat[valid], lon[valid]
+        self._sphere = cKDTree(_unit_vectors(self.lat, self.lon))
+        self._plane = cKDTree(np.column_stack([self.lat, self.lon]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def within_radius(self, lat, lon, km):
+        """จุดที่อยู่ในรัศมี km จาก (lat, lon) คืนค่า (index, ระยะ กม.) เรียงตามลำดับแถวเดิม"""
+        if len(self.ids) == 0:
+            return self.ids, np.empty(0)
+        hits = np.sort(np.asarray(self._sphere.query_ball_point(_unit_vectors(lat, lon), _chord(km)),
+                                  dtype=np.int64))
+        distance = haversine_km(lat, lon, self.lat[hits], self.lon[hits])
+        inside = distance <= km
+        return self.ids[hits[inside]], distance[inside]
+
+    def within_bounds(self, bounds):
+        """จุดที่อยู่ในกรอบ ((south, west), (north, east)) เรียงตามลำดับแถวเดิม"""
+        (south, west), (north, east) = bounds
+        if len(self.ids) == 0 or south > north or west > east:
+            return self.ids[:0]
+        center = [(south + north) / 2, (west + east) / 2]
+        half = max(north - south, east - west) / 2
+        hits = np.sort(np.asarray(self._plane.query_ball_point(center, half * (1 + 1e-9) + 1e-12,
+                                                               p=np.inf), dtype=np.int64))
+        lat, lon = self.lat[hits], self.lon[hits]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return self.ids[hits[inside]]
+
+    def nearest(self, lat, lon, k=1):
+        """k จุดที่ใกล้ (lat, lon) ที่สุด คืนค่า (index, ระยะ กม.) เรียงจากใกล้ไปไกล"""
+        k = min(k, len(self.ids))
+        if k == 0:
+            return self.ids, np.empty(0)
+        _, hits = self._sphere.query(_unit_vectors(lat, lon), k=k)
+        hits = np.atleast_1d(hits)
+        return self.ids[hits], haversine_km(lat, lon, self.lat[hits], self.lon[hits])
+
+
+def load_tambons(coord_path=COORD_PATH):
+    """พิกัดตำบลจาก coordinate/tambon.csv (AM_ID_CLEAN รูปแบบเดียวกับ data_store.build_amphoe_coord)"""
+    tambons = pd.read_csv(coord_path, usecols=['TA_ID', 'TAMBON_T', 'AM_ID', 'AMPHOE_T',
+                                               'CHANGWAT_T', 'LAT', 'LONG'])
+    tambons['AM_ID_CLEAN'] = tambons['AM_ID'].astype(str).str.zfill(4)
+    return tambons[TAMBON_FIELDS]
+
+
+class ForecastSpatial:
+    """
+    ดัชนีพิกัดอำเภอของ cube (1 จุดต่อ 1 คอลัมน์) + ดัชนีพิกัดตำบล
+    - ผลลัพธ์เป็นตารางรูปแบบเดียวกับ cube.summary (เฉพาะอำเภอที่มีพิกัดและมีข้อมูลในช่วงวันที่)
+    """
+
+    def __init__(self, cube, tambons=None):
+        self.cube = cube
+        lat = np.where(cube.has_coord, cube.columns['LAT'].to_numpy(dtype=float), np.nan)
+        self.amphoes = SpatialIndex(lat, cube.columns['LONG'].to_numpy(dtype=float))
+        self._fields = {name: cube.columns[name].to_numpy() for name in SUMMARY_FIELDS}
+        self.tambons = None if tambons is None else tambons.reset_index(drop=True)
+        if self.tambons is not None:
+            self.tambon_index = SpatialIndex(self.tambons['LAT'], self.tambons['LONG'])
+            # คอลัมน์ของ cube ของแต่ละตำบล (-1 = อำเภอไม่อยู่ในข้อมูลพยากรณ์)
+            column_of = pd.Series(np.arange(len(cube.columns)),
+                                  index=cube.columns['AM_ID_CLEAN'].to_numpy())
+            column_of = column_of[~column_of.index.duplicated()]
+            self._tambon_column = column_of.reindex(self.tambons['AM_ID_CLEAN'].to_numpy()) \
+                                           .fillna(-1).to_numpy(dtype=np.int64)
+
+    def _rows(self, ids, start_date, end_date, mask=None, distance=None):
+        """ตารางสรุปของคอลัมน์ ids (ตัดคอลัมน์ที่ไม่มีข้อมูลในช่วงวันที่ / ไม่อยู่ใน mask)"""
+        totals, keep = self._totals(ids, start_date, end_date, mask)
+        ids, totals = ids[keep], totals[keep]
+        if distance is not None:
+            distance = distance[keep]
+            order = np.argsort(distance, kind='stable')
+            ids, totals, distance = ids[order], totals[order], distance[order]
+        # สร้างจาก array ของแต่ละคอลัมน์โดยตรง (เร็วกว่า columns.loc สำหรับผลลัพธ์ไม่กี่แถว)
+        rows = pd.DataFrame({name: values[ids] for name, values in self._fields.items()})
+        rows['predicted_cases'] = totals
+        if distance is not None:
+            rows['distance_km'] = distance
+        return rows
+
+    def _totals(self, ids, start_date, end_date, mask=None):
+        """ยอดของช่วงวันที่ของคอลัมน์ ids และ keep = มีข้อมูลในช่วงวันที่ (และอยู่ใน mask)"""
+        cube = self.cube
+        i0, i1 = cube.day_range(start_date, end_date)
+        keep = (cube.count_prefix[i1, ids] - cube.count_prefix[i0, ids]) > 0
+        if mask is not None:
+            keep &= np.asarray(mask)[ids]
+        return cube.prefix[i1, ids] - cube.prefix[i0, ids], keep
+
+    def total_within(self, lat, lon, km, start_date, end_date, mask=None):
+        """ยอดพยากรณ์รวมของอำเภอ (จุดกึ่งกลาง) ในรัศมี km ไม่สร้างตาราง คืนค่า (ยอดรวม, จำนวนอำเภอ)"""
+        ids, _ = self.amphoes.within_radius(lat, lon, km)
+        totals, keep = self._totals(ids, start_date, end_date, mask)
+        return float(totals[keep].sum()), int(keep.sum())
+
+    def nearby(self, lat, lon, km, start_date, end_date, mask=None, by='amphoe'):
+        """
+        อำเภอในรัศมี km จาก (lat, lon) พร้อมยอดของช่วงวันที่และ distance_km เรียงจากใกล้ไปไกล
+        - by='amphoe': วัดถึงพิกัดกึ่งกลางอำเภอ
+        - by='tambon': อำเภอที่มีตำบลอยู่ในรัศมี (distance_km = ระยะถึงตำบลที่ใกล้ที่สุด)
+        """
+        if by == 'amphoe':
+            ids, distance = self.amphoes.within_radius(lat, lon, km)
+        elif by == 'tambon':
+            if self.tambons is None:
+                raise ValueError("by='tambon' ต้องสร้าง ForecastSpatial พร้อม tambons")
+            tambon_ids, tambon_distance = self.tambon_index.within_radius(lat, lon, km)
+            columns = self._tambon_column[tambon_ids]
+            matched = (columns >= 0) & self.cube.has_coord[columns.clip(0)]
+            distance = np.full(len(self.cube.columns), np.inf)
+            np.minimum.at(distance, columns[matched], tambon_distance[matched])
+            ids = np.flatnonzero(np.isfinite(distance))
+            distance = distance[ids]
+        else:
+            raise ValueError(f"by must be one of {NEARBY_BY}")
+        return self._rows(ids, start_date, end_date, mask, distance)
+
+    def in_bounds(self, bounds, start_date, end_date, mask=None):
+        """อำเภอที่พิกัดกึ่งกลางอยู่ในกรอบ ((south, west), (north, east)) พร้อมยอดของช่วงวันที่"""
+        return self._rows(self.amphoes.within_bounds(bounds), start_date, end_date, mask)
+
+    def nearest_tambons(self, lat, lon, k=5):
+        """k ตำบลที่ใกล้ (lat, lon) ที่สุด (TAMBON_FIELDS + distance_km)"""
+        if self.tambons is None:
+            raise ValueError("ต้องสร้าง ForecastSpatial พร้อม tambons")
+        ids, distance = self.tambon_index.nearest(lat, lon, k)
+        return self.tambons.iloc[ids].reset_index(drop=True).assign(distance_km=distance)
+
+
+def _nearby_pandas(cube, lat, lon, km, start_date, end_date, mask=None):
+    """วิธีเดิม (ตารางสรุปทั้งหมด + haversine ทุกแถว + กรอง) เก็บไว้เทียบผลลัพธ์และความเร็ว"""
+    summary = cube.summary(start_date, end_date, mask)
+    summary['distance_km'] = haversine_km(lat, lon, summary['LAT'], summary['LONG'])
+    return (summary[summary['distance_km'] <= km]
+            .sort_values('distance_km', kind='stable').reset_index(drop=True))
+
+
+def _in_bounds_pandas(cube, bounds, start_date, end_date, mask=None):
+    (south, west), (north, east) = bounds
+    summary = cube.summary(start_date, end_date, mask)
+    inside = (summary['LAT'].between(south, north) & summary['LONG'].between(west, east))
+    return summary[inside].reset_index(drop=True)
+
+
+def _queries(cube, n=20, seed=0):
+    """จุดทดสอบ: พิกัดอำเภอสุ่ม + ค่าเบี่ยงเล็กน้อย กับรัศมี / กรอบหลายขนาด"""
+    rng = np.random.default_rng(seed)
+    points = cube.columns.loc[cube.has_coord, ['LAT', 'LONG']].to_numpy()
+    picks = points[rng.integers(len(points), size=n)] + rng.normal(0, 0.05, size=(n, 2))
+    radii = rng.choice([5, 20, 50, 150], size=n)
+    return [(lat, lon, km) for (lat, lon), km in zip(picks, radii)]
+
+
+def check_spatial(spatial):
+    """ผลของ KD-tree ต้องเท่ากับการ scan ด้วย pandas (รัศมี / กรอบ / ตัวกรองจังหวัด / by=tambon)"""
+    cube = spatial.cube
+    start, end = cube.min_date, cube.max_date
+    week = cube.dates[6].date()
+    mask = cube.column_mask(province=cube.provinces(start, end)[0])
+    for lat, lon, km in _queries(cube):
+        for day_end, column_mask in ((end, None), (week, mask)):
+            expected = _nearby_pandas(cube, lat, lon, km, start, day_end, column_mask)
+            actual = spatial.nearby(lat, lon, km, start, day_end, column_mask)
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+            total, count = spatial.total_within(lat, lon, km, start, day_end, column_mask)
+            assert count == len(expected)
+            np.testing.assert_allclose(total, expected['predicted_cases'].sum())
+            bounds = ((lat - km / 111, lon - km / 111), (lat + km / 222, lon + km / 55))
+            pd.testing.assert_frame_equal(spatial.in_bounds(bounds, start, day_end, column_mask),
+                                          _in_bounds_pandas(cube, bounds, start, day_end, column_mask),
+                                          check_dtype=False)
+        if spatial.tambons is not None:
+            tambons = spatial.tambons.assign(
+                distance_km=haversine_km(lat, lon, spatial.tambons['LAT'], spatial.tambons['LONG']))
+            closest = tambons[tambons['distance_km'] <= km].groupby('AM_ID_CLEAN')['distance_km'].min()
+            expected = _nearby_pandas(cube, lat, lon, np.inf, start, end).drop(columns='distance_km')
+            expected = expected[expected['AM_ID_CLEAN'].isin(closest.index)]
+            expected['distance_km'] = expected['AM_ID_CLEAN'].map(closest).to_numpy()
+            expected = expected.sort_values('distance_km', kind='stable').reset_index(drop=True)
+            pd.testing.assert_frame_equal(spatial.nearby(lat, lon, km, start, end, by='tambon'),
+                                          expected, check_dtype=False)
+
+
+def benchmark_spatial(spatial, repeat=5):
+    """เวลาเฉลี่ย (มิลลิวินาที) ต่อคำขอ ของการ scan ด้วย pandas เทียบกับ KD-tree"""
+    cube = spatial.cube
+    start, end = cube.min_date, cube.max_date
+    queries = _queries(cube)
+    bounds = [((lat - 0.5, lon - 0.5), (lat + 0.5, lon + 0.5)) for lat, lon, _ in queries]
+    runners = {
+        'radius (pandas)': lambda: [_nearby_pandas(cube, *q, start, end) for q in queries],
+        'radius (kd-tree)': lambda: [spatial.nearby(*q, start, end) for q in queries],
+        'total (kd-tree)': lambda: [spatial.total_within(*q, start, end) for q in queries],
+        'bounds (pandas)': lambda: [_in_bounds_pandas(cube, b, start, end) for b in bounds],
+        'bounds (kd-tree)': lambda: [spatial.in_bounds(b, start, end) for b in bounds]
+    }
+    results = {}
+    for name, runner in runners.items():
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            runner()
+        results[name] = (time.perf_counter() - t0) / (repeat * len(queries)) * 1000
+    return results
+
+
+if __name__ == '__main__':
+    from data_store import load_cube
+
+    parser = argparse.ArgumentParser(description='KD-tree radius / bounding-box queries over amphoes and tambons')
+    parser.add_argument('--lat', type=float, default=None, help='query one point instead of the checks')
+    parser.add_argument('--lon', type=float, default=None)
+    parser.add_argument('--km', type=float, default=20)
+    parser.add_argument('--by', choices=NEARBY_BY, default='amphoe')
+    args = parser.parse_args()
+
+    cube = load_cube()
+    t0 = time.perf_counter()
+    spatial = ForecastSpatial(cube, load_tambons())
+    print(f"✓ Indexed {len(spatial.amphoes):,} amphoes and {len(spatial.tambon_index):,} tambons "
+          f"in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    if args.lat is not None and args.lon is not None:
+        rows = spatial.nearby(args.lat, args.lon, args.km, cube.min_date, cube.max_date, by=args.by)
+        print(f"  • {len(rows):,} amphoes within {args.km:g} km, "
+              f"total {rows['predicted_cases'].sum():,.0f} cases")
+        print(rows[['CHANGWAT_T', 'AMPHOE_T', 'distance_km', 'predicted_cases']]
+              .round(1).head(20).to_string(index=False))
+        print(spatial.nearest_tambons(args.lat, args.lon, 3)[['TAMBON_T', 'AMPHOE_T', 'distance_km']]
+              .round(2).to_string(index=False))
+    else:
+        check_spatial(spatial)
+        print("✓ KD-tree radius / bounds queries match the pandas full scan")
+        for name, ms in benchmark_spatial(spatial).items():
+            print(f"  • {name:<18} {ms:8.3f} ms per query")
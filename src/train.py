@@ -0,0 +1,280 @@
+"""
+เทรนโมเดล XGBoost สำหรับเครื่องที่ไม่มี GPU (แทนเซลล์เทรนในโน้ตบุ๊ก xgboost.ipynb)
+
+- device: ตรวจ GPU จริงด้วยการเทรน booster ขนาดเล็ก (โน้ตบุ๊กเดิมแค่สร้าง XGBRegressor ซึ่งไม่เคย error
+  จึงบันทึก 'gpu' เสมอ) ไม่มี GPU → CPU tree_method='hist'
+- nthread = จำนวน CPU ที่ process ใช้ได้, max_bin = 128
+  (ทดสอบกับ season 2025: rmse ใกล้เคียง 256 แต่สร้าง histogram เร็วกว่า)
+- early stopping บน validation fold = ฤดูปีใหม่ล่าสุดของข้อมูลเทรน (โน้ตบุ๊กเดิมใช้ test set เป็น eval_set)
+  group_mean / group_std ของแถว fit และ validation คำนวณจากข้อมูลก่อน validation season เท่านั้น
+  (เหมือน backtest.py) ไม่ให้ค่าเป้าหมายของ validation รั่วเข้าฟีเจอร์
+  แล้วเทรนใหม่ทั้งชุดด้วยจำนวนรอบที่ดีที่สุด (refit) ด้วย group stats ของข้อมูลทั้งหมด
+- QuantileDMatrix สร้างจาก iterator ทีละ chunk: แปลงฟีเจอร์เป็น float32 ทีละช่วงแล้วเก็บเฉพาะค่าที่
+  quantize แล้ว ไม่ต้องมีสำเนา float32 อีกชุดของทั้งตาราง (--cache-dir: เก็บบนดิสก์ด้วย ExtMemQuantileDMatrix)
+  หมายเหตุ: ตารางฟีเจอร์ (build_features) ยังสร้างทั้งตารางในหน่วยความจำก่อน
+  หน่วยความจำสูงสุดจึงขึ้นกับขนาดตารางฟีเจอร์ ส่วนที่ลดลงคือสำเนาสำหรับ DMatrix
+- บันทึก device, nthread, max_bin, เวลาเทรน, throughput และหน่วยความจำสูงสุดลง model_info.json
+
+รัน (บันทึกโมเดล, model_info.json และ feature_state.npz ลง models/):
+    python src/train.py
+"""
+import os
+import json
+import time
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+try:
+    import resource
+except ImportError:
+    # Windows ไม่มีโมดูล resource (peak_rss_mb คืนค่า None)
+    resource = None
+
+from backtest import _STAT_COLUMNS, _lookup_stats, season_of
+from config import MODEL_DIR
+from features import DEFAULT_LAG_MODE, FEATURE_COLUMNS, LAG_MODES, build_features, load_history
+
+DEVICES = ('auto', 'cpu', 'cuda')
+DEFAULT_MAX_BIN = 128
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_ROUNDS = 1000
+DEFAULT_EARLY_STOPPING = 50
+
+# พารามิเตอร์เดียวกับโมเดลในโน้ตบุ๊ก (จำนวนรอบเลือกด้วย early stopping แทน n_estimators=200)
+PARAMS = {
+    'objective': 'reg:squarederror',
+    'eval_metric': 'rmse',
+    'eta': 0.05,
+    'max_depth': 6,
+    'min_child_weight': 1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'tree_method': 'hist',
+    'seed': 42
+}
+
+
+def available_threads():
+    """จำนวน CPU ที่ process นี้ใช้ได้ (รวมข้อจำกัดของ container / taskset)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def detect_device():
+    """'cuda' ถ้าเทรนบน GPU ได้จริง ไม่เช่นนั้น 'cpu' (XGBoost จะเปลี่ยนเป็น CPU เองเมื่อไม่พบ GPU)"""
+    if not xgb.build_info().get('USE_CUDA'):
+        return 'cpu'
+    X = np.arange(16, dtype=np.float32).reshape(8, 2)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            booster = xgb.train({'device': 'cuda', 'tree_method': 'hist', 'verbosity': 0},
+                                xgb.DMatrix(X, label=np.arange(8)), num_boost_round=1)
+    except xgb.core.XGBoostError:
+        return 'cpu'
+    device = json.loads(booster.save_config())['learner']['generic_param']['device']
+    return 'cuda' if device.startswith('cuda') else 'cpu'
+
+
+class FeatureChunks(xgb.DataIter):
+    """
+    ส่งแถวที่เลือกของตารางฟีเจอร์ให้ QuantileDMatrix ทีละ chunk (float32 เฉพาะ chunk ปัจจุบัน)
+    - group_stats: (group_id, mean, std) ใช้แทน group_mean / group_std ในตาราง (None = ใช้ค่าเดิม)
+    """
+
+    def __init__(self, features, rows, chunk_rows=DEFAULT_CHUNK_ROWS, cache_prefix=None, group_stats=None):
+        self.features = features
+        self.rows = np.flatnonzero(rows) if rows.dtype == bool else rows
+        self.chunk_rows = chunk_rows
+        self.group_stats = group_stats
+        self.position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self.position >= len(self.rows):
+            return False
+        rows = self.rows[self.position:self.position + self.chunk_rows]
+        chunk = self.features.iloc[rows]
+        X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        if self.group_stats is not None:
+            X[:, _STAT_COLUMNS[0]], X[:, _STAT_COLUMNS[1]] = _lookup_stats(
+                self.group_stats, chunk['group_id'].to_numpy())
+        input_data(data=X,
+                   label=chunk['acc_cases'].to_numpy(dtype=np.float32),
+                   feature_names=FEATURE_COLUMNS)
+        self.position += self.chunk_rows
+        return True
+
+    def reset(self):
+        self.position = 0
+
+
+def quantile_matrix(features, rows, max_bin=DEFAULT_MAX_BIN, chunk_rows=DEFAULT_CHUNK_ROWS, ref=None,
+                    cache_dir=None, group_stats=None):
+    """
+    QuantileDMatrix ของแถวที่เลือก (ref: ใช้ bin ของชุดเทรน สำหรับ validation)
+    - cache_dir: เก็บข้อมูลที่ quantize แล้วบนดิสก์ (external memory) แทนหน่วยความจำ
+    - group_stats: ดู FeatureChunks
+    """
+    if cache_dir is None:
+        return xgb.QuantileDMatrix(FeatureChunks(features, rows, chunk_rows, group_stats=group_stats),
+                                   max_bin=max_bin, ref=ref)
+    os.makedirs(cache_dir, exist_ok=True)
+    chunks = FeatureChunks(features, rows, chunk_rows, cache_prefix=os.path.join(cache_dir, 'train'),
+                           group_stats=group_stats)
+    return xgb.ExtMemQuantileDMatrix(chunks, max_bin=max_bin, ref=ref)
+
+
+def validation_split(features, validation_season=None):
+    """
+    mask ของแถวเทรนและแถว validation
+    validation = season (ธ.ค.-ม.ค. ตามปีของเดือนมกราคม) ล่าสุดของข้อมูล หรือ validation_season
+    """
+    seasons = season_of(features['adate'])
+    if validation_season is None:
+        validation_season = seasons.max()
+    return seasons < validation_season, seasons == validation_season, int(validation_season)
+
+
+def fold_group_stats(features, rows):
+    """
+    group_mean / group_std (ddof=1, กลุ่มที่มีแถวเดียว = 0) จากแถวที่เลือกเท่านั้น
+    คืนค่า (group_id เรียงแล้ว, mean, std) รูปแบบเดียวกับ group stats ของ backtest.feature_cache
+    """
+    groups, inverse = np.unique(features['group_id'].to_numpy()[rows], return_inverse=True)
+    values = features['acc_cases'].to_numpy(dtype=np.float64)[rows]
+    count = np.bincount(inverse, minlength=len(groups)).astype(np.float64)
+    mean = np.bincount(inverse, weights=values, minlength=len(groups)) / count
+    sumsq = np.bincount(inverse, weights=values ** 2, minlength=len(groups))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (sumsq - count * mean ** 2) / (count - 1)
+    std = np.sqrt(np.clip(var, 0, None))
+    std[count < 2] = 0.0
+    return groups, mean, std
+
+
+def peak_rss_mb():
+    """หน่วยความจำสูงสุดของ process นี้ (MB) None เมื่อวัดไม่ได้ (Windows)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train(df, train_end=None, device='auto', nthread=None, max_bin=DEFAULT_MAX_BIN,
+          num_boost_round=DEFAULT_ROUNDS, early_stopping_rounds=DEFAULT_EARLY_STOPPING,
+          chunk_rows=DEFAULT_CHUNK_ROWS, validation_season=None, refit=True,
+          lag_mode=DEFAULT_LAG_MODE, cache_dir=None):
+    """
+    เทรนโมเดลด้วยข้อมูลถึง train_end (None = ทั้งหมด)
+    - cache_dir: ใช้ external memory สำหรับชุดเทรน (ข้อมูลใหญ่กว่าหน่วยความจำ)
+    คืนค่า (booster, model_info, feature_state)
+    """
+    if train_end is not None:
+        df = df[df['adate'] <= train_end]
+    features, feature_state = build_features(df, lag_mode)
+    if device == 'auto':
+        device = detect_device()
+    nthread = nthread or available_threads()
+    params = {**PARAMS, 'device': device, 'nthread': nthread, 'max_bin': max_bin}
+
+    t0 = time.perf_counter()
+    fit_rows, valid_rows, validation_season = validation_split(features, validation_season)
+    # group stats ของข้อมูลก่อน validation season (ไม่ใช้ค่าเป้าหมายของ validation)
+    fit_stats = fold_group_stats(features, fit_rows)
+    dfit = quantile_matrix(features, fit_rows, max_bin, chunk_rows, cache_dir=cache_dir,
+                           group_stats=fit_stats)
+    dvalid = quantile_matrix(features, valid_rows, max_bin, chunk_rows, ref=dfit, group_stats=fit_stats)
+    booster = xgb.train(params, dfit, num_boost_round, evals=[(dvalid, 'validation')],
+                        early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+    best_rounds = booster.best_iteration + 1
+    validation_rmse = booster.best_score
+    del dfit, dvalid
+
+    if refit:
+        # เทรนใหม่ทั้งชุด (รวม validation) ด้วยจำนวนรอบที่ดีที่สุด และ group stats ของข้อมูลทั้งหมด
+        dtrain = quantile_matrix(features, np.ones(len(features), dtype=bool), max_bin, chunk_rows,
+                                 cache_dir=cache_dir)
+        booster = xgb.train(params, dtrain, best_rounds)
+        training_samples = len(features)
+    else:
+        booster = booster[:best_rounds]
+        training_samples = int(fit_rows.sum())
+    train_seconds = time.perf_counter() - t0
+    peak_rss = peak_rss_mb()
+
+    info = {
+        'feature_columns': FEATURE_COLUMNS,
+        'model_type': 'Booster',
+        'training_date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'device': device,
+        'tree_method': params['tree_method'],
+        'nthread': nthread,
+        'max_bin': max_bin,
+        'num_boost_round': best_rounds,
+        'early_stopping_rounds': early_stopping_rounds,
+        'validation_season': validation_season,
+        'validation_rmse': validation_rmse,
+        'refit': refit,
+        'external_memory': cache_dir is not None,
+        'train_end': str(features['adate'].max().date()),
+        'training_samples': training_samples,
+        'train_seconds': round(train_seconds, 3),
+        'rows_per_second': round(training_samples / train_seconds),
+        'peak_rss_mb': None if peak_rss is None else round(peak_rss, 1),
+        'xgboost_version': xgb.__version__,
+        'lag_mode': lag_mode
+    }
+    return booster, info, feature_state
+
+
+def save_model(booster, info, model_dir=MODEL_DIR):
+    """บันทึกโมเดล (JSON) และ model_info.json ที่ forecast.py ใช้"""
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, 'xgboost_accident_model.json')
+    booster.save_model(model_path)
+    with open(os.path.join(model_dir, 'model_info.json'), 'w') as f:
+        json.dump(info, f, indent=2)
+    return model_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the accident model (CPU hist by default)')
+    parser.add_argument('--train-end', default=None, help='last training date (default: all history)')
+    parser.add_argument('--device', choices=DEVICES, default='auto')
+    parser.add_argument('--nthread', type=int, default=None)
+    parser.add_argument('--max-bin', type=int, default=DEFAULT_MAX_BIN)
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help='maximum boosting rounds')
+    parser.add_argument('--early-stopping', type=int, default=DEFAULT_EARLY_STOPPING)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--validation-season', type=int, default=None,
+                        help='January year of the validation season (default: latest)')
+    parser.add_argument('--no-refit', action='store_true',
+                        help='keep the early-stopped model instead of refitting on all rows')
+    parser.add_argument('--lag-mode', choices=LAG_MODES, default=DEFAULT_LAG_MODE)
+    parser.add_argument('--cache-dir', default=None,
+                        help='keep the quantized training matrix on disk (external memory)')
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+
+    booster, info, feature_state = train(
+        load_history(), args.train_end, args.device, args.nthread, args.max_bin, args.rounds,
+        args.early_stopping, args.chunk_rows, args.validation_season, not args.no_refit, args.lag_mode,
+        args.cache_dir
+    )
+    model_path = save_model(booster, info, args.model_dir)
+    feature_state.save(os.path.join(args.model_dir, 'feature_state.npz'))
+
+    print(f"✓ Trained on {info['device']} ({info['tree_method']}, nthread={info['nthread']}, "
+          f"max_bin={info['max_bin']})")
+    print(f"  • Rounds: {info['num_boost_round']} (early stopping on season {info['validation_season']}, "
+          f"rmse {info['validation_rmse']:.4f})")
+    print(f"  • {info['training_samples']:,} rows in {info['train_seconds']:.2f}s "
+          f"({info['rows_per_second']:,} rows/s), peak RSS "
+          f"{'n/a' if info['peak_rss_mb'] is None else format(info['peak_rss_mb'], '.0f') + ' MB'}")
+    print(f"  • Saved: {model_path}")
@@ -1,3 +1,5 @@
+import warnings
+
 import pandas as pd
 import numpy as np
 
@@ -14,38 +16,252 @@ def clean_aampur(x):
     except:
         # If conversion fails (like 'LA', 'MY', etc.)
         return "99"
-    
+
+
+def _clean_numeric(values):
+    """
+    clean_aampur ของ array ตัวเลข (int / float) แบบ vectorized
+    ค่าที่แปลงเป็น int64 ไม่ได้ (inf, ค่าที่ใหญ่มาก) คืนเป็น None ให้ผู้เรียกใช้ clean_aampur แทน
+    """
+    # int(float(x)) = ตัดทศนิยมของค่า float64
+    as_float = values.astype(np.float64)
+    ok = np.isfinite(as_float) & (np.abs(as_float) < 2.0 ** 63)
+    ints = np.trunc(as_float[ok]).astype(np.int64)
+    text = pd.Series(ints).astype(str).to_numpy(dtype=object)
+    # f"{val:02d}" เติม 0 ข้างหน้าเฉพาะ 0-9 (ค่าติดลบมีเครื่องหมายครบ 2 ตัวอักษรอยู่แล้ว)
+    pad = (ints >= 0) & (ints < 10)
+    text[pad] = '0' + text[pad]
+
+    cleaned = np.full(len(values), None, dtype=object)
+    cleaned[ok] = text
+    return cleaned
+
+
+def clean_aampur_column(values):
+    """
+    clean_aampur ทั้งคอลัมน์ ผลลัพธ์ตรงกับ .apply(clean_aampur) ทุกตัวอักษร (คืนเป็น numpy array)
+    - แยกค่าที่ไม่ซ้ำด้วย pd.factorize แล้วทำความสะอาดเฉพาะค่าที่ไม่ซ้ำ (ข้อมูลดิบมีไม่กี่ร้อยค่า)
+      จากนั้นกระจายผลกลับด้วย codes เป็นตาราง lookup
+    - ค่าที่ไม่ซ้ำที่เป็นตัวเลข: แปลงแบบ vectorized (_clean_numeric)
+    - ค่าที่ไม่ซ้ำที่เป็นข้อความ: ใช้ clean_aampur เดิม เพราะ float() รับรูปแบบที่ pd.to_numeric
+      ไม่รับ (เช่น ' 4 ', '4_0', เลขไทย) ผลจึงไม่ตรงกันทุกกรณี
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    uniques = np.asarray(uniques)
+
+    # ค่าว่าง (code -1) ชี้ไปที่ช่องสุดท้าย
+    table = np.full(len(uniques) + 1, "99", dtype=object)
+    if uniques.dtype.kind in 'iuf':
+        table[:-1] = _clean_numeric(uniques)
+        missing = np.flatnonzero(pd.isna(table[:-1]))
+    else:
+        missing = np.arange(len(uniques))
+    for i in missing:
+        table[i] = clean_aampur(uniques[i])
+    return table[codes]
+
+
+# ค่าทดสอบที่ต้องได้ผลเหมือน clean_aampur (รวมค่าแปลก ๆ ที่ float() รับ แต่ pd.to_numeric ไม่รับ)
+_CLEAN_AAMPUR_CASES = [
+    '1', '01', '4', ' 4 ', '4.0', '4.7', '10', '99', '100', '-3', '-0.5', '-12', '+7', '1e1',
+    '4_0', '\u0e54', 'LA', 'MY', '', ' ', 'nan', 'NaN', 'inf', '-inf', '1e400', '0x10', None,
+    np.nan, pd.NA, pd.NaT, 0, 4, 4.0, 4.9, -1, -0.5, 1e20, 2 ** 53 + 1, float('inf'), True, False
+]
+
+
+def check_clean_aampur(values=None):
+    """
+    ตรวจว่า clean_aampur_column ให้ผลตรงกับ clean_aampur ทีละค่า
+    ทั้งแบบ object array ผสม และแบบ array ตัวเลข (int / float) ที่ใช้ทางลัด vectorized
+    """
+    if values is None:
+        values = _CLEAN_AAMPUR_CASES
+    series = pd.Series(values, dtype=object)
+    inputs = [series]
+    numeric = pd.to_numeric(series, errors='coerce')
+    inputs.append(numeric.to_numpy(dtype=np.float64))
+    inputs.append(numeric[numeric.abs() < 1000].dropna().astype(np.int64).to_numpy())
+    inputs.append(numeric.to_numpy(dtype=np.float32))
+
+    for data in inputs:
+        expected = pd.Series(data, dtype=object).apply(clean_aampur).to_numpy()
+        result = clean_aampur_column(data)
+        mismatch = [(value, a, b) for value, a, b in zip(data, expected, result) if a != b]
+        assert not mismatch and all(type(v) is str for v in result), mismatch[:5]
+    return True
+
+
+def benchmark_clean_aampur(n_rows=10_000_000, seed=0):
+    """
+    เวลาที่ใช้ของ .apply(clean_aampur) เทียบกับ clean_aampur_column บนข้อมูลสังเคราะห์ n_rows แถว
+    (รหัสข้อความแบบข้อมูลดิบ และรหัสตัวเลข float ที่มีค่าว่าง) และตรวจว่าผลลัพธ์ตรงกัน
+    """
+    import time
+
+    rng = np.random.default_rng(seed)
+    raw_values = np.array([str(i) for i in range(1, 31)] + [f"{i:02d}" for i in range(1, 10)] +
+                          ['4.0', 'LA', 'MY', '', ' ', None], dtype=object)
+    numeric_values = np.append(np.arange(0, 31, dtype=np.float64), np.nan)
+    inputs = {
+        'text': raw_values[rng.integers(0, len(raw_values), n_rows)],
+        'float': numeric_values[rng.integers(0, len(numeric_values), n_rows)]
+    }
+
+    results = {}
+    for name, data in inputs.items():
+        t0 = time.perf_counter()
+        expected = pd.Series(data).apply(clean_aampur).to_numpy()
+        t1 = time.perf_counter()
+        result = clean_aampur_column(data)
+        t2 = time.perf_counter()
+        assert np.array_equal(expected, result), f"{name}: outputs differ"
+        results[name] = {'apply': t1 - t0, 'vectorized': t2 - t1}
+    return results
+
+
+# ช่วงเทศกาลอันตราย: ชื่อ → ((เดือน, วัน) เริ่ม, (เดือน, วัน) สิ้นสุด) รวมวันปลายทั้งสองด้าน
+# ช่วงที่เริ่มปลายปีและจบต้นปีถัดไป (เริ่ม > สิ้นสุด) จะข้ามปีให้อัตโนมัติ
+HOLIDAY_WINDOWS = {
+    'new_year': ((12, 20), (1, 7)),
+    'songkran': ((4, 11), (4, 17))
+}
+
+
+def as_datetime(dates):
+    """คืนค่าวันที่เป็น datetime โดยไม่แปลงซ้ำถ้าเป็น datetime อยู่แล้ว"""
+    if isinstance(dates, pd.Series) and pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates)
+
+
+def date_parts(dates):
+    """(ปี, เดือน, วัน) เป็น numpy array จำนวนเต็ม ของวันที่ที่แปลงแล้ว (ไม่คัดลอก DataFrame)"""
+    dates = pd.DatetimeIndex(as_datetime(dates))
+    return dates.year.to_numpy(), dates.month.to_numpy(), dates.day.to_numpy()
+
+
+def window_mask(month, day, start, end):
+    """แถวที่ (เดือน, วัน) อยู่ในช่วง start - end (รวมปลาย) ช่วงที่ start > end คือช่วงข้ามปี"""
+    month_day = np.asarray(month) * 100 + np.asarray(day)
+    start = start[0] * 100 + start[1]
+    end = end[0] * 100 + end[1]
+    if start <= end:
+        return (month_day >= start) & (month_day <= end)
+    return (month_day >= start) | (month_day <= end)
+
+
+def date_mask(dates, months=None, min_year=None, max_year=None, holidays=None,
+              windows=HOLIDAY_WINDOWS):
+    """
+    mask ของแถวที่วันที่ถูกต้องและผ่านทุกเงื่อนไข (เงื่อนไขที่เป็น None = ไม่กรอง)
+    - months: เดือนที่ต้องการ เช่น (12, 1)
+    - min_year / max_year: ช่วงปี (รวมปลาย)
+    - holidays: ชื่อช่วงเทศกาลใน windows เช่น 'new_year' หรือ ('new_year', 'songkran')
+      แถวที่อยู่ในช่วงใดก็ได้
+    """
+    dates = as_datetime(dates)
+    year, month, day = date_parts(dates)
+    mask = ~np.asarray(pd.isna(dates))
+    if months is not None:
+        mask &= np.isin(month, months)
+    if min_year is not None:
+        mask &= year >= min_year
+    if max_year is not None:
+        mask &= year <= max_year
+    if holidays is not None:
+        if isinstance(holidays, str):
+            holidays = (holidays,)
+        in_window = np.zeros(len(mask), dtype=bool)
+        for name in holidays:
+            in_window |= window_mask(month, day, *windows[name])
+        mask &= in_window
+    return mask
+
+
+def filter_dates(df, date_column='adate', **conditions):
+    """
+    กรองแถวตาม date_mask(**conditions) โดยคัดลอก DataFrame ครั้งเดียวตอนเลือกแถว
+    - ต่อเงื่อนไขหลายอย่างได้ในครั้งเดียว เช่น filter_dates(df, holidays=('new_year',), min_year=2022)
+    - คอลัมน์วันที่ที่เป็นข้อความจะถูกแปลงครั้งเดียว และเก็บเป็น datetime ในผลลัพธ์
+    """
+    parsed = not pd.api.types.is_datetime64_any_dtype(df[date_column])
+    dates = as_datetime(df[date_column])
+    mask = date_mask(dates, **conditions)
+    # df[mask] เป็นสำเนาอยู่แล้ว copy(deep=False) แค่ล้างสถานะ "view ของ df" ที่ pandas ติดไว้
+    # (ไม่เช่นนั้นการกำหนดคอลัมน์ภายหลังจะเตือน SettingWithCopyWarning) โดยไม่คัดลอกข้อมูลซ้ำ
+    result = df[mask].copy(deep=False)
+    if parsed:
+        result[date_column] = dates[mask]
+    return result
+
 
 def filter_dangerous_days(df, date_column='adate'):
     """
-    กรองเฉพาะ 7 วันอันตรายในประเทศไทย
-    - ปีใหม่: 29 ธ.ค. - 4 ม.ค. (7 วัน)
+    กรองเฉพาะช่วงปีใหม่ (20 ธ.ค. - 7 ม.ค.) ตาม HOLIDAY_WINDOWS['new_year']
     """
+    return filter_dates(df, date_column, holidays=('new_year',))
+
+
+def filter_3_years(df, date_column='adate'):
+    """กรองเฉพาะปี 2022 เป็นต้นไป"""
+    return filter_dates(df, date_column, min_year=2022)
+
+
+def _filter_dangerous_days_copy(df, date_column='adate'):
+    """วิธีเดิม (คัดลอกทั้งตาราง แปลงวันที่ แล้วคัดลอกอีกครั้งหลังกรอง) เก็บไว้เทียบผลลัพธ์"""
     df = df.copy()
     df[date_column] = pd.to_datetime(df[date_column])
-    
     month = df[date_column].dt.month
     day = df[date_column].dt.day
-    
-    # กำหนดเงื่อนไข
     new_year = ((month == 12) & (day >= 20)) | ((month == 1) & (day <= 7))
-    
-    dangerous_mask = new_year
-    
-    return df[dangerous_mask].copy()
+    return df[new_year].copy()
 
-def filter_3_years(df, date_column='adate'):
 
+def _filter_3_years_copy(df, date_column='adate'):
+    """วิธีเดิมของ filter_3_years เก็บไว้เทียบผลลัพธ์"""
     df = df.copy()
     df[date_column] = pd.to_datetime(df[date_column])
-    
-    year = df[date_column].dt.year
-    
-    # กำหนดเงื่อนไข
-    four_years = (year >= 2022)
-    
-    dangerous_mask = four_years
-    
-    return df[dangerous_mask].copy()
+    return df[df[date_column].dt.year >= 2022].copy()
+
+
+def check_date_filters(df, date_column='adate'):
+    """ตรวจว่า filter_dangerous_days / filter_3_years (ทั้งแบบต่อกัน) ให้ผลเหมือนวิธีเดิม"""
+    pairs = (
+        (filter_dangerous_days, _filter_dangerous_days_copy),
+        (filter_3_years, _filter_3_years_copy),
+        (lambda d, c: filter_3_years(filter_dangerous_days(d, c), c),
+         lambda d, c: _filter_3_years_copy(_filter_dangerous_days_copy(d, c), c))
+    )
+    for new, old in pairs:
+        pd.testing.assert_frame_equal(new(df, date_column), old(df, date_column))
+
+    # holidays เป็นชื่อเดียว (str) ได้
+    pd.testing.assert_frame_equal(filter_dates(df, date_column, holidays='new_year'),
+                                  filter_dangerous_days(df, date_column))
+    # คอลัมน์วันที่ที่เป็น datetime อยู่แล้ว: ผลลัพธ์ต้องกำหนดคอลัมน์ใหม่ได้โดยไม่เตือน SettingWithCopyWarning
+    parsed = df.assign(**{date_column: pd.to_datetime(df[date_column])})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', pd.errors.SettingWithCopyWarning)
+        for result in (filter_3_years(parsed, date_column), filter_dangerous_days(parsed, date_column)):
+            result['year'] = result[date_column].dt.year
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from config import HISTORY_PATH
+
+    parser = argparse.ArgumentParser(description='Check and benchmark the vectorized clean_aampur')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    args = parser.parse_args()
 
+    check_date_filters(pd.read_csv(HISTORY_PATH))
+    print("✓ date filters match the original filter_dangerous_days / filter_3_years")
 
+    check_clean_aampur()
+    print(f"✓ clean_aampur_column matches clean_aampur on {len(_CLEAN_AAMPUR_CASES)} edge cases")
+    for name, result in benchmark_clean_aampur(args.rows).items():
+        print(f"  • {name:<6} {args.rows:,} rows  apply: {result['apply']:6.2f} s  "
+              f"vectorized: {result['vectorized']:6.2f} s  "
+              f"({result['apply'] / result['vectorized']:.0f}x, outputs identical)")
@@ -0,0 +1,194 @@
+"""
+Warm-up แคชของแดชบอร์ด: render มุมมองที่ถูกเปิดบ่อยที่สุดล่วงหน้า
+(ช่วงวันที่ทั้งหมด × ทุกจังหวัด และทั้งประเทศ)
+
+ใช้ได้ 2 แบบ
+- ตอน build image: python src/warmup.py  → เขียน HTML แผนที่ลง store/warm/ ให้แอปโหลดตอนเริ่ม
+- ใน process ของแอป: start_background_warmup(cache, data_version, loaders=...) → thread เบื้องหลัง
+  warm ทั้ง HTML แผนที่ (RenderCache) และผลรวม/กราฟของแท็บการวิเคราะห์
+  ผ่านฟังก์ชันที่แคชไว้ของแดชบอร์ด (loaders เช่น dashboard.load_figures ซึ่งเรียก load_view)
+
+การ render แผนที่ทำใน process pool และหยุดเมื่อครบเวลาที่กำหนด (time budget)
+ส่วน loaders รันใน thread ของตัวเองภายใต้ budget เดียวกัน (แคชของ Streamlit อยู่ใน process ของแอป)
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from binning import get_bins, view_days
+from config import WARMUP_BUDGET_SECONDS, WARMUP_WORKERS
+from data_store import STORE_DIR, ensure_store, load_cube
+from map_render import build_map
+from render_cache import map_cache_key
+
+DEFAULT_BUDGET_SECONDS = WARMUP_BUDGET_SECONDS
+DEFAULT_WORKERS = WARMUP_WORKERS
+
+# cube ของแต่ละ worker process (เปิดแบบ memory-map ครั้งเดียวต่อ process)
+# และเกณฑ์สี/ขนาดวงกลม (คำนวณจาก cube จึงเหมือนกับของแอปที่ใช้ข้อมูลชุดเดียวกัน)
+_worker_cube = None
+_worker_bins = None
+
+
+def default_views(cube):
+    """มุมมองเริ่มต้น: ช่วงวันที่ทั้งหมด ทั้งประเทศ + ทีละจังหวัด"""
+    start_date, end_date = cube.min_date, cube.max_date
+    views = [(start_date, end_date, None, None)]
+    views += [(start_date, end_date, province, None)
+              for province in cube.provinces(start_date, end_date)]
+    return views
+
+
+def _init_worker(store_dir):
+    global _worker_cube, _worker_bins
+    _worker_cube = load_cube(store_dir)
+    _worker_bins = get_bins(_worker_cube, store_dir)
+
+
+def _render_view(view):
+    """render แผนที่ของมุมมองเดียว (รันใน worker process)"""
+    start_date, end_date, province, amphoe = view
+    mask = _worker_cube.column_mask(province=province, amphoe=amphoe)
+    summary = _worker_cube.summary(start_date, end_date, mask)
+    html = build_map(summary, _worker_bins, view_days(_worker_cube, start_date, end_date)).get_root().render()
+    return map_cache_key(start_date, end_date, province, amphoe), html
+
+
+def render_views(views, store_dir=STORE_DIR, budget_seconds=DEFAULT_BUDGET_SECONDS,
+                 workers=DEFAULT_WORKERS):
+    """
+    render มุมมองทั้งหมดใน process pool แล้ว yield (key, html) ทีละรายการ
+    - มุมมองที่ยังไม่เสร็จเมื่อครบ budget_seconds จะถูกยกเลิก
+    """
+    deadline = time.monotonic() + budget_seconds
+    # ใช้ spawn เพราะอาจถูกเรียกจาก thread ใน process ของ Streamlit
+    context = multiprocessing.get_context('spawn')
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(store_dir,))
+    try:
+        pending = {executor.submit(_render_view, view) for view in views}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_cache(cache, data_version, store_dir=STORE_DIR,
+               budget_seconds=DEFAULT_BUDGET_SECONDS, workers=DEFAULT_WORKERS):
+    """render มุมมองเริ่มต้นลงแคชโดยตรง คืนค่าจำนวนมุมมองที่ warm สำเร็จ"""
+    views = [view for view in default_views(load_cube(store_dir))
+             if map_cache_key(*view) not in cache]
+    count = 0
+    for key, html in render_views(views, store_dir, budget_seconds, workers):
+        cache.put(key, html, data_version=data_version)
+        count += 1
+    return count
+
+
+def warm_loaders(loaders, views, budget_seconds=DEFAULT_BUDGET_SECONDS):
+    """
+    เรียก loaders(start_date, end_date, province, amphoe) ของทุกมุมมองเพื่อเติมแคชของผู้เรียก
+    หยุดเมื่อครบ budget_seconds คืนค่าจำนวนมุมมองที่ warm สำเร็จ
+    """
+    deadline = time.monotonic() + budget_seconds
+    count = 0
+    for view in views:
+        if time.monotonic() >= deadline:
+            break
+        for loader in loaders:
+            loader(*view)
+        count += 1
+    return count
+
+
+def start_background_warmup(cache, data_version, store_dir=STORE_DIR, loaders=(), **kwargs):
+    """
+    เริ่ม warm_cache ใน daemon thread (ไม่บล็อกการเปิดหน้าเว็บ)
+    และ warm_loaders ของมุมมองเริ่มต้นในอีก thread เมื่อระบุ loaders
+    คืนค่า list ของ thread
+    """
+    threads = [threading.Thread(
+        target=warm_cache,
+        args=(cache, data_version, store_dir),
+        kwargs=kwargs,
+        name='dashboard-warmup',
+        daemon=True
+    )]
+    if loaders:
+        budget = kwargs.get('budget_seconds', DEFAULT_BUDGET_SECONDS)
+        threads.append(threading.Thread(
+            target=lambda: warm_loaders(loaders, default_views(load_cube(store_dir)), budget),
+            name='dashboard-warmup-views',
+            daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _warm_path(warm_dir, key):
+    digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+    return os.path.join(warm_dir, f'{digest}.html')
+
+
+def save_warm(entries, data_version, store_dir=STORE_DIR):
+    """บันทึกผล warm-up ลง store/warm/ (ใช้ตอน build image)"""
+    warm_dir = os.path.join(store_dir, 'warm')
+    os.makedirs(warm_dir, exist_ok=True)
+    index = []
+    for key, html in entries:
+        path = _warm_path(warm_dir, key)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        index.append({'key': list(key), 'file': os.path.basename(path)})
+
+    with open(os.path.join(warm_dir, 'index.json'), 'w') as f:
+        json.dump({'data_version': data_version, 'entries': index}, f, ensure_ascii=False)
+    return len(index)
+
+
+def load_warm(cache, data_version, store_dir=STORE_DIR):
+    """โหลดผล warm-up จาก store/warm/ เข้าแคช (เฉพาะเมื่อเวอร์ชันข้อมูลตรงกัน)"""
+    warm_dir = os.path.join(store_dir, 'warm')
+    try:
+        with open(os.path.join(warm_dir, 'index.json')) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if index.get('data_version') != data_version:
+        return 0
+
+    count = 0
+    for entry in index['entries']:
+        with open(os.path.join(warm_dir, entry['file']), encoding='utf-8') as f:
+            cache.put(tuple(entry['key']), f.read(), data_version=data_version)
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render common dashboard views')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help='time budget in seconds')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    data_version = ensure_store()
+    views = default_views(load_cube())
+
+    start = time.perf_counter()
+    entries = list(render_views(views, budget_seconds=args.budget, workers=args.workers))
+    saved = save_warm(entries, data_version)
+
+    print(f"✓ Warmed {saved}/{len(views)} views in {time.perf_counter() - start:.1f}s")
+    print(f"  • Data version: {data_version}")
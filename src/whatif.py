@@ -0,0 +1,215 @@
+"""
+พยากรณ์แบบ what-if ตามช่วงวันที่และจังหวัดที่ผู้ใช้เลือก (คำนวณสดด้วยโมเดล ไม่ต้องมีไฟล์พยากรณ์)
+
+- สร้างฟีเจอร์และ predict เฉพาะกลุ่มของจังหวัดที่เลือก × วันที่ที่เลือก (forecast.build_features)
+- ฟีเจอร์ของแต่ละ (กลุ่ม, วันที่) ไม่ขึ้นกับแถวอื่นในคำขอ จึงเก็บผลทำนายไว้ทีละ (กลุ่ม, วันที่)
+  คำขอที่ช่วงวันที่/จังหวัดซ้อนกันใช้ผลเดิม และ predict เฉพาะช่องที่ยังไม่เคยคำนวณ
+- แคชเป็น array ของ key (group_id × วัน) ที่เรียงแล้ว + ผลทำนาย ค้นด้วย searchsorted
+  แคชผูกกับเวอร์ชันโมเดล 1 เวอร์ชัน (สร้าง WhatIfForecaster ใหม่เมื่อโมเดลเปลี่ยน)
+
+วัดเวลา (1 จังหวัด × 2 สัปดาห์ ครั้งแรก / ครั้งที่สอง และทั้งประเทศ):
+    python src/whatif.py
+"""
+import time
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cube import COLUMN_FIELDS
+from features import KEY_COLUMNS
+from forecast import OUTPUT_COLUMNS, _lag_history, build_features, group_table
+
+DEFAULT_DAYS = 14
+DEFAULT_MAX_ENTRIES = 5_000_000
+
+# key ของ (กลุ่ม, วันที่) = group_id * _DAY_SPAN + วัน (นับจาก 1970-01-01)
+_DAY_SPAN = 1 << 20
+
+
+def _cell_keys(group_ids, days):
+    """key ของทุกช่อง (กลุ่ม × วันที่) เรียงแบบกลุ่มก่อนแล้ววันที่ (ลำดับเดียวกับ build_features)"""
+    return (np.repeat(np.asarray(group_ids, dtype=np.int64) * _DAY_SPAN, len(days))
+            + np.tile(days, len(group_ids)))
+
+
+class WhatIfForecaster:
+    """
+    ทำนายสดตามช่วงวันที่ + จังหวัด พร้อมแคชผลทำนายต่อ (กลุ่ม, วันที่)
+    - predictor: inference.Predictor, history: ข้อมูลย้อนหลัง (features.load_history)
+    - columns: ข้อมูลอำเภอของคลังข้อมูล (cube.columns) ใช้หาจังหวัดและพิกัดของแต่ละกลุ่ม
+      กลุ่มที่ไม่มีอำเภออยู่ใน columns จะไม่ถูกพยากรณ์ (เหมือนไฟล์พยากรณ์ที่ join พิกัดแล้ว)
+    """
+
+    def __init__(self, predictor, history, columns, model_version=None,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.predictor = predictor
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.columns = columns[COLUMN_FIELDS].reset_index(drop=True)
+        self.history = _lag_history(history, predictor.lag_mode)
+
+        groups = group_table(history)
+        province = groups['rcode'].map(self.columns.set_index('rcode')['CHANGWAT_T'])
+        self.groups = groups[province.notna().to_numpy()].reset_index(drop=True)
+        self.group_province = province.dropna().to_numpy()
+
+        self._keys = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0, dtype=np.float64)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def provinces(self):
+        """รายชื่อจังหวัดที่พยากรณ์ได้"""
+        return sorted(set(self.group_province))
+
+    def _lookup(self, keys):
+        """ผลทำนายที่แคชไว้ของแต่ละ key (found=False เมื่อยังไม่มี)"""
+        with self._lock:
+            cached_keys, cached_values = self._keys, self._values
+        if len(cached_keys) == 0:
+            return np.zeros(len(keys)), np.zeros(len(keys), dtype=bool)
+        idx = np.searchsorted(cached_keys, keys).clip(max=len(cached_keys) - 1)
+        found = cached_keys[idx] == keys
+        return np.where(found, cached_values[idx], 0.0), found
+
+    def _store(self, keys, values):
+        """เพิ่มผลทำนายลงแคช เฉพาะ key ที่ยังไม่มี (เกิน max_entries = ล้างแคชเดิมก่อน)"""
+        keys, first = np.unique(keys, return_index=True)
+        values = values[first]
+        with self._lock:
+            # อีก thread อาจเพิ่ม key เดียวกันไปแล้วระหว่าง predict
+            new = ~np.isin(keys, self._keys, assume_unique=True)
+            keys, values = keys[new], values[new]
+            if len(self._keys) + len(keys) > self.max_entries:
+                self._keys = np.empty(0, dtype=np.int64)
+                self._values = np.empty(0, dtype=np.float64)
+            merged = np.concatenate([self._keys, keys])
+            order = np.argsort(merged, kind='stable')
+            self._keys = merged[order]
+            self._values = np.concatenate([self._values, values])[order]
+
+    def _predict_missing(self, groups, dates, found):
+        """
+        predict เฉพาะช่องที่ยังไม่มีในแคช
+        - กลุ่มที่ขาดวันที่ชุดเดียวกันรวมเป็นสี่เหลี่ยม (กลุ่ม × วันที่) เดียวแล้วสร้างฟีเจอร์ทีละชุด
+          (คำขอที่ซ้อนกันบางส่วนมักมีแค่ 1-2 รูปแบบ) จึงไม่ predict ช่องที่แคชไว้แล้วซ้ำ
+        """
+        missing = ~found.reshape(len(groups), len(dates))
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+        rows = np.flatnonzero(missing.any(axis=1))
+        patterns, pattern_of = np.unique(missing[rows], axis=0, return_inverse=True)
+        all_keys, all_values = [], []
+        for i, pattern in enumerate(patterns):
+            subgroups = groups.iloc[rows[pattern_of.ravel() == i]]
+            cols = np.flatnonzero(pattern)
+            _, X = build_features(subgroups, dates[cols], self.history)
+            all_values.append(np.maximum(self.predictor.predict(X), 0).round().astype(np.float64))
+            all_keys.append(_cell_keys(subgroups['group_id'].to_numpy(), days[cols]))
+        keys, values = np.concatenate(all_keys), np.concatenate(all_values)
+        self._store(keys, values)
+        return keys, values
+
+    def predict(self, start, end, provinces=None):
+        """
+        ตารางพยากรณ์รายวันรูปแบบเดียวกับ forecast.forecast + คอลัมน์อำเภอ (COLUMN_FIELDS)
+        - provinces: รายชื่อจังหวัด (None / ว่าง = ทุกจังหวัด)
+        คืนค่า (ตาราง, dict สถิติ: rows, hits, misses, seconds)
+        """
+        t0 = time.perf_counter()
+        dates = pd.date_range(start, end, freq='D')
+        groups = self.groups
+        if provinces:
+            groups = groups[np.isin(self.group_province, list(provinces))]
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+        keys = _cell_keys(groups['group_id'].to_numpy(), days)
+
+        values, found = self._lookup(keys)
+        n_missing = int((~found).sum())
+        if n_missing:
+            new_keys, new_values = self._predict_missing(groups, dates, found)
+            order = np.argsort(new_keys)
+            values[~found] = new_values[order[np.searchsorted(new_keys, keys[~found], sorter=order)]]
+        with self._lock:
+            self.hits += len(keys) - n_missing
+            self.misses += n_missing
+
+        output = pd.DataFrame({
+            'adate': np.tile(dates.to_numpy(), len(groups)),
+            **{name: np.repeat(groups[name].to_numpy(), len(dates)) for name in KEY_COLUMNS},
+            'predicted_cases': values
+        })[OUTPUT_COLUMNS]
+        output = output.merge(self.columns, on='rcode', how='inner')
+        stats = {'rows': len(keys), 'hits': len(keys) - n_missing, 'misses': n_missing,
+                 'seconds': time.perf_counter() - t0}
+        return output, stats
+
+    def stats(self):
+        """จำนวน hit / miss สะสม และจำนวนช่องที่แคชไว้"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._keys)}
+
+
+def check_whatif(forecaster, start, end, provinces=None):
+    """ผลจากแคช (คำขอที่สอง) และผลของคำขอที่ซ้อนกันบางส่วน ต้องตรงกับการ predict ตรงทั้งชุด"""
+    from forecast import iter_forecast
+
+    expected_groups = forecaster.groups
+    if provinces:
+        expected_groups = expected_groups[np.isin(forecaster.group_province, list(provinces))]
+    dates = pd.date_range(start, end, freq='D')
+    expected = pd.concat(list(iter_forecast(forecaster.predictor, expected_groups, dates,
+                                            history=forecaster.history)), ignore_index=True)
+    middle = dates[len(dates) // 2]
+    forecaster.predict(middle, end, provinces)
+    for _ in range(2):
+        output, stats = forecaster.predict(start, end, provinces)
+        np.testing.assert_array_equal(output['predicted_cases'].to_numpy(),
+                                      expected['predicted_cases'].to_numpy())
+    # คำขอที่สองต้องมาจากแคชทั้งหมด และแคชต้องไม่มี key ซ้ำ
+    assert stats['misses'] == 0
+    assert forecaster.stats()['entries'] == len(np.unique(forecaster._keys))
+    # คำขอที่ซ้อนกันบางส่วน (ช่วงวันที่เลื่อน + ทุกกลุ่ม) predict เฉพาะช่องที่ขาด
+    before = forecaster.stats()
+    shifted_end = pd.Timestamp(end) + pd.Timedelta(days=len(dates) // 2)
+    _, stats = forecaster.predict(middle, shifted_end)
+    after = forecaster.stats()
+    assert after['entries'] - before['entries'] == stats['misses']
+    assert after['entries'] == len(np.unique(forecaster._keys))
+
+
+def benchmark_whatif(forecaster, start, province, days=DEFAULT_DAYS):
+    """เวลาของ 1 จังหวัด × days วัน (ครั้งแรก / ครั้งที่สองจากแคช) และของทุกจังหวัด"""
+    end = pd.Timestamp(start) + pd.Timedelta(days=days - 1)
+    results = {}
+    for name, provinces in (('province (cold)', [province]), ('province (cached)', [province]),
+                            ('all provinces', None)):
+        _, stats = forecaster.predict(start, end, provinces)
+        results[name] = stats
+    return results
+
+
+if __name__ == '__main__':
+    from data_store import load_cube
+    from features import load_history
+    from inference import get_predictor, model_version
+
+    parser = argparse.ArgumentParser(description='On-demand what-if forecast with memoized predictions')
+    parser.add_argument('--start', default='2026-12-24')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--province', default='กรุงเทพมหานคร')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    forecaster = WhatIfForecaster(get_predictor(), load_history(), load_cube().columns, model_version())
+    print(f"✓ Ready in {time.perf_counter() - t0:.2f}s ({len(forecaster.groups):,} groups)")
+
+    end = pd.Timestamp(args.start) + pd.Timedelta(days=args.days - 1)
+    check_whatif(WhatIfForecaster(forecaster.predictor, load_history(), forecaster.columns),
+                 args.start, end, [args.province])
+    print("✓ Cached and partially overlapping queries match a direct prediction")
+    for name, stats in benchmark_whatif(forecaster, args.start, args.province, args.days).items():
+        print(f"  • {name:<18} {stats['seconds'] * 1000:8.1f} ms  "
+              f"({stats['rows']:,} cells, {stats['misses']:,} predicted)")